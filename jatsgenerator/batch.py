@@ -0,0 +1,143 @@
+"""Generate JATS XML for a batch of articles"""
+
+from collections import OrderedDict
+from jatsgenerator.conf import raw_config, parse_raw_config
+from jatsgenerator import checkpoint as checkpoints
+from jatsgenerator import generate, metrics, output, preflight
+
+
+def build_xml_batch(
+    article_ids,
+    jats_config=None,
+    add_comment=True,
+    sink=None,
+    report=None,
+    generation_context=None,
+    checkpoint=None,
+    collectors=None,
+    preflight_check=False,
+):
+    """
+    generate xml for each article id from the CSV data and write it to the sink,
+    with the output of each of the collectors classes alongside it,
+    add the metrics of each article to the report if a metrics.RunReport is supplied,
+    the CSV data is read from the generate.GenerationContext if supplied,
+    only the rows of the article_ids with its index_csv or csv_cache_path,
+    with a checkpoint.CheckpointJournal the articles done in a previous run are
+    skipped and each result is added to the journal once the sink has committed
+    the file, so a sink supplied must be closed before the journal,
+    with preflight_check the CSV data is checked first and only the articles
+    with all their required components are built,
+    return an OrderedDict of True or False result values keyed on article id
+    """
+    if not jats_config:
+        jats_config = parse_raw_config(raw_config(None))
+    results = OrderedDict()
+    if checkpoint:
+        resume_plan = checkpoint.plan(article_ids)
+        generate.LOGGER.info(resume_plan.summary())
+        # results in the order of the batch, True for those done in a previous run
+        done = set(resume_plan.done)
+        for article_id in article_ids:
+            results[article_id] = article_id in done
+        article_ids = resume_plan.article_ids
+    prime_csv_caches = generation_context is not None
+    if not generation_context:
+        # one context for the batch so the config is compiled once
+        generation_context = generate.GenerationContext(jats_config=jats_config)
+    if preflight_check:
+        article_ids = preflight_batch(
+            article_ids, generation_context, results, report, checkpoint
+        )
+    if prime_csv_caches:
+        generation_context.prime_csv_caches(article_ids)
+    pending_results = checkpoints.PendingResults(checkpoint) if checkpoint else None
+    with output.run_sink(jats_config, sink) as batch_sink:
+        for article_id in article_ids:
+            article_metrics = None
+            if report is not None:
+                article_metrics = metrics.ArticleMetrics(article_id)
+                report.add(article_metrics)
+            results[article_id] = generate.build_xml_to_disk(
+                article_id,
+                None,
+                jats_config,
+                add_comment,
+                sink=batch_sink,
+                metrics=article_metrics,
+                generation_context=generation_context,
+                collectors=collectors,
+            )
+            if pending_results:
+                pending_results.add(article_id, results.get(article_id))
+                if batch_sink:
+                    batch_sink.after_commit(pending_results.commit)
+                else:
+                    pending_results.commit()
+    return results
+
+
+def preflight_batch(article_ids, generation_context, results, report, checkpoint):
+    """
+    report the articles missing required CSV data and set their result to False,
+    return the article ids which can be built
+    """
+    preflight_report = preflight.preflight(article_ids, generation_context.csv_path)
+    logger = generation_context.logger
+    logger.info(preflight_report.summary())
+    for message in preflight_report.messages():
+        logger.warning(message)
+    # keep the results in the order of the batch
+    for article_id in article_ids:
+        results.setdefault(article_id, False)
+    for article_id in preflight_report.missing:
+        results[article_id] = False
+        if report is not None:
+            article_metrics = metrics.ArticleMetrics(article_id)
+            article_metrics.error_messages = preflight_report.error_messages(article_id)
+            article_metrics.set_error(metrics.CATEGORY_NO_ARTICLE)
+            report.add(article_metrics)
+        if checkpoint:
+            checkpoint.record(article_id, False)
+    if checkpoint and preflight_report.missing:
+        checkpoint.sync()
+    return preflight_report.viable
+
+
+def build_xml_batch_to_target(
+    article_ids,
+    target,
+    jats_config=None,
+    add_comment=True,
+    gzip_files=False,
+    report=None,
+    generation_context=None,
+    checkpoint=None,
+    collectors=None,
+    preflight_check=False,
+):
+    """
+    generate xml for each article id streamed into the target,
+    which can be a .zip, .tar, .tar.gz or .tgz file, or a directory,
+    which is sharded if the jats_config has a shard_layout,
+    a checkpoint can only be used with a directory, since archives are written anew
+    and the articles done in a previous run would be lost
+    """
+    if checkpoint and output.is_archive(target):
+        raise ValueError(
+            "a checkpoint cannot be used with the archive target %s" % target
+        )
+    if not jats_config:
+        jats_config = parse_raw_config(raw_config(None))
+    with output.open_sink(target, gzip_files, jats_config) as sink:
+        return build_xml_batch(
+            article_ids,
+            jats_config,
+            add_comment,
+            sink,
+            report,
+            generation_context,
+            checkpoint,
+            collectors,
+            preflight_check,
+        )
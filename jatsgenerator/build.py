@@ -1,7 +1,83 @@
 import time
-from xml.etree.ElementTree import Element, SubElement
+from collections import OrderedDict
+from xml.etree.ElementTree import Element
 from elifetools import utils as etoolsutils
-from jatsgenerator import utils
+from jatsgenerator import normalize, utils
+from jatsgenerator.compacttree import SubElement
+
+
+class ContributorPartition:
+    "contributors of an article partitioned in a single pass for use by the builders"
+
+    def __init__(self, contributors):
+        self.contributors = contributors
+        # contributors by contrib_type, in their original order
+        self.by_type = OrderedDict()
+        # corresponding authors, in order, for the author-notes
+        self.corresp = []
+        # non-editors with a surname, in order, for the copyright-holder
+        self.copyright_holders = []
+        for contributor in contributors:
+            if contributor.contrib_type not in self.by_type:
+                self.by_type[contributor.contrib_type] = []
+            self.by_type[contributor.contrib_type].append(contributor)
+            if contributor.corresp is True:
+                self.corresp.append(contributor)
+            if contributor.contrib_type != "editor" and contributor.surname:
+                self.copyright_holders.append(contributor)
+
+    def get_contributors(self, contrib_type=None):
+        "contributors of the contrib_type, or all contributors if it is None"
+        if contrib_type is None:
+            return self.contributors
+        return self.by_type.get(contrib_type, [])
+
+
+class ArticleView:
+    """
+    read-only view of an Article for the builders, other attributes are read from
+    the article, the queries repeated during a build are answered from values
+    computed on first use, so the article must not change while it is built
+    """
+
+    def __init__(self, poa_article):
+        object.__setattr__(self, "article", poa_article)
+        object.__setattr__(self, "_memo", {})
+
+    def __getattr__(self, name):
+        return getattr(self.article, name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ArticleView is read-only, cannot set %s" % name)
+
+    def has_contributor_conflict(self):
+        if "conflict" not in self._memo:
+            self._memo["conflict"] = self.article.has_contributor_conflict()
+        return self._memo["conflict"]
+
+    def get_datasets(self, dataset_type=None):
+        if dataset_type is None:
+            return self.article.datasets
+        if "datasets" not in self._memo:
+            # datasets by dataset_type in one pass, in their original order
+            datasets = {}
+            for dataset in self.article.datasets:
+                datasets.setdefault(dataset.dataset_type, []).append(dataset)
+            self._memo["datasets"] = datasets
+        return self._memo["datasets"].get(dataset_type, [])
+
+    def get_date(self, date_type):
+        if "dates" not in self._memo:
+            self._memo["dates"] = {}
+        dates = self._memo["dates"]
+        if date_type not in dates:
+            dates[date_type] = self.article.get_date(date_type)
+        return dates[date_type]
+
+    def get_display_channel(self):
+        if "display_channel" not in self._memo:
+            self._memo["display_channel"] = self.article.get_display_channel()
+        return self._memo["display_channel"]
 
 
 def set_journal_title_group(parent, journal_title):
@@ -13,26 +89,32 @@ def set_journal_title_group(parent, journal_title):
     journal_title_tag.text = journal_title
 
 
-def set_fn_group_competing_interest(parent, poa_article):
-    competing_interest = SubElement(parent, "fn-group")
-    competing_interest.set("content-type", "competing-interest")
-    title = SubElement(competing_interest, "title")
-    title.text = "Competing interest"
+class ConflictPlan:
+    """
+    conflict of interest footnote ids and text computed once per article,
+    used for both the contrib xref tags and the competing interest fn-group
+    """
 
-    # Check if we are supplied a conflict default statement and set count accordingly
-    if poa_article.conflict_default:
-        conflict_count = 1
-    else:
-        conflict_count = 0
-
-    for contributor in poa_article.contributors:
-        if contributor.conflict:
-            for conflict in contributor.conflict:
-                conf_id = "conf" + str(conflict_count + 1)
-                fn_tag = SubElement(competing_interest, "fn")
-                fn_tag.set("fn-type", "conflict")
-                fn_tag.set("id", conf_id)
-                tag_name = "p"
+    def __init__(self, poa_article):
+        # list of (conf_id, text) for each contributor conflict, in footnote order
+        self.footnotes = []
+        # xref rid of the first conflict for a contributor, keyed on the object id
+        self.contributor_rids = {}
+        self.default_rid = None
+        self.default_text = None
+
+        # conf1 is reserved for the default conflict value, if supplied
+        if poa_article.conflict_default:
+            conflict_count = 1
+        else:
+            conflict_count = 0
+
+        for contributor in poa_article.contributors:
+            for conflict in contributor.conflict or []:
+                conflict_count += 1
+                conf_id = "conf" + str(conflict_count)
+                if id(contributor) not in self.contributor_rids:
+                    self.contributor_rids[id(contributor)] = conf_id
                 conflict_text = (
                     contributor.given_name
                     + " "
@@ -41,25 +123,45 @@ def set_fn_group_competing_interest(parent, poa_article):
                     + conflict
                     + "."
                 )
-                utils.append_to_tag(fn_tag, tag_name, conflict_text)
-                # increment
-                conflict_count = conflict_count + 1
-    if poa_article.conflict_default:
-        # default for contributors with no conflicts
-        if conflict_count > 1:
-            # Change the default conflict text
-            conflict_text = (
-                "The other authors declare that no competing interests exist."
-            )
-        else:
-            conflict_text = poa_article.conflict_default
-        conf_id = "conf1"
+                self.footnotes.append((conf_id, conflict_text))
+
+        if poa_article.conflict_default:
+            # default for contributors with no conflicts
+            self.default_rid = "conf1"
+            if self.footnotes:
+                # Change the default conflict text
+                self.default_text = (
+                    "The other authors declare that no competing interests exist."
+                )
+            else:
+                self.default_text = poa_article.conflict_default
+
+    def get_rid(self, contributor):
+        "conflict xref rid for the contributor, or the default rid"
+        return self.contributor_rids.get(id(contributor), self.default_rid)
+
+
+def set_fn_group_competing_interest(parent, poa_article, conflict_plan=None):
+    competing_interest = SubElement(parent, "fn-group")
+    competing_interest.set("content-type", "competing-interest")
+    title = SubElement(competing_interest, "title")
+    title.text = "Competing interest"
+
+    if conflict_plan is None:
+        conflict_plan = ConflictPlan(poa_article)
+
+    for conf_id, conflict_text in conflict_plan.footnotes:
         fn_tag = SubElement(competing_interest, "fn")
         fn_tag.set("fn-type", "conflict")
         fn_tag.set("id", conf_id)
+        tag_name = "p"
+        utils.append_to_tag(fn_tag, tag_name, conflict_text)
+    if conflict_plan.default_rid:
+        fn_tag = SubElement(competing_interest, "fn")
+        fn_tag.set("fn-type", "conflict")
+        fn_tag.set("id", conflict_plan.default_rid)
         p_tag = SubElement(fn_tag, "p")
-        p_tag.text = conflict_text
-        conflict_count = conflict_count + 1
+        p_tag.text = conflict_plan.default_text
 
 
 def set_fn_group_ethics_information(parent, poa_article):
@@ -121,7 +223,7 @@ def set_contrib_role(parent, contrib_type, contributor=None):
 
 def set_contrib_orcid(parent, contributor):
     if contributor.orcid:
-        orcid_value = etoolsutils.orcid_uri_to_orcid(contributor.orcid)
+        orcid_value = normalize.orcid_uri_to_orcid(contributor.orcid)
         orcid_tag = SubElement(parent, "contrib-id")
         if contributor.orcid_authenticated:
             orcid_tag.set("authenticated", "true")
@@ -366,6 +468,11 @@ def generate_copyright_holder(contributor_list):
     for contributor in contributor_list:
         if contributor.contrib_type != "editor" and contributor.surname:
             non_editor.append(contributor)
+    return copyright_holder_from_non_editors(non_editor)
+
+
+def copyright_holder_from_non_editors(non_editor):
+    "copyright holder string from a list of non-editor contributors with a surname"
     # Count authors (non-editors)
     if len(non_editor) > 2:
         contributor = non_editor[0]
@@ -382,9 +489,15 @@ def generate_copyright_holder(contributor_list):
     return copyright_holder
 
 
-def set_copyright(parent, poa_article):
-    "collect copyright data and set copyright tags"
-    copyright_holder = generate_copyright_holder(poa_article.contributors)
+def set_copyright(parent, poa_article, copyright_holders=None):
+    """
+    collect copyright data and set copyright tags,
+    copyright_holders is the already filtered list of non-editor contributors
+    """
+    if copyright_holders is None:
+        copyright_holder = generate_copyright_holder(poa_article.contributors)
+    else:
+        copyright_holder = copyright_holder_from_non_editors(copyright_holders)
 
     # copyright-statement
     copyright_year = ""
@@ -398,10 +511,10 @@ def set_copyright(parent, poa_article):
     set_copyright_tags(parent, copyright_year, copyright_holder)
 
 
-def set_permissions(parent, poa_article):
+def set_permissions(parent, poa_article, copyright_holders=None):
     permissions = SubElement(parent, "permissions")
     if poa_article.license.copyright is True:
-        set_copyright(permissions, poa_article)
+        set_copyright(permissions, poa_article, copyright_holders)
     set_license(permissions, poa_article)
 
 
@@ -597,7 +710,7 @@ def set_funding_source(
             institution_id_tag.text = institution_id
     if institution_name:
         institution_tag = SubElement(institution_wrap, "institution")
-        institution_tag.text = etoolsutils.entity_to_unicode(institution_name)
+        institution_tag.text = normalize.entity_to_unicode(institution_name)
 
 
 def set_principal_award_recipients(parent, award):
@@ -641,13 +754,16 @@ def set_dmy(parent, date):
     year.text = str(date.tm_year)
 
 
-def set_author_notes(parent, poa_article):
+def set_author_notes(parent, poa_article, corresp_contributors=None):
     author_notes = SubElement(parent, "author-notes")
-    corresp_count = 0
-    for contributor in poa_article.contributors:
-        if contributor.corresp is True:
-            corresp_count += 1
-            set_corresp(author_notes, contributor, corresp_count)
+    if corresp_contributors is None:
+        corresp_contributors = [
+            contributor
+            for contributor in poa_article.contributors
+            if contributor.corresp is True
+        ]
+    for corresp_count, contributor in enumerate(corresp_contributors, 1):
+        set_corresp(author_notes, contributor, corresp_count)
 
 
 def set_corresp(parent, contributor, corresp_count):
@@ -694,7 +810,7 @@ def set_related_object(parent, article):
             related_object_tag.set("id", "%sro%s" % (article.id, related_object_num))
             related_object_tag.set("object-id-type", "id")
             related_object_tag.set(
-                "object-id", utils.object_id_from_uri(related_material.xlink_href)
+                "object-id", normalize.object_id_from_uri(related_material.xlink_href)
             )
             related_object_tag.set("link-type", related_material.ext_link_type)
             related_object_tag.set("xlink:href", related_material.xlink_href)
@@ -0,0 +1,153 @@
+"""Journal of the articles finished in a batch run, so an interrupted run can resume"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+class ResumePlan:
+    "which article ids of a batch still need to be generated"
+
+    def __init__(self):
+        # never attempted
+        self.pending = []
+        # failed before and below the attempt limit
+        self.retry = []
+        # generated in a previous run
+        self.done = []
+        # failed max_attempts times, not attempted again
+        self.exhausted = []
+        # pending and retry article ids in their original order
+        self.article_ids = []
+
+    def counts(self):
+        return OrderedDict(
+            [
+                ("pending", len(self.pending)),
+                ("retry", len(self.retry)),
+                ("done", len(self.done)),
+                ("exhausted", len(self.exhausted)),
+            ]
+        )
+
+    def summary(self):
+        return (
+            "resuming: %(done)s already done, %(retry)s failures to retry, "
+            + "%(exhausted)s failed too many times, %(pending)s not yet attempted"
+        ) % self.counts()
+
+
+class CheckpointJournal:
+    """
+    append a JSON line for each article result to the journal file,
+    the results of a previous run are read when it is opened,
+    a failed article is attempted at most max_attempts times over all the runs
+    """
+
+    def __init__(self, path, max_attempts=3):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.completed = set()
+        # failed attempts keyed on article id
+        self.failures = {}
+        self.load()
+        self.journal_file = open(path, "a")
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as open_file:
+            for line in open_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # a line partly written when the run was interrupted
+                    continue
+                self.apply(entry.get("article_id"), entry.get("status"))
+
+    def apply(self, article_id, status):
+        if status == STATUS_DONE:
+            self.completed.add(article_id)
+            self.failures.pop(article_id, None)
+        elif status == STATUS_FAILED:
+            self.failures[article_id] = self.failures.get(article_id, 0) + 1
+
+    def record(self, article_id, result):
+        "append the result of the article to the journal"
+        status = STATUS_DONE if result else STATUS_FAILED
+        self.journal_file.write(
+            json.dumps(
+                OrderedDict(
+                    [
+                        ("article_id", str(article_id)),
+                        ("status", status),
+                        ("time", time.time()),
+                    ]
+                )
+            )
+            + "\n"
+        )
+        self.journal_file.flush()
+        self.apply(str(article_id), status)
+
+    def sync(self):
+        "fsync the journal so the results recorded are on disk"
+        self.journal_file.flush()
+        os.fsync(self.journal_file.fileno())
+
+    def plan(self, article_ids):
+        "ResumePlan of the article ids from the journal"
+        resume_plan = ResumePlan()
+        for article_id in article_ids:
+            key = str(article_id)
+            if key in self.completed:
+                resume_plan.done.append(article_id)
+            elif self.failures.get(key, 0) >= self.max_attempts:
+                resume_plan.exhausted.append(article_id)
+            elif key in self.failures:
+                resume_plan.retry.append(article_id)
+                resume_plan.article_ids.append(article_id)
+            else:
+                resume_plan.pending.append(article_id)
+                resume_plan.article_ids.append(article_id)
+        return resume_plan
+
+    def close(self):
+        self.journal_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class PendingResults:
+    """
+    results of articles written to a sink, recorded in the journal once the sink
+    has committed their files, so an article is only done once its file is on disk
+    """
+
+    def __init__(self, journal):
+        self.journal = journal
+        self.results = []
+        self._lock = threading.Lock()
+
+    def add(self, article_id, result):
+        with self._lock:
+            self.results.append((article_id, result))
+
+    def commit(self):
+        "record the pending results and fsync the journal"
+        with self._lock:
+            results, self.results = self.results, []
+            if not results:
+                return
+            for article_id, result in results:
+                self.journal.record(article_id, result)
+            self.journal.sync()
@@ -0,0 +1,191 @@
+"""Command line interface, run with python -m jatsgenerator"""
+
+import argparse
+import shutil
+import tempfile
+from contextlib import contextmanager
+from jatsgenerator.conf import raw_config, parse_raw_config
+from jatsgenerator import csvfiles, generate, partition, profiling, service, watch
+
+
+def build_jats_config(args):
+    "parse the config section and override the output directory if specified"
+    jats_config = parse_raw_config(raw_config(args.section))
+    if getattr(args, "output_dir", None):
+        jats_config["target_output_dir"] = args.output_dir
+    return jats_config
+
+
+def add_tmp_dir_argument(parser):
+    parser.add_argument(
+        "--tmp-dir",
+        help="folder for the cleaned CSV files, by default a new temporary folder",
+    )
+
+
+@contextmanager
+def tmp_dir(args):
+    "the --tmp-dir folder, or a new temporary folder removed afterwards"
+    if args.tmp_dir:
+        yield args.tmp_dir
+        return
+    new_tmp_dir = tempfile.mkdtemp()
+    try:
+        yield new_tmp_dir
+    finally:
+        shutil.rmtree(new_tmp_dir, ignore_errors=True)
+
+
+def add_serve_parser(subparsers):
+    parser = subparsers.add_parser(
+        "serve", help="run a long-running generation service"
+    )
+    parser.add_argument("--csv-path", help="folder containing the POA CSV files")
+    parser.add_argument("--output-dir", help="override the target_output_dir")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--socket", help="listen on this Unix socket path instead")
+    add_tmp_dir_argument(parser)
+    parser.add_argument(
+        "--no-comment",
+        action="store_true",
+        help="do not add the generated by comment to the XML",
+    )
+    parser.set_defaults(func=run_serve)
+
+
+def run_serve(args):
+    with tmp_dir(args) as csv_tmp_dir:
+        generation_service = service.GenerationService(
+            csv_path=args.csv_path,
+            target_output_dir=args.output_dir,
+            add_comment=not args.no_comment,
+            tmp_dir=csv_tmp_dir,
+        )
+        service.serve(generation_service, args.host, args.port, args.socket)
+    return 0
+
+
+def add_watch_parser(subparsers):
+    parser = subparsers.add_parser(
+        "watch", help="regenerate manuscripts when their CSV rows change"
+    )
+    parser.add_argument("--csv-path", required=True)
+    parser.add_argument("--section", help="config section name, e.g. elife")
+    parser.add_argument("--output-dir", help="override the target_output_dir")
+    parser.add_argument(
+        "--interval", type=float, default=5.0, help="seconds between polls"
+    )
+    parser.add_argument("--no-comment", action="store_true")
+    add_tmp_dir_argument(parser)
+    parser.set_defaults(func=run_watch)
+
+
+def run_watch(args):
+    try:
+        with tmp_dir(args) as csv_tmp_dir:
+            watch.watch(
+                args.csv_path,
+                build_jats_config(args),
+                add_comment=not args.no_comment,
+                interval=args.interval,
+                tmp_dir=csv_tmp_dir,
+            )
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def add_profile_parser(subparsers):
+    parser = subparsers.add_parser(
+        "profile", help="profile generating articles and report the hot spots"
+    )
+    parser.add_argument("--ids", nargs="+", required=True, help="manuscript numbers")
+    parser.add_argument("--csv-path", help="folder containing the POA CSV files")
+    parser.add_argument("--section", help="config section name, e.g. elife")
+    parser.add_argument("--report", default="profile.txt", help="text report path")
+    parser.add_argument(
+        "--pstats", default="profile.pstats", help="path of the aggregated stats"
+    )
+    parser.add_argument(
+        "--limit", type=int, default=30, help="functions listed in the report"
+    )
+    add_tmp_dir_argument(parser)
+    parser.set_defaults(func=run_profile)
+
+
+def run_profile(args):
+    jats_config = build_jats_config(args)
+    with tmp_dir(args) as csv_tmp_dir:
+        generation_context = generate.GenerationContext(
+            args.csv_path, jats_config, tmp_dir=csv_tmp_dir
+        )
+        stats, results = profiling.profile_articles(
+            args.ids, jats_config, generation_context=generation_context
+        )
+    profiling.write_report(stats, results, args.report, args.pstats, args.limit)
+    print("profile report written to %s" % args.report)
+    return 0
+
+
+def add_partition_parser(subparsers):
+    parser = subparsers.add_parser(
+        "partition",
+        help="generate ranges of manuscripts claimed through a shared directory",
+    )
+    parser.add_argument("--shared-dir", required=True, help="directory shared by nodes")
+    parser.add_argument("--csv-path", required=True)
+    parser.add_argument(
+        "--ids", nargs="+", help="manuscript numbers, by default all in the CSV data"
+    )
+    parser.add_argument("--section", help="config section name, e.g. elife")
+    parser.add_argument("--output-dir", help="override the target_output_dir")
+    parser.add_argument("--range-size", type=int, default=100)
+    parser.add_argument("--lease-seconds", type=int, default=300)
+    parser.add_argument("--node-id", help="by default the host name and process id")
+    parser.add_argument("--no-comment", action="store_true")
+    add_tmp_dir_argument(parser)
+    parser.set_defaults(func=run_partition)
+
+
+def run_partition(args):
+    jats_config = build_jats_config(args)
+    article_ids = args.ids
+    if not article_ids:
+        manuscript_path = csvfiles.csv_file_paths(args.csv_path).get("manuscript")
+        article_ids = list(csvfiles.manuscript_lines(manuscript_path).keys())
+    with tmp_dir(args) as csv_tmp_dir:
+        generation_context = generate.GenerationContext(
+            args.csv_path, jats_config, index_csv=True, tmp_dir=csv_tmp_dir
+        )
+        results = partition.run_node(
+            article_ids,
+            args.shared_dir,
+            args.range_size,
+            jats_config,
+            add_comment=not args.no_comment,
+            generation_context=generation_context,
+            node_id=args.node_id,
+            lease_seconds=args.lease_seconds,
+        )
+    print(
+        "node generated %s of %s articles"
+        % (len([result for result in results.values() if result]), len(results))
+    )
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="jatsgenerator")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+    add_serve_parser(subparsers)
+    add_watch_parser(subparsers)
+    add_profile_parser(subparsers)
+    add_partition_parser(subparsers)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,201 @@
+"""Outputs collected from the article data as ArticleXML builds the JATS XML"""
+
+import csv
+import io
+import json
+import os
+import time
+from collections import OrderedDict
+
+AFFILIATION_ATTRIBUTES = ("department", "institution", "city", "country", "ror")
+
+TSV_COLUMNS = (
+    "manuscript",
+    "doi",
+    "contrib_type",
+    "surname",
+    "given_names",
+    "collab",
+    "orcid",
+    "corresp",
+    "aff_id",
+    "department",
+    "institution",
+    "city",
+    "country",
+    "ror",
+)
+
+
+def output_filename(xml_filename, extension):
+    "filename of an output written alongside the XML file"
+    return os.path.splitext(xml_filename)[0] + extension
+
+
+def date_string(article_date):
+    return time.strftime("%Y-%m-%d", article_date.date)
+
+
+def affiliation_dict(affiliation):
+    values = OrderedDict(
+        (name, getattr(affiliation, name, None)) for name in AFFILIATION_ATTRIBUTES
+    )
+    if not any(values.values()):
+        values["text"] = getattr(affiliation, "text", None)
+    return values
+
+
+def contributor_dict(contrib_type, contributor, aff_ids):
+    return OrderedDict(
+        [
+            ("contrib_type", contrib_type or contributor.contrib_type),
+            ("surname", contributor.surname),
+            ("given_names", contributor.given_name),
+            ("collab", contributor.collab),
+            ("orcid", getattr(contributor, "orcid", None)),
+            ("corresp", getattr(contributor, "corresp", None) is True),
+            ("affiliations", aff_ids),
+        ]
+    )
+
+
+class Collector:
+    """
+    receive the article data from ArticleXML while it is built, a new collector
+    is made for each article, only the sections which are built are collected
+    """
+
+    # extension of the output file, replacing the .xml of the XML filename
+    extension = None
+
+    def start(self, poa_article):
+        "the article before its tags are built"
+
+    def contributor(self, contrib_type, contributor, aff_ids):
+        "a contributor and the ids of its affiliations, None for editors"
+
+    def affiliation(self, aff_id, affiliation):
+        "an author affiliation and its id"
+
+    def funding_award(self, award):
+        "a funding award"
+
+    def date(self, date_type, article_date):
+        "a pub-date or history date which is in the XML"
+
+    def output(self):
+        "bytes of the output once the article is built"
+        raise NotImplementedError
+
+
+class MetadataCollector(Collector):
+    "JSON summary of the DOI, title, authors, affiliations, funding and dates"
+
+    extension = ".json"
+
+    def __init__(self):
+        self.metadata = OrderedDict()
+        self.contributors = []
+        self.affiliations = OrderedDict()
+        self.funding = []
+        self.dates = OrderedDict()
+
+    def start(self, poa_article):
+        self.metadata["manuscript"] = poa_article.manuscript
+        self.metadata["doi"] = poa_article.doi
+        self.metadata["article_type"] = poa_article.article_type
+        self.metadata["title"] = poa_article.title
+
+    def contributor(self, contrib_type, contributor, aff_ids):
+        self.contributors.append(contributor_dict(contrib_type, contributor, aff_ids))
+
+    def affiliation(self, aff_id, affiliation):
+        self.affiliations["aff%s" % aff_id] = affiliation_dict(affiliation)
+
+    def funding_award(self, award):
+        self.funding.append(
+            OrderedDict(
+                [
+                    ("institution_name", award.institution_name),
+                    ("institution_id", award.institution_id),
+                    (
+                        "award_ids",
+                        [
+                            award_object.award_id
+                            for award_object in award.awards
+                            if award_object.award_id
+                        ],
+                    ),
+                    (
+                        "recipients",
+                        [
+                            recipient.collab
+                            or " ".join(
+                                name
+                                for name in [recipient.given_name, recipient.surname]
+                                if name
+                            )
+                            for recipient in award.principal_award_recipients
+                        ],
+                    ),
+                ]
+            )
+        )
+
+    def date(self, date_type, article_date):
+        self.dates[date_type] = date_string(article_date)
+
+    def output(self):
+        self.metadata["contributors"] = self.contributors
+        self.metadata["affiliations"] = self.affiliations
+        self.metadata["funding"] = self.funding
+        self.metadata["dates"] = self.dates
+        return json.dumps(self.metadata, indent=4).encode("utf-8")
+
+
+class ContributorTsvCollector(Collector):
+    "flat TSV of the contributors, one row for each of their affiliations"
+
+    extension = ".tsv"
+
+    def __init__(self):
+        self.manuscript = None
+        self.doi = None
+        self.contributors = []
+        self.affiliations = {}
+
+    def start(self, poa_article):
+        self.manuscript = poa_article.manuscript
+        self.doi = poa_article.doi
+
+    def contributor(self, contrib_type, contributor, aff_ids):
+        self.contributors.append(contributor_dict(contrib_type, contributor, aff_ids))
+
+    def affiliation(self, aff_id, affiliation):
+        self.affiliations[aff_id] = affiliation_dict(affiliation)
+
+    def rows(self):
+        for contributor in self.contributors:
+            for aff_id in contributor.get("affiliations") or [None]:
+                row = OrderedDict((name, None) for name in TSV_COLUMNS)
+                row["manuscript"] = self.manuscript
+                row["doi"] = self.doi
+                row.update(
+                    (name, value) for name, value in contributor.items() if name in row
+                )
+                if aff_id is not None:
+                    row["aff_id"] = "aff%s" % aff_id
+                    row.update(
+                        (name, value)
+                        for name, value in self.affiliations.get(aff_id, {}).items()
+                        if name in row
+                    )
+                yield row
+
+    def output(self):
+        stream = io.StringIO()
+        writer = csv.writer(stream, delimiter="\t", lineterminator="\n")
+        writer.writerow(TSV_COLUMNS)
+        for row in self.rows():
+            writer.writerow(["" if value is None else value for value in row.values()])
+        return stream.getvalue().encode("utf-8")
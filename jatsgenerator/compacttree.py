@@ -0,0 +1,171 @@
+"""Compact XML tree the builders can write into instead of ElementTree elements"""
+
+from xml.etree import ElementTree
+
+# tag of a comment node
+COMMENT = "!--"
+
+
+class Node:
+    """
+    an XML tag supporting the part of the ElementTree.Element API used by the builders,
+    children is None until the first child is appended
+    """
+
+    __slots__ = ("tag", "attrib", "text", "tail", "children")
+
+    def __init__(self, tag, attrib=None, **extra):
+        self.tag = tag
+        self.attrib = dict(attrib or {}, **extra)
+        self.text = None
+        self.tail = None
+        self.children = None
+
+    def makeelement(self, tag, attrib):
+        return Node(tag, attrib)
+
+    def set(self, key, value):
+        self.attrib[key] = value
+
+    def get(self, key, default=None):
+        return self.attrib.get(key, default)
+
+    def keys(self):
+        return self.attrib.keys()
+
+    def items(self):
+        return self.attrib.items()
+
+    def append(self, child):
+        "append a Node, or a copy of an ElementTree element"
+        if not isinstance(child, Node):
+            child = from_element(child)
+        if self.children is None:
+            self.children = [child]
+        else:
+            self.children.append(child)
+
+    def clear(self):
+        self.attrib = {}
+        self.text = None
+        self.tail = None
+        self.children = None
+
+    def __len__(self):
+        return len(self.children) if self.children else 0
+
+    def __getitem__(self, index):
+        return (self.children or [])[index]
+
+    def __iter__(self):
+        return iter(self.children or [])
+
+
+def SubElement(parent, tag, attrib=None, **extra):
+    "add a child tag to a Node or to an ElementTree element, like ElementTree.SubElement"
+    if isinstance(parent, Node):
+        node = Node(tag, attrib, **extra)
+        parent.append(node)
+        return node
+    return ElementTree.SubElement(parent, tag, attrib or {}, **extra)
+
+
+def Comment(text=None):
+    node = Node(COMMENT)
+    node.text = text
+    return node
+
+
+def from_element(element):
+    "Node copy of the ElementTree element and its children"
+    if element.tag is ElementTree.Comment:
+        node = Comment(element.text)
+    else:
+        node = Node(element.tag, element.attrib)
+        node.text = element.text
+    node.tail = element.tail
+    for child in element:
+        node.append(from_element(child))
+    return node
+
+
+def to_element(node):
+    "ElementTree element copy of the Node and its children"
+    if node.tag == COMMENT:
+        element = ElementTree.Comment(node.text)
+    else:
+        element = ElementTree.Element(node.tag, node.attrib)
+        element.text = node.text
+    element.tail = node.tail
+    for child in node:
+        element.append(to_element(child))
+    return element
+
+
+def escape_text(text):
+    """
+    escape character data as minidom writes it after parsing ElementTree output,
+    which also normalises line endings
+    """
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return escape_attribute(text)
+
+
+def escape_attribute(text):
+    "escape an attribute value as minidom writes it"
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if '"' in text:
+        text = text.replace('"', "&quot;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+
+
+def is_namespace_declaration(name):
+    return name == "xmlns" or name.startswith("xmlns:")
+
+
+def ordered_attributes(attrib):
+    "attributes in the order minidom writes them, namespace declarations first"
+    items = list(attrib.items())
+    if not any(is_namespace_declaration(name) for name, value in items):
+        return items
+    return [item for item in items if is_namespace_declaration(item[0])] + [
+        item for item in items if not is_namespace_declaration(item[0])
+    ]
+
+
+def write_node(node, parts):
+    "append the serialized strings of the node, not including its tail, to parts"
+    if node.tag == COMMENT:
+        parts.append("<!--%s-->" % node.text)
+        return
+    parts.append("<" + node.tag)
+    if node.attrib:
+        for name, value in ordered_attributes(node.attrib):
+            parts.append(' %s="%s"' % (name, escape_attribute(value)))
+    if not node.text and not node.children:
+        parts.append("/>")
+        return
+    parts.append(">")
+    if node.text:
+        parts.append(escape_text(node.text))
+    for child in node:
+        write_node(child, parts)
+        if child.tail:
+            parts.append(escape_text(child.tail))
+    parts.append("</%s>" % node.tag)
+
+
+def tostring(node, prefix="", encoding="utf-8"):
+    """
+    serialize the Node to bytes, the same as reparsing ElementTree output with minidom
+    and calling toxml(), prefix is the XML declaration and doctype to write first
+    """
+    parts = [prefix]
+    write_node(node, parts)
+    return "".join(parts).encode(encoding, "xmlcharrefreplace")
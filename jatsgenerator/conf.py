@@ -3,7 +3,12 @@ import json
 
 CONFIG_FILE = "jatsgenerator.cfg"
 BOOLEAN_VALUES = []
-INT_VALUES = []
+INT_VALUES = [
+    "shard_depth",
+    "shard_width",
+    "group_commit_size",
+    "group_commit_latency_ms",
+]
 LIST_VALUES = ["journal_id_types", "contrib_types", "history_date_types"]
 
 
@@ -18,8 +23,8 @@ def raw_config(config_section, config_file=CONFIG_FILE):
     config = load_config(config_file)
     if config.has_section(config_section):
         return config[config_section]
-    # default
-    return config.defaults()
+    # default, as a section so the typed getters can be used
+    return config[configparser.DEFAULTSECT]
 
 
 def boolean_config(config, value_name):
@@ -0,0 +1,139 @@
+"""Persistent SQLite cache of the parsed POA CSV rows of each manuscript"""
+
+import json
+import sqlite3
+from jatsgenerator import csvfiles, csvindex
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS csv_file (
+    table_type TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime_ns INTEGER,
+    digest TEXT,
+    col_names TEXT
+);
+CREATE TABLE IF NOT EXISTS csv_row (
+    table_type TEXT,
+    article_id TEXT,
+    position INTEGER,
+    row TEXT
+);
+CREATE INDEX IF NOT EXISTS csv_row_article ON csv_row (table_type, article_id);
+"""
+
+
+class CsvCache:
+    """
+    parsed rows of the CSV files in csv_path stored in the SQLite file cache_path,
+    a CSV file is only parsed again when its size, modified time and digest change
+    """
+
+    def __init__(self, cache_path, csv_path):
+        self.cache_path = cache_path
+        self.csv_path = csv_path
+        self.connection = sqlite3.connect(cache_path)
+        self.connection.executescript(SCHEMA)
+        # table types which were parsed by the last refresh()
+        self.parsed_table_types = []
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def stored_file(self, table_type):
+        return self.connection.execute(
+            "SELECT size, mtime_ns, digest FROM csv_file WHERE table_type = ?",
+            (table_type,),
+        ).fetchone()
+
+    def store_table(self, table_type, path, signature, digest):
+        "parse the CSV file and replace its stored rows"
+        csv_index = csvindex.CsvIndex(table_type, path)
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM csv_row WHERE table_type = ?", (table_type,)
+            )
+            self.connection.executemany(
+                "INSERT INTO csv_row VALUES (?, ?, ?, ?)",
+                (
+                    (table_type, article_id, position, json.dumps(row))
+                    for position, (article_id, row) in enumerate(
+                        csv_index.article_rows()
+                    )
+                ),
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO csv_file VALUES (?, ?, ?, ?, ?)",
+                (
+                    table_type,
+                    signature[0],
+                    signature[1],
+                    digest,
+                    json.dumps(csv_index.col_names),
+                ),
+            )
+        self.parsed_table_types.append(table_type)
+
+    def refresh(self):
+        "parse the CSV files which changed since they were stored"
+        self.parsed_table_types = []
+        for table_type, path in csvfiles.csv_file_paths(self.csv_path).items():
+            signature = csvfiles.file_signature(path)
+            if signature is None:
+                continue
+            stored = self.stored_file(table_type)
+            if stored and tuple(stored[0:2]) == signature:
+                continue
+            digest = csvfiles.file_digest(path)
+            if stored and stored[2] == digest:
+                # touched but not changed
+                with self.connection:
+                    self.connection.execute(
+                        "UPDATE csv_file SET size = ?, mtime_ns = ? "
+                        + "WHERE table_type = ?",
+                        (signature[0], signature[1], table_type),
+                    )
+                continue
+            self.store_table(table_type, path, signature, digest)
+        return self.parsed_table_types
+
+    def col_names(self, table_type):
+        result = self.connection.execute(
+            "SELECT col_names FROM csv_file WHERE table_type = ?", (table_type,)
+        ).fetchone()
+        return json.loads(result[0]) if result else []
+
+    def rows(self, table_type, article_ids):
+        "stored data rows of the article_ids in the order they are in the file"
+        article_ids = sorted(set(str(article_id) for article_id in article_ids))
+        if not article_ids:
+            return []
+        query = (
+            "SELECT row FROM csv_row WHERE table_type = ? AND article_id IN (%s) "
+            + "ORDER BY position"
+        ) % ",".join("?" * len(article_ids))
+        return [
+            json.loads(result[0])
+            for result in self.connection.execute(query, [table_type] + article_ids)
+        ]
+
+    def prime_csv_caches(self, article_ids, caches):
+        """
+        refresh the cache and fill the caches dict, as used by csvfiles.csv_source(),
+        with the column names and only the data rows of the article_ids
+        """
+        self.refresh()
+        caches.clear()
+        col_names_cache = caches.setdefault("get_csv_col_names", {})
+        data_rows_cache = caches.setdefault("get_csv_data_rows", {})
+        for table_type, path in csvfiles.csv_file_paths(self.csv_path).items():
+            if csvfiles.file_signature(path) is None:
+                continue
+            col_names_cache[(table_type,)] = self.col_names(table_type)
+            data_rows_cache[(table_type,)] = self.rows(table_type, article_ids)
+        return caches
@@ -0,0 +1,145 @@
+"""Read the POA CSV export files independently of the ejpcsvparser caches"""
+
+import csv
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from ejpcsvparser import csv_data, settings
+
+# every POA CSV file has the manuscript number column
+MANUSCRIPT_COLUMN = "poa_m_ms_no"
+
+# ejpcsvparser reads its module globals, so only one CSV source is parsed at a time
+CSV_LOCK = threading.RLock()
+
+
+def csv_file_paths(csv_path):
+    "OrderedDict of the CSV file path keyed on the ejpcsvparser table type"
+    return OrderedDict(
+        (table_type, os.path.join(csv_path, file_name))
+        for table_type, file_name in settings.CSV_FILES.items()
+    )
+
+
+def file_signature(path):
+    "size and modified time of the file, None if it does not exist"
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def file_digest(path):
+    "sha1 hex digest of the file content"
+    digest = hashlib.sha1()
+    with open(path, "rb") as open_file:
+        for chunk in iter(lambda: open_file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_line(line):
+    "parse one CSV line into a list of cell values"
+    return next(csv.reader([line], delimiter=",", quotechar='"'), [])
+
+
+def read_csv_lines(path):
+    "read the CSV file joining multi-line records, so there is one record per line"
+    with open(path, "r") as open_file:
+        return csv_data.flatten_lines(open_file).splitlines()
+
+
+def manuscript_lines(path):
+    """
+    OrderedDict of the data lines in the CSV file keyed on manuscript number,
+    the preamble and column name rows are skipped
+    """
+    lines = read_csv_lines(path)
+    article_index = OrderedDict()
+    if len(lines) <= settings.ROWS_WITH_COLNAMES:
+        return article_index
+    col_names = parse_line(lines[settings.ROWS_WITH_COLNAMES])
+    position = col_names.index(MANUSCRIPT_COLUMN)
+    for line in lines[settings.DATA_START_ROW :]:
+        if not line.strip():
+            continue
+        row = parse_line(line)
+        if len(row) <= position:
+            continue
+        if row[position] not in article_index:
+            article_index[row[position]] = []
+        article_index[row[position]].append(line)
+    return article_index
+
+
+def manuscript_digests(path):
+    "dict of a digest of the CSV data lines for each manuscript number"
+    digests = {}
+    for article_id, lines in manuscript_lines(path).items():
+        digests[article_id] = hashlib.sha1(
+            "\n".join(lines).encode("utf8", "surrogateescape")
+        ).hexdigest()
+    return digests
+
+
+def memoized_functions():
+    "OrderedDict of the memoized ejpcsvparser functions keyed on their name"
+    # memoized functions are callable dict instances
+    return OrderedDict(
+        (name, value)
+        for name, value in vars(csv_data).items()
+        if isinstance(value, dict) and callable(value)
+    )
+
+
+def reset_csv_caches():
+    "clear the memoized ejpcsvparser functions so the CSV files are read again"
+    for value in memoized_functions().values():
+        value.clear()
+
+
+def memo_function(function, values=None):
+    "new memoized function of the same ejpcsvparser type, with its own values"
+    memo = type(function)(function.value)
+    if values:
+        memo.update(values)
+    return memo
+
+
+@contextmanager
+def csv_source(csv_path=None, tmp_dir=None, caches=None):
+    """
+    parse the CSV files in csv_path while holding CSV_LOCK,
+    the memoized ejpcsvparser functions are replaced by those kept in the caches
+    dict, without copying their data, so it is kept between uses,
+    plain dicts in caches, e.g. from prime_csv_caches(), are made into functions,
+    the ejpcsvparser path, tmp dir and functions are restored afterwards,
+    with no csv_path the current ejpcsvparser settings are used
+    """
+    with CSV_LOCK:
+        if csv_path is None:
+            yield
+            return
+        if caches is None:
+            caches = {}
+        functions = memoized_functions()
+        previous_path = csv_data.CSV_PATH
+        previous_tmp_dir = csv_data.TMP_DIR
+        csv_data.CSV_PATH = csv_path
+        if tmp_dir:
+            csv_data.TMP_DIR = tmp_dir
+        for name, function in functions.items():
+            memo = caches.get(name)
+            if type(memo) is not type(function):
+                memo = caches[name] = memo_function(function, memo)
+            setattr(csv_data, name, memo)
+        try:
+            yield
+        finally:
+            for name, function in functions.items():
+                setattr(csv_data, name, function)
+            csv_data.CSV_PATH = previous_path
+            csv_data.TMP_DIR = previous_tmp_dir
@@ -0,0 +1,208 @@
+"""Memory-mapped CSV files indexed on manuscript number, to read only the rows needed"""
+
+import csv
+import io
+import mmap
+import os
+from array import array
+from collections import OrderedDict
+from ejpcsvparser import csv_data, settings
+from jatsgenerator import csvfiles
+
+ENCODING = "utf8"
+
+# bytes at the start of a record parsed to find the manuscript number
+PREFIX_LENGTH = 256
+
+# the overflow CSV files join the cells from this position, as in ejpcsvparser
+OVERFLOW_JOIN_CELLS_FROM = {"ethics": 3, "datasets": 3}
+OVERFLOW_JOIN_CELLS_DEFAULT = 2
+
+
+def decode_line(line_bytes):
+    "decode a line the same as reading it from a file opened in text mode"
+    if line_bytes.endswith(b"\r\n"):
+        line_bytes = line_bytes[:-2] + b"\n"
+    return line_bytes.decode(ENCODING, "surrogateescape")
+
+
+def line_ranges(buffer):
+    "iterate over the (start, end) byte offsets of each line including its newline"
+    start = 0
+    size = len(buffer)
+    while start < size:
+        end = buffer.find(b"\n", start)
+        end = size if end == -1 else end + 1
+        yield start, end
+        start = end
+
+
+def record_ranges(buffer, data_start_row=settings.DATA_START_ROW):
+    """
+    iterate over the (start, end, first_line_end) byte offsets of each data record,
+    lines are joined into records the same as by csv_data.flatten_lines(),
+    the preamble and column name lines are skipped
+    """
+    record_start = None
+    first_line_end = None
+    for line_number, (start, end) in enumerate(line_ranges(buffer), 1):
+        if line_number <= data_start_row:
+            continue
+        if record_start is None:
+            record_start = start
+            first_line_end = end
+        if buffer[start:end].rstrip().endswith(b'"'):
+            yield record_start, end, first_line_end
+            record_start = None
+    if record_start is not None:
+        yield record_start, len(buffer), first_line_end
+
+
+def flatten_record(record_bytes):
+    "one line of text from the lines of a record"
+    lines = [decode_line(line) for line in record_bytes.splitlines(True)]
+    return csv_data.flatten_lines(lines, data_start_row=0)
+
+
+def parse_record(table_type, text):
+    "parse the record text into a row, the same as csv_data.get_csv_sheet()"
+    row = next(csv.reader(io.StringIO(text, newline=""), delimiter=",", quotechar='"'))
+    if table_type in settings.OVERFLOW_CSV_FILES:
+        row = next(csv.reader(io.StringIO(text), delimiter=",", quotechar=None))
+        join_cells_from = OVERFLOW_JOIN_CELLS_FROM.get(
+            table_type, OVERFLOW_JOIN_CELLS_DEFAULT
+        )
+        row[join_cells_from] = ",".join(row[join_cells_from:])
+        for index, cell in enumerate(row):
+            row[index] = cell.lstrip('"').rstrip('"')
+    return row
+
+
+class CsvIndex:
+    """
+    byte ranges of the data records of each manuscript number in a CSV file,
+    only the records of the manuscripts requested are decoded
+    """
+
+    def __init__(self, table_type, path):
+        self.table_type = table_type
+        self.path = path
+        self.col_names = []
+        # flat array of record start and end offsets keyed on manuscript number
+        self.offsets = OrderedDict()
+        self.build()
+
+    def open_buffer(self, open_file):
+        "memory-map the file, None if it is empty"
+        if not os.fstat(open_file.fileno()).st_size:
+            return None
+        return mmap.mmap(open_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def manuscript_id(self, buffer, start, end, first_line_end, position):
+        "manuscript number of the record, parsing as little of it as possible"
+        prefix_end = min(first_line_end, start + PREFIX_LENGTH)
+        row = csvfiles.parse_line(decode_line(buffer[start:prefix_end]))
+        if prefix_end == end or len(row) > position + 1:
+            return csv_data.get_cell_value(
+                csvfiles.MANUSCRIPT_COLUMN, self.col_names, row
+            )
+        # a long leading cell, parse the whole record
+        row = parse_record(self.table_type, flatten_record(buffer[start:end]))
+        return csv_data.get_cell_value(csvfiles.MANUSCRIPT_COLUMN, self.col_names, row)
+
+    def build(self):
+        with open(self.path, "rb") as open_file:
+            buffer = self.open_buffer(open_file)
+            if buffer is None:
+                return
+            with buffer:
+                for line_number, (start, end) in enumerate(line_ranges(buffer)):
+                    if line_number == settings.ROWS_WITH_COLNAMES:
+                        self.col_names = csvfiles.parse_line(
+                            flatten_record(buffer[start:end])
+                        )
+                        break
+                if csvfiles.MANUSCRIPT_COLUMN not in self.col_names:
+                    return
+                position = self.col_names.index(csvfiles.MANUSCRIPT_COLUMN)
+                for start, end, first_line_end in record_ranges(buffer):
+                    article_id = self.manuscript_id(
+                        buffer, start, end, first_line_end, position
+                    )
+                    if article_id not in self.offsets:
+                        self.offsets[article_id] = array("q")
+                    self.offsets[article_id].extend((start, end))
+
+    def article_ids(self):
+        return list(self.offsets.keys())
+
+    def decode_ranges(self, ranges):
+        "iterate over the (start, row) of the decoded byte ranges in file order"
+        if not ranges:
+            return
+        with open(self.path, "rb") as open_file:
+            with self.open_buffer(open_file) as buffer:
+                for start, end in sorted(ranges):
+                    yield start, parse_record(
+                        self.table_type, flatten_record(buffer[start:end])
+                    )
+
+    def article_ranges(self, article_id):
+        offsets = self.offsets.get(article_id, [])
+        return list(zip(offsets[0::2], offsets[1::2]))
+
+    def rows(self, article_ids):
+        "decoded data rows of the article_ids in the order they are in the file"
+        ranges = []
+        for article_id in set(str(article_id) for article_id in article_ids):
+            ranges += self.article_ranges(article_id)
+        return [row for start, row in self.decode_ranges(ranges)]
+
+    def article_rows(self):
+        "list of (article_id, row) of every data row in the order they are in the file"
+        ranges = []
+        article_ids = {}
+        for article_id in self.offsets:
+            for start, end in self.article_ranges(article_id):
+                ranges.append((start, end))
+                article_ids[start] = article_id
+        return [
+            (article_ids.get(start), row) for start, row in self.decode_ranges(ranges)
+        ]
+
+
+def cached_index(table_type, path, indexes=None):
+    """
+    CsvIndex of the file, with an indexes dict it is kept keyed on the path and
+    reused until the size or modified time of the file changes,
+    None if the file does not exist
+    """
+    signature = csvfiles.file_signature(path)
+    if signature is None:
+        return None
+    if indexes is None:
+        return CsvIndex(table_type, path)
+    cached_signature, csv_index = indexes.get(path, (None, None))
+    if cached_signature != signature:
+        csv_index = CsvIndex(table_type, path)
+        indexes[path] = (signature, csv_index)
+    return csv_index
+
+
+def prime_csv_caches(csv_path, article_ids, caches, indexes=None):
+    """
+    fill the caches dict, as used by csvfiles.csv_source(), with the column names
+    and only the data rows of the article_ids from each CSV file in csv_path,
+    other manuscripts are then not found in the CSV data,
+    the CsvIndex of each file is reused from the indexes dict if supplied
+    """
+    caches.clear()
+    col_names_cache = caches.setdefault("get_csv_col_names", {})
+    data_rows_cache = caches.setdefault("get_csv_data_rows", {})
+    for table_type, path in csvfiles.csv_file_paths(csv_path).items():
+        csv_index = cached_index(table_type, path, indexes)
+        if csv_index is None:
+            continue
+        col_names_cache[(table_type,)] = csv_index.col_names
+        data_rows_cache[(table_type,)] = csv_index.rows(article_ids)
+    return caches
@@ -1,16 +1,28 @@
 from __future__ import print_function
+import functools
 import logging
-import time
 import os
-from xml.etree.ElementTree import Element, SubElement, Comment
+import time
+from collections import OrderedDict
+from xml.etree.ElementTree import Element, Comment
 from xml.etree import ElementTree
 from xml.dom import minidom
 from elifetools import xmlio
 from elifearticle import utils as eautils
 from elifearticle.article import Article
-from ejpcsvparser import parse
+from ejpcsvparser import csv_data, parse
 from jatsgenerator.conf import raw_config, parse_raw_config
-from jatsgenerator import build
+from jatsgenerator.collectors import output_filename
+from jatsgenerator.compacttree import SubElement
+from jatsgenerator import (
+    build,
+    compacttree,
+    csvcache,
+    csvfiles,
+    csvindex,
+    metrics as run_metrics,
+    output,
+)
 
 LOGGER = logging.getLogger("xml_gen")
 HDLR = logging.FileHandler("xml_gen.log")
@@ -20,6 +32,173 @@ LOGGER.addHandler(HDLR)
 LOGGER.setLevel(logging.INFO)
 
 
+# sections which can be selected for a partial build of the XML
+JOURNAL_META = "journal-meta"
+ARTICLE_META = "article-meta"
+# only the contrib-group tags of the article-meta
+CONTRIB_GROUP = "contrib-group"
+BACK = "back"
+SUB_ARTICLE = "sub-article"
+ALL_SECTIONS = (JOURNAL_META, ARTICLE_META, BACK, SUB_ARTICLE)
+FRONT_SECTIONS = (JOURNAL_META, ARTICLE_META)
+SECTION_NAMES = (JOURNAL_META, ARTICLE_META, CONTRIB_GROUP, BACK, SUB_ARTICLE)
+
+# ArticleXML methods which build the article tag, in order, and their sections
+BUILD_STEPS = (
+    ("set_frontmatter", (JOURNAL_META, ARTICLE_META, CONTRIB_GROUP)),
+    ("set_backmatter", (BACK,)),
+    ("set_sub_articles", (SUB_ARTICLE,)),
+)
+
+
+@functools.lru_cache(maxsize=1)
+def last_commit_to_master():
+    "the last commit is looked up once per process and reused in each XML comment"
+    return eautils.get_last_commit_to_master()
+
+
+class GenerationContext:
+    """
+    the CSV source, config and logger of a generation job,
+    jobs with their own context can run concurrently in one process,
+    csv_path is a folder, with or without a trailing separator,
+    with no csv_path the ejpcsvparser CSV_PATH setting is used, and with index_csv
+    or csv_cache_path its value when the context is created is kept as the csv_path,
+    with index_csv only the CSV rows of a batch are read, see prime_csv_caches(),
+    with csv_cache_path the parsed rows are kept in a csvcache.CsvCache file
+    """
+
+    def __init__(
+        self,
+        csv_path=None,
+        jats_config=None,
+        logger=None,
+        tmp_dir=None,
+        index_csv=False,
+        csv_cache_path=None,
+    ):
+        if csv_path is None and (index_csv or csv_cache_path):
+            # the primed rows are only used by csv_source() with a csv_path
+            csv_path = csv_data.CSV_PATH
+        if csv_path is not None:
+            # ejpcsvparser adds the file name to the path without a separator
+            csv_path = os.path.join(csv_path, "")
+        self.csv_path = csv_path
+        self.tmp_dir = tmp_dir
+        self.index_csv = index_csv
+        self.csv_cache_path = csv_cache_path
+        if not jats_config:
+            jats_config = parse_raw_config(raw_config(None))
+        self.jats_config = jats_config
+        self.logger = logger if logger else LOGGER
+        # memoized ejpcsvparser data of csv_path kept between articles
+        self.csv_caches = {}
+        # csvindex.CsvIndex of each CSV file kept between batches
+        self.csv_indexes = {}
+        # BuildPlan of each jats_config used, keyed on the object id
+        self.build_plans = {}
+
+    def build_plan(self, jats_config=None):
+        """
+        BuildPlan compiled from the jats_config the first time it is used,
+        later changes to the same jats_config dict are not seen by the plan
+        """
+        if not jats_config:
+            jats_config = self.jats_config
+        build_plan = self.build_plans.get(id(jats_config))
+        if build_plan is None or build_plan.jats_config is not jats_config:
+            build_plan = BuildPlan(jats_config)
+            self.build_plans[id(jats_config)] = build_plan
+        return build_plan
+
+    def csv_source(self):
+        "context manager to parse the CSV data of this job"
+        return csvfiles.csv_source(self.csv_path, self.tmp_dir, self.csv_caches)
+
+    def prime_csv_caches(self, article_ids):
+        """
+        read only the CSV rows of the article_ids, from the CSV cache file
+        or from the memory-mapped CSV files when index_csv is set,
+        the CSV files are indexed once and again only when they change,
+        other articles are not found until it is called again
+        """
+        if not self.index_csv and not self.csv_cache_path:
+            return
+        with csvfiles.CSV_LOCK:
+            if self.csv_cache_path:
+                with csvcache.CsvCache(self.csv_cache_path, self.csv_path) as cache:
+                    cache.prime_csv_caches(article_ids, self.csv_caches)
+            else:
+                csvindex.prime_csv_caches(
+                    self.csv_path, article_ids, self.csv_caches, self.csv_indexes
+                )
+
+
+def default_elocation_id(manuscript):
+    return "e" + str(int(manuscript)).zfill(5)
+
+
+class BuildPlan:
+    """
+    the values of a jats_config section which ArticleXML uses, compiled once
+    to be reused for every article built with the same config
+    """
+
+    def __init__(self, jats_config):
+        self.jats_config = jats_config
+        self.generator = str(jats_config.get("generator"))
+        # (journal-id-type, value) of the journal-id tags
+        self.journal_ids = []
+        for journal_id_type in jats_config.get("journal_id_types") or []:
+            # concatenate the config name to look for the value
+            journal_id_value = jats_config.get("journal_id_" + journal_id_type)
+            if journal_id_value:
+                self.journal_ids.append((journal_id_type, journal_id_value))
+        self.journal_title = jats_config.get("journal_title")
+        self.journal_issn = jats_config.get("journal_issn")
+        self.publisher_name = jats_config.get("publisher_name")
+        self.contrib_types = jats_config.get("contrib_types") or []
+        self.history_date_types = jats_config.get("history_date_types")
+        # format callables taking the manuscript number
+        if "elocation_id_pattern" in jats_config:
+            self.elocation_id_format = jats_config.get("elocation_id_pattern").format
+        else:
+            self.elocation_id_format = None
+        filename_pattern = jats_config.get("xml_filename_pattern")
+        self.xml_filename_format = filename_pattern.format if filename_pattern else None
+        # set of sections and names of the BUILD_STEPS, keyed on the sections
+        self.section_steps = {}
+
+    def elocation_id(self, manuscript):
+        if self.elocation_id_format:
+            return self.elocation_id_format(manuscript=manuscript)
+        return default_elocation_id(manuscript)
+
+    def xml_filename(self, manuscript):
+        return self.xml_filename_format(manuscript=manuscript)
+
+    def steps(self, sections=None):
+        """
+        set of the sections to build and the names of the BUILD_STEPS to run,
+        raise ValueError for sections not in SECTION_NAMES
+        """
+        key = ALL_SECTIONS if sections is None else tuple(sections)
+        if key not in self.section_steps:
+            unknown_sections = [name for name in key if name not in SECTION_NAMES]
+            if unknown_sections:
+                raise ValueError("Unknown sections %s" % unknown_sections)
+            section_set = frozenset(key)
+            self.section_steps[key] = (
+                section_set,
+                [
+                    method_name
+                    for method_name, step_sections in BUILD_STEPS
+                    if section_set.intersection(step_sections)
+                ],
+            )
+        return self.section_steps[key]
+
+
 class ArticleBuildContext:
     "keep track of iterators and properties when building an ArticleXML object"
 
@@ -33,65 +212,157 @@ class ArticleBuildContext:
         # author aff count, and dict of author affiliations by index
         self.author_aff_count = 0
         self.author_affs = {}
-        # contributor conflict count, incremented when printing contrib xref
-        self.conflict_count = 0
+        # conflict footnote ids and text for the contrib xref tags and fn-group
+        self.conflict_plan = None
+        # contributors partitioned by type, corresp and copyright holder
+        self.contributors = None
+
+
+def jats_doctype():
+    public_id = (
+        "-//NLM//DTD JATS (Z39.96) Journal Archiving and Interchange "
+        + "DTD v1.1d3 20150301//EN"
+    )
+    system_id = "JATS-archivearticle1.dtd"
+    qualified_name = "article"
+
+    doctype = xmlio.ElifeDocumentType(qualified_name)
+    doctype._identified_mixin_init(public_id, system_id)
+    return doctype
+
+
+@functools.lru_cache(maxsize=None)
+def xml_prefix():
+    "XML declaration and doctype which output_xml() writes before the article tag"
+    document = minidom.parseString(b"<article/>")
+    document.insertBefore(jats_doctype(), document.documentElement)
+    xml_string = document.toxml(encoding="utf-8").decode("utf-8")
+    document.unlink()
+    return xml_string[: xml_string.index("<article")]
 
 
 class ArticleXML:
-    def __init__(self, poa_article, jats_config, add_comment=True):
+    def __init__(
+        self,
+        poa_article,
+        jats_config,
+        add_comment=True,
+        sections=None,
+        compact=False,
+        build_plan=None,
+        collectors=None,
+    ):
         """
         set the root node
         get the article type from the object passed in to the class
         set default values for items that are boilder plate for this XML
+        sections is a list of SECTION_NAMES to build, by default ALL_SECTIONS,
+        id values are the same in a partial build as they are in a full build,
+        compact builds a compacttree.Node document which is serialized directly,
+        and converted to the ElementTree root only if root is used,
+        a BuildPlan of the jats_config is compiled unless one is supplied,
+        collectors is a list of collectors.Collector classes, an instance of each
+        is fed the article data as it is built, see collected_outputs()
         """
+        self.document = None
         if not isinstance(poa_article, Article):
             return
 
+        # the builders query the article through a memoized read-only view
+        poa_article = build.ArticleView(poa_article)
+
         # Set the config
         self.jats_config = jats_config
+        if build_plan is None:
+            build_plan = BuildPlan(jats_config)
+        self.build_plan = build_plan
+
+        # Set the sections to build
+        self.sections, self.steps = build_plan.steps(sections)
+
+        # Additional outputs fed during the build
+        self.collectors = [collector_class() for collector_class in collectors or []]
 
         # Track the build context
         self.context = ArticleBuildContext()
+        self.context.contributors = build.ContributorPartition(poa_article.contributors)
+        self.context.conflict_plan = build.ConflictPlan(poa_article)
 
         # Create the root XML node
-        self.root = Element("article")
+        if compact:
+            root = compacttree.Node("article")
+        else:
+            root = Element("article")
 
         if poa_article.article_type:
-            self.root.set("article-type", poa_article.article_type)
-        self.root.set("xmlns:mml", "http://www.w3.org/1998/Math/MathML")
-        self.root.set("xmlns:xlink", "http://www.w3.org/1999/xlink")
-        self.root.set("dtd-version", "1.1d3")
+            root.set("article-type", poa_article.article_type)
+        root.set("xmlns:mml", "http://www.w3.org/1998/Math/MathML")
+        root.set("xmlns:xlink", "http://www.w3.org/1999/xlink")
+        root.set("dtd-version", "1.1d3")
 
         # set comment
         if add_comment:
             generated = time.strftime("%Y-%m-%d %H:%M:%S")
-            last_commit = eautils.get_last_commit_to_master()
-            comment = Comment(
+            last_commit = last_commit_to_master()
+            comment = (compacttree.Comment if compact else Comment)(
                 "generated by "
-                + str(self.jats_config.get("generator"))
+                + self.build_plan.generator
                 + " at "
                 + generated
                 + " from version "
                 + last_commit
             )
-            self.root.append(comment)
+            root.append(comment)
+
+        self.collect("start", poa_article)
+        self.build(root, poa_article)
+        if compact:
+            self.document = root
+        else:
+            self.root = root
+
+    def __getattr__(self, name):
+        # convert the compact document to the ElementTree root when it is first used
+        if name == "root" and self.__dict__.get("document") is not None:
+            self.root = compacttree.to_element(self.document)
+            return self.root
+        raise AttributeError(name)
+
+    def collect(self, hook_name, *args):
+        "pass the values to the hook of each collector"
+        for collector in self.collectors:
+            getattr(collector, hook_name)(*args)
+
+    def collect_date(self, poa_article, date_type):
+        date = poa_article.get_date(date_type)
+        if date:
+            self.collect("date", date_type, date)
+
+    def collected_outputs(self):
+        "OrderedDict of the output bytes of each collector keyed on its extension"
+        return OrderedDict(
+            (collector.extension, collector.output()) for collector in self.collectors
+        )
 
-        if poa_article.conflict_default:
-            # conf1 is reserved for the default conflict value, so increment now
-            self.context.conflict_count += 1
+    def is_built(self):
+        "whether there is a root element or compact document to output"
+        return "root" in self.__dict__ or self.__dict__.get("document") is not None
 
-        self.build(self.root, poa_article)
+    def includes(self, *section_names):
+        "whether any of the sections are included in the build"
+        return bool(self.sections.intersection(section_names))
 
     def build(self, root, poa_article):
-        self.set_frontmatter(root, poa_article)
         # self.set_title(self.root, poa_article)
-        self.set_backmatter(root, poa_article)
-        build.set_sub_articles(root, poa_article)
+        for method_name in self.steps:
+            getattr(self, method_name)(root, poa_article)
 
     def set_frontmatter(self, parent, poa_article):
         front = SubElement(parent, "front")
-        self.set_journal_meta(front)
-        self.set_article_meta(front, poa_article)
+        if self.includes(JOURNAL_META):
+            self.set_journal_meta(front)
+        if self.includes(ARTICLE_META, CONTRIB_GROUP):
+            self.set_article_meta(front, poa_article)
         return front
 
     def set_backmatter(self, parent, poa_article):
@@ -108,7 +379,9 @@ class ArticleXML:
             info_sec_title = SubElement(info_sec, "title")
             info_sec_title.text = "Additional information"
             if poa_article.has_contributor_conflict() or poa_article.conflict_default:
-                build.set_fn_group_competing_interest(info_sec, poa_article)
+                build.set_fn_group_competing_interest(
+                    info_sec, poa_article, self.context.conflict_plan
+                )
             if poa_article.ethics:
                 build.set_fn_group_ethics_information(info_sec, poa_article)
             if poa_article.datasets or poa_article.data_availability:
@@ -118,6 +391,9 @@ class ArticleXML:
                 data_sec = self.set_section(supp_sec, "data-availability")
                 self.set_article_datasets(data_sec, poa_article)
 
+    def set_sub_articles(self, parent, poa_article):
+        build.set_sub_articles(parent, poa_article)
+
     def set_section(self, parent, sec_type):
         self.context.sec_count += 1
         sec = SubElement(parent, "sec")
@@ -128,6 +404,11 @@ class ArticleXML:
     def set_article_meta(self, parent, poa_article):
         article_meta = SubElement(parent, "article-meta")
 
+        if not self.includes(ARTICLE_META):
+            # only the contrib-group tags were requested
+            self.set_contrib_groups(article_meta, poa_article)
+            return article_meta
+
         # article-id pub-id-type="publisher-id"
         if poa_article.manuscript:
             pub_id_type = "publisher-id"
@@ -156,40 +437,40 @@ class ArticleXML:
         if poa_article.title:
             build.set_title_group(article_meta, poa_article)
 
-        if poa_article.contributors:
-            for contrib_type in self.jats_config.get("contrib_types"):
-                self.set_contrib_group(article_meta, poa_article, contrib_type)
+        self.set_contrib_groups(article_meta, poa_article)
 
-        if bool(
-            [contrib for contrib in poa_article.contributors if contrib.corresp is True]
-        ):
-            build.set_author_notes(article_meta, poa_article)
+        if self.context.contributors.corresp:
+            build.set_author_notes(
+                article_meta, poa_article, self.context.contributors.corresp
+            )
 
         build.set_pub_date(article_meta, poa_article, "pub")
+        self.collect_date(poa_article, "pub")
 
         build.set_pub_date(article_meta, poa_article, "posted_date")
+        self.collect_date(poa_article, "posted_date")
 
         build.set_volume(article_meta, poa_article)
 
         if poa_article.manuscript:
             elocation_id = SubElement(article_meta, "elocation-id")
-            if "elocation_id_pattern" in self.jats_config:
-                elocation_id.text = self.jats_config.get("elocation_id_pattern").format(
-                    manuscript=poa_article.manuscript
-                )
-            else:
-                elocation_id.text = "e" + str(int(poa_article.manuscript)).zfill(5)
+            elocation_id.text = self.build_plan.elocation_id(poa_article.manuscript)
 
         if poa_article.dates:
             build.set_history(
-                article_meta, poa_article, self.jats_config.get("history_date_types")
+                article_meta, poa_article, self.build_plan.history_date_types
             )
+            if self.collectors:
+                for date_type in self.build_plan.history_date_types:
+                    self.collect_date(poa_article, date_type)
 
         if poa_article.publication_history:
             build.set_publication_history(article_meta, poa_article)
 
         if poa_article.license:
-            build.set_permissions(article_meta, poa_article)
+            build.set_permissions(
+                article_meta, poa_article, self.context.contributors.copyright_holders
+            )
 
         if poa_article.abstract:
             build.set_abstract(article_meta, poa_article)
@@ -203,6 +484,9 @@ class ArticleXML:
 
         if poa_article.funding_awards or poa_article.funding_note:
             build.set_funding_group(article_meta, poa_article)
+            if self.collectors:
+                for award in poa_article.funding_awards:
+                    self.collect("funding_award", award)
 
         return article_meta
 
@@ -241,28 +525,22 @@ class ArticleXML:
         journal_meta = SubElement(parent, "journal-meta")
 
         # journal-id
-        for journal_id_type in self.jats_config.get("journal_id_types"):
-            # concatenate the config name to look for the value
-            config_name = "journal_id_" + journal_id_type
-            journal_id_value = self.jats_config.get(config_name)
-            if journal_id_value:
-                journal_id = SubElement(journal_meta, "journal-id")
-                journal_id.set("journal-id-type", journal_id_type)
-                journal_id.text = journal_id_value
+        for journal_id_type, journal_id_value in self.build_plan.journal_ids:
+            journal_id = SubElement(journal_meta, "journal-id")
+            journal_id.set("journal-id-type", journal_id_type)
+            journal_id.text = journal_id_value
         #
-        build.set_journal_title_group(
-            journal_meta, self.jats_config.get("journal_title")
-        )
+        build.set_journal_title_group(journal_meta, self.build_plan.journal_title)
 
         # title-group
         issn = SubElement(journal_meta, "issn")
-        issn.text = self.jats_config.get("journal_issn")
+        issn.text = self.build_plan.journal_issn
         issn.set("publication-format", "electronic")
 
         # publisher
         publisher = SubElement(journal_meta, "publisher")
         publisher_name = SubElement(publisher, "publisher-name")
-        publisher_name.text = self.jats_config.get("publisher_name")
+        publisher_name.text = self.build_plan.publisher_name
 
     def get_aff_id(self, affiliation):
         """
@@ -298,9 +576,11 @@ class ArticleXML:
         build.set_contrib_role(contrib_tag, contrib_type)
         build.set_contrib_orcid(contrib_tag, contributor)
 
+        aff_ids = [] if contrib_type != "editor" else None
         for affiliation in contributor.affiliations:
             if contrib_type != "editor":
                 aff_id = self.get_aff_id(affiliation)
+                aff_ids.append(aff_id)
                 rid = "aff" + str(aff_id)
                 xref_tag = SubElement(contrib_tag, "xref")
                 xref_tag.set("ref-type", "aff")
@@ -309,6 +589,7 @@ class ArticleXML:
             else:
                 # For editors add an inline aff tag
                 build.set_aff(contrib_tag, affiliation, contrib_type, aff_id=None)
+        self.collect("contributor", contrib_type, contributor, aff_ids)
 
         if contributor.corresp is True:
             self.context.corresp_count += 1
@@ -319,26 +600,21 @@ class ArticleXML:
         build.set_contrib_funding(contrib_tag, poa_article, contributor)
 
         # Contributor conflict xref tag logic
-        conflict_rid = None
-        if contributor.conflict:
-            self.context.conflict_count += 1
-            conflict_rid = "conf" + str(self.context.conflict_count)
-        elif poa_article.conflict_default:
-            conflict_rid = "conf1"
+        conflict_rid = self.context.conflict_plan.get_rid(contributor)
         build.set_contrib_conflict(contrib_tag, contrib_type, conflict_rid)
 
+    def set_contrib_groups(self, parent, poa_article):
+        if poa_article.contributors:
+            for contrib_type in self.build_plan.contrib_types:
+                self.set_contrib_group(parent, poa_article, contrib_type)
+
     def set_contrib_group(self, parent, poa_article, contrib_type=None):
         # If contrib_type is None, all contributors will be added regardless of their type
         contrib_group = SubElement(parent, "contrib-group")
         if contrib_type == "editor":
             contrib_group.set("content-type", "section")
 
-        for contributor in poa_article.contributors:
-            if contrib_type:
-                # Filter by contrib_type if supplied
-                if contributor.contrib_type != contrib_type:
-                    continue
-
+        for contributor in self.context.contributors.get_contributors(contrib_type):
             self.set_contrib(contrib_group, poa_article, contributor, contrib_type)
 
         # Add the aff tags
@@ -346,18 +622,15 @@ class ArticleXML:
             for key, value in self.context.author_affs.items():
                 aff_id = "aff" + str(key)
                 build.set_aff(contrib_group, value, contrib_type, aff_id)
+                self.collect("affiliation", key, value)
 
     def output_xml(self, pretty=False, indent=""):
-        public_id = (
-            "-//NLM//DTD JATS (Z39.96) Journal Archiving and Interchange "
-            + "DTD v1.1d3 20150301//EN"
-        )
-        system_id = "JATS-archivearticle1.dtd"
         encoding = "utf-8"
-        qualified_name = "article"
+        if "root" not in self.__dict__ and self.document is not None and not pretty:
+            # the compact document serializes to the same bytes as minidom
+            return compacttree.tostring(self.document, xml_prefix(), encoding)
 
-        doctype = xmlio.ElifeDocumentType(qualified_name)
-        doctype._identified_mixin_init(public_id, system_id)
+        doctype = jats_doctype()
 
         rough_string = ElementTree.tostring(self.root, encoding)
         reparsed = minidom.parseString(rough_string)
@@ -365,73 +638,233 @@ class ArticleXML:
             reparsed.insertBefore(doctype, reparsed.documentElement)
 
         if pretty is True:
-            return reparsed.toprettyxml(indent, encoding=encoding)
-        return reparsed.toxml(encoding=encoding)
+            xml_bytes = reparsed.toprettyxml(indent, encoding=encoding)
+        else:
+            xml_bytes = reparsed.toxml(encoding=encoding)
+        # break the minidom reference cycles now rather than waiting for the gc
+        reparsed.unlink()
+        return xml_bytes
+
+    def release(self):
+        "drop the element tree and build context once the output is produced"
+        if "root" in self.__dict__:
+            self.root.clear()
+            del self.root
+        self.document = None
+        self.context = None
+        self.jats_config = None
+        self.build_plan = None
+        self.collectors = []
 
 
 def write_xml_to_disk(article_xml, filename, output_dir=None):
-    filename_path = filename
-    if output_dir:
-        filename_path = output_dir + os.sep + filename
-    with open(filename_path, "wb") as open_file:
-        open_file.write(article_xml.output_xml())
-
-
-def build_article_from_csv(article_id, jats_config=None):
-    "build article objects populated with csv data"
-    if not jats_config:
-        jats_config = parse_raw_config(raw_config(None))
-    article, error_count, error_messages = parse.build_article(article_id)
+    "article_xml is an ArticleXML object or the already serialized XML bytes"
+    xml_bytes = article_xml
+    if isinstance(article_xml, ArticleXML):
+        xml_bytes = article_xml.output_xml()
+    output.write_bytes_to_disk(xml_bytes, filename, output_dir)
+
+
+def build_article_from_csv(
+    article_id, jats_config=None, errors=None, generation_context=None
+):
+    """
+    build article objects populated with csv data,
+    if an errors list is supplied the parsing error messages are added to it
+    """
+    if not generation_context:
+        generation_context = GenerationContext(jats_config=jats_config)
+    logger = generation_context.logger
+    with generation_context.csv_source():
+        article, error_count, error_messages = parse.build_article(article_id)
+    if errors is not None and error_messages:
+        errors.extend(error_messages)
     if article:
         return article
-    LOGGER.warning(
+    logger.warning(
         "the following article did not have enough components and "
         + "xml was not generated %s",
         article_id,
     )
-    LOGGER.warning("warning count was %s", error_count)
+    logger.warning("warning count was %s", error_count)
     if error_messages:
-        LOGGER.warning(", ".join(error_messages))
+        logger.warning(", ".join(error_messages))
     return False
 
 
-def build_xml(article_id, article=None, jats_config=None, add_comment=True):
-    "generate xml from an article object"
+def build_xml(
+    article_id,
+    article=None,
+    jats_config=None,
+    add_comment=True,
+    sections=None,
+    generation_context=None,
+    compact=False,
+    collectors=None,
+):
+    """
+    generate xml from an article object, optionally only the sections listed,
+    into a compacttree document if compact is True,
+    feeding an instance of each of the collectors classes as it is built
+    """
+    if not generation_context:
+        generation_context = GenerationContext(jats_config=jats_config)
     if not jats_config:
-        jats_config = parse_raw_config(raw_config(None))
+        jats_config = generation_context.jats_config
+    logger = generation_context.logger
 
     if not article:
-        article = build_article_from_csv(article_id, jats_config)
+        article = build_article_from_csv(
+            article_id, jats_config, generation_context=generation_context
+        )
         if not hasattr(article, "manuscript"):
-            LOGGER.info("could not build article for %s", article_id)
+            logger.info("could not build article for %s", article_id)
             return None
 
-    article_xml = ArticleXML(article, jats_config, add_comment)
-    if hasattr(article_xml, "root"):
-        LOGGER.info("generated xml for %s", article_id)
+    article_xml = ArticleXML(
+        article,
+        jats_config,
+        add_comment,
+        sections,
+        compact,
+        generation_context.build_plan(jats_config),
+        collectors,
+    )
+    if article_xml.is_built():
+        logger.info("generated xml for %s", article_id)
         return article_xml
     return None
 
 
-def build_xml_to_disk(article_id, article=None, jats_config=None, add_comment=True):
-    "generate xml from an article object and write to disk"
+def build_xml_bytes(
+    article_id,
+    article=None,
+    jats_config=None,
+    add_comment=True,
+    pretty=False,
+    indent="",
+    sections=None,
+    metrics=None,
+    generation_context=None,
+    compact=False,
+    collectors=None,
+    outputs=None,
+):
+    """
+    generate xml from an article object and return only the bytes,
+    the element tree and build context are released as soon as it is serialized,
+    with compact the builders write into a compacttree document instead,
+    the output bytes of the collectors are added to the outputs dict if supplied,
+    build and serialize times and counts are recorded in metrics if supplied
+    """
+    start_time = time.time()
+    article_xml = build_xml(
+        article_id,
+        article,
+        jats_config,
+        add_comment,
+        sections,
+        generation_context,
+        compact,
+        collectors,
+    )
+    if metrics:
+        metrics.build_time = time.time() - start_time
+    if not article_xml:
+        return None
+    start_time = time.time()
+    xml_bytes = article_xml.output_xml(pretty, indent)
+    if metrics:
+        metrics.serialize_time = time.time() - start_time
+        metrics.set_counts(article_xml.context)
+    if outputs is not None:
+        outputs.update(article_xml.collected_outputs())
+    article_xml.release()
+    return xml_bytes
+
+
+def build_xml_to_disk(
+    article_id,
+    article=None,
+    jats_config=None,
+    add_comment=True,
+    sink=None,
+    metrics=None,
+    generation_context=None,
+    collectors=None,
+):
+    """
+    generate xml from an article object and write to disk,
+    or write it to the sink if one is supplied, e.g. an output.ZipSink,
+    a run of many articles passes one output.run_sink() so that a sharded or
+    group committed target_output_dir is opened once, with no sink a single
+    article is written into the shard layout but is not group committed,
+    the output of each of the collectors classes is written alongside it,
+    timings, sizes and errors are recorded in metrics.ArticleMetrics if supplied
+    """
+    if not generation_context:
+        generation_context = GenerationContext(jats_config=jats_config)
     if not jats_config:
-        jats_config = parse_raw_config(raw_config(None))
+        jats_config = generation_context.jats_config
+    logger = generation_context.logger
     if not article:
-        article = build_article_from_csv(article_id, jats_config)
-    article_xml = build_xml(article_id, article, jats_config, add_comment)
-    if article_xml and hasattr(article_xml, "root"):
-        filename = jats_config.get("xml_filename_pattern").format(
-            manuscript=article.manuscript
+        start_time = time.time()
+        errors = metrics.error_messages if metrics else None
+        article = build_article_from_csv(
+            article_id, jats_config, errors, generation_context
         )
+        if metrics:
+            metrics.parse_time = time.time() - start_time
+        if not article:
+            if metrics:
+                metrics.set_error(run_metrics.CATEGORY_NO_ARTICLE)
+            logger.error("could not generate xml to disk for %s", article_id)
+            return False
+    outputs = OrderedDict()
+    xml_bytes = build_xml_bytes(
+        article_id,
+        article,
+        jats_config,
+        add_comment,
+        metrics=metrics,
+        generation_context=generation_context,
+        collectors=collectors,
+        outputs=outputs,
+    )
+    if xml_bytes:
+        filename = generation_context.build_plan(jats_config).xml_filename(
+            article.manuscript
+        )
+        files = [(filename, xml_bytes)] + [
+            (output_filename(filename, extension), output_bytes)
+            for extension, output_bytes in outputs.items()
+        ]
         try:
-            output_dir = jats_config.get("target_output_dir")
-            write_xml_to_disk(article_xml, filename, output_dir)
-            LOGGER.info("xml written for %s", article_id)
+            start_time = time.time()
+            if sink:
+                for file_name, file_bytes in files:
+                    sink.write(file_name, file_bytes)
+            elif jats_config.get("shard_layout"):
+                with output.ShardedSink.from_config(jats_config) as sharded_sink:
+                    for file_name, file_bytes in files:
+                        sharded_sink.write(file_name, file_bytes)
+            else:
+                output_dir = jats_config.get("target_output_dir")
+                for file_name, file_bytes in files:
+                    write_xml_to_disk(file_bytes, file_name, output_dir)
+            if metrics:
+                metrics.write_time = time.time() - start_time
+                metrics.bytes_written = len(xml_bytes)
+                metrics.success = True
+            logger.info("xml written for %s", article_id)
             print("written " + str(article_id))
             return True
         except IOError:
-            LOGGER.error("could not write xml for %s", article_id)
+            if metrics:
+                metrics.set_error(run_metrics.CATEGORY_WRITE_ERROR)
+            logger.error("could not write xml for %s", article_id)
             return False
-    LOGGER.error("could not generate xml to disk for %s", article_id)
+    if metrics:
+        metrics.set_error(run_metrics.CATEGORY_BUILD_ERROR)
+    logger.error("could not generate xml to disk for %s", article_id)
     return False
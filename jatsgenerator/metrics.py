@@ -0,0 +1,227 @@
+"""Machine-readable metrics of generation runs"""
+
+import json
+import math
+import re
+import threading
+import time
+from collections import deque, OrderedDict
+
+# error categories when an article is not generated
+CATEGORY_NO_ARTICLE = "no_article"
+CATEGORY_BUILD_ERROR = "build_error"
+CATEGORY_WRITE_ERROR = "write_error"
+
+# build_article_from_csv error messages end with the name of the failed function
+ERROR_MESSAGE_PATTERN = re.compile(r"error in (\w+)$")
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+METRIC_PREFIX = "jatsgenerator"
+
+
+def error_categories(error_messages):
+    "list of categories from build_article_from_csv error messages"
+    categories = []
+    for message in error_messages:
+        matches = ERROR_MESSAGE_PATTERN.search(message)
+        category = matches.group(1) if matches else CATEGORY_BUILD_ERROR
+        if category not in categories:
+            categories.append(category)
+    return categories
+
+
+class ArticleMetrics:
+    "timings, sizes and counts of generating one article"
+
+    def __init__(self, article_id):
+        self.article_id = article_id
+        self.success = False
+        self.parse_time = None
+        self.build_time = None
+        self.serialize_time = None
+        self.write_time = None
+        self.bytes_written = None
+        self.author_count = None
+        self.affiliation_count = None
+        self.dataset_count = None
+        self.error_messages = []
+        self.error_category = None
+
+    def set_counts(self, context):
+        "count values from the ArticleBuildContext before it is released"
+        self.author_count = len(context.contributors.get_contributors("author"))
+        self.affiliation_count = context.author_aff_count
+        self.dataset_count = context.dataro_num
+
+    def set_error(self, default_category):
+        "set the error category from the error messages, or to the default"
+        categories = error_categories(self.error_messages)
+        if categories:
+            self.error_category = ",".join(categories)
+        else:
+            self.error_category = default_category
+
+    def to_dict(self):
+        return OrderedDict(
+            [
+                ("article_id", self.article_id),
+                ("success", self.success),
+                ("parse_time", self.parse_time),
+                ("build_time", self.build_time),
+                ("serialize_time", self.serialize_time),
+                ("write_time", self.write_time),
+                ("bytes_written", self.bytes_written),
+                ("author_count", self.author_count),
+                ("affiliation_count", self.affiliation_count),
+                ("dataset_count", self.dataset_count),
+                ("error_category", self.error_category),
+                ("error_messages", self.error_messages),
+            ]
+        )
+
+
+def quantile(values, fraction):
+    "nearest-rank quantile of a list of numbers"
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, int(math.ceil(fraction * len(ordered))) - 1)
+    return ordered[index]
+
+
+class RunReport:
+    """
+    collect ArticleMetrics for a run and export them,
+    with max_articles only the most recent are kept, e.g. for a long-running service,
+    articles can be added by one thread while another exports them
+    """
+
+    def __init__(self, max_articles=None):
+        self.start_time = time.time()
+        self.articles = deque(maxlen=max_articles)
+        self._lock = threading.Lock()
+
+    def add(self, article_metrics):
+        with self._lock:
+            self.articles.append(article_metrics)
+
+    def article_list(self):
+        "copy of the articles to iterate over while more are added"
+        with self._lock:
+            return list(self.articles)
+
+    def values(self, attribute, articles=None):
+        if articles is None:
+            articles = self.article_list()
+        return [
+            getattr(article_metrics, attribute)
+            for article_metrics in articles
+            if getattr(article_metrics, attribute) is not None
+        ]
+
+    def json_lines(self):
+        "one JSON document per article"
+        return "".join(
+            json.dumps(article_metrics.to_dict()) + "\n"
+            for article_metrics in self.article_list()
+        )
+
+    def write_json_lines(self, path):
+        with open(path, "w") as open_file:
+            open_file.write(self.json_lines())
+
+    def summary_lines(self, name, attribute, help_text, articles=None):
+        lines = [
+            "# HELP %s_%s %s" % (METRIC_PREFIX, name, help_text),
+            "# TYPE %s_%s summary" % (METRIC_PREFIX, name),
+        ]
+        values = self.values(attribute, articles)
+        for fraction in QUANTILES:
+            value = quantile(values, fraction)
+            lines.append(
+                '%s_%s{quantile="%s"} %s'
+                % (METRIC_PREFIX, name, fraction, "NaN" if value is None else value)
+            )
+        lines.append("%s_%s_sum %s" % (METRIC_PREFIX, name, sum(values)))
+        lines.append("%s_%s_count %s" % (METRIC_PREFIX, name, len(values)))
+        return lines
+
+    def prometheus_text(self):
+        "metrics for the run in the Prometheus text exposition format"
+        articles = self.article_list()
+        successes = len([item for item in articles if item.success])
+        lines = [
+            "# HELP %s_articles_total Articles processed by result" % METRIC_PREFIX,
+            "# TYPE %s_articles_total counter" % METRIC_PREFIX,
+            '%s_articles_total{result="success"} %s' % (METRIC_PREFIX, successes),
+            '%s_articles_total{result="failure"} %s'
+            % (METRIC_PREFIX, len(articles) - successes),
+        ]
+        category_counts = OrderedDict()
+        for article_metrics in articles:
+            if article_metrics.error_category:
+                for category in article_metrics.error_category.split(","):
+                    category_counts[category] = category_counts.get(category, 0) + 1
+        lines.append(
+            "# HELP %s_article_errors_total Failed articles by error category"
+            % METRIC_PREFIX
+        )
+        lines.append("# TYPE %s_article_errors_total counter" % METRIC_PREFIX)
+        for category, count in category_counts.items():
+            lines.append(
+                '%s_article_errors_total{category="%s"} %s'
+                % (METRIC_PREFIX, category, count)
+            )
+        lines += self.summary_lines(
+            "parse_seconds",
+            "parse_time",
+            "Time parsing the CSV data per article",
+            articles,
+        )
+        lines += self.summary_lines(
+            "build_seconds", "build_time", "Time building the XML per article", articles
+        )
+        lines += self.summary_lines(
+            "serialize_seconds",
+            "serialize_time",
+            "Time serializing per article",
+            articles,
+        )
+        lines += self.summary_lines(
+            "written_bytes",
+            "bytes_written",
+            "Size of the XML written per article",
+            articles,
+        )
+        for name, attribute in [
+            ("authors", "author_count"),
+            ("affiliations", "affiliation_count"),
+            ("datasets", "dataset_count"),
+        ]:
+            lines.append(
+                "# HELP %s_%s_total Count of %s in generated articles"
+                % (METRIC_PREFIX, name, name)
+            )
+            lines.append("# TYPE %s_%s_total counter" % (METRIC_PREFIX, name))
+            lines.append(
+                "%s_%s_total %s"
+                % (METRIC_PREFIX, name, sum(self.values(attribute, articles)))
+            )
+        lines.append("# HELP %s_run_seconds Time since the run started" % METRIC_PREFIX)
+        lines.append("# TYPE %s_run_seconds gauge" % METRIC_PREFIX)
+        lines.append(
+            "%s_run_seconds %s" % (METRIC_PREFIX, time.time() - self.start_time)
+        )
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        with open(path, "w") as open_file:
+            open_file.write(self.prometheus_text())
+
+    def write(self, json_lines_path=None, prometheus_path=None):
+        "write the report files which have a path"
+        if json_lines_path:
+            self.write_json_lines(json_lines_path)
+        if prometheus_path:
+            self.write_prometheus(prometheus_path)
@@ -0,0 +1,70 @@
+"""Memoized string normalizers called repeatedly while building the XML"""
+
+import functools
+from collections import OrderedDict
+from elifetools import utils as etoolsutils
+from jatsgenerator import utils
+
+# cache of each memoized normalizer keyed on its name
+CACHES = OrderedDict(
+    [
+        ("fragments", utils.FRAGMENT_CACHE),
+        ("namespaces", utils.NAMESPACES_CACHE),
+    ]
+)
+
+# distinguish a cached None result from a cache miss
+_MISSING = object()
+
+
+def memoize(name, maxsize=4096):
+    "memoize a function of one string argument in a utils.LRUCache"
+
+    def decorator(function):
+        cache = utils.LRUCache(maxsize=maxsize)
+        CACHES[name] = cache
+
+        @functools.wraps(function)
+        def wrapper(value):
+            try:
+                result = cache.get(value, _MISSING)
+            except TypeError:
+                # unhashable value, do not cache it
+                return function(value)
+            if result is _MISSING:
+                result = function(value)
+                cache.put(value, result)
+            return result
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+@memoize("orcid")
+def orcid_uri_to_orcid(value):
+    "ORCID identifier from an ORCID URI"
+    return etoolsutils.orcid_uri_to_orcid(value)
+
+
+@memoize("entity")
+def entity_to_unicode(value):
+    "replace entities in the string with unicode characters"
+    return etoolsutils.entity_to_unicode(value)
+
+
+@memoize("object_id")
+def object_id_from_uri(value):
+    "DOI portion of a related object URI"
+    return utils.object_id_from_uri(value)
+
+
+def cache_stats():
+    "OrderedDict of the stats of each cache keyed on its name"
+    return OrderedDict((name, cache.stats()) for name, cache in CACHES.items())
+
+
+def clear_caches():
+    for cache in CACHES.values():
+        cache.clear()
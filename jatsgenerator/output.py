@@ -0,0 +1,434 @@
+"""Output sinks for writing generated JATS XML"""
+
+import gzip
+import hashlib
+import io
+import os
+import re
+import shutil
+import tempfile
+import threading
+import tarfile
+import time
+import zipfile
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# shard_layout config values
+SHARD_LAYOUT_PREFIX = "prefix"
+SHARD_LAYOUT_HASH = "hash"
+SHARD_INDEX_FILENAME = "index.tsv"
+
+# the digits of the manuscript number in an XML filename
+MANUSCRIPT_PATTERN = re.compile(r"(\d+)\D*$")
+
+
+def write_bytes_to_disk(xml_bytes, filename, output_dir=None):
+    "write the XML bytes to a file, in the output_dir if specified"
+    filename_path = filename
+    if output_dir:
+        filename_path = output_dir + os.sep + filename
+    with open(filename_path, "wb") as open_file:
+        open_file.write(xml_bytes)
+    return filename_path
+
+
+class OutputSink:
+    "base class for destinations generated XML is written to"
+
+    # whether write() can be called from more than one thread at once
+    thread_safe = False
+
+    def write(self, filename, xml_bytes):
+        raise NotImplementedError
+
+    def after_commit(self, callback):
+        "call the callback once the files written so far are committed"
+        callback()
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class DirectorySink(OutputSink):
+    "write each XML file into a directory"
+
+    thread_safe = True
+
+    def __init__(self, output_dir=None):
+        self.output_dir = output_dir
+
+    def write(self, filename, xml_bytes):
+        return write_bytes_to_disk(xml_bytes, filename, self.output_dir)
+
+
+class GzipSink(DirectorySink):
+    "write each XML file gzip compressed, with a .gz extension, into a directory"
+
+    def __init__(self, output_dir=None, compresslevel=9):
+        super().__init__(output_dir)
+        self.compresslevel = compresslevel
+
+    def write(self, filename, xml_bytes):
+        filename_path = filename + ".gz"
+        if self.output_dir:
+            filename_path = self.output_dir + os.sep + filename_path
+        with gzip.open(filename_path, "wb", self.compresslevel) as open_file:
+            open_file.write(xml_bytes)
+        return filename_path
+
+
+class ZipSink(OutputSink):
+    "write each XML file as an entry in a zip file"
+
+    def __init__(self, zip_file_path, compression=zipfile.ZIP_DEFLATED):
+        self.zip_file_path = zip_file_path
+        self.zip_file = zipfile.ZipFile(zip_file_path, "w", compression)
+
+    def write(self, filename, xml_bytes):
+        self.zip_file.writestr(filename, xml_bytes)
+        return filename
+
+    def close(self):
+        self.zip_file.close()
+
+
+class TarSink(OutputSink):
+    "write each XML file as an entry in a tar file, gzip compressed if the name says so"
+
+    def __init__(self, tar_file_path):
+        self.tar_file_path = tar_file_path
+        mode = "w"
+        if tar_file_path.endswith(".tar.gz") or tar_file_path.endswith(".tgz"):
+            mode = "w:gz"
+        self.tar_file = tarfile.open(tar_file_path, mode)
+
+    def write(self, filename, xml_bytes):
+        tar_info = tarfile.TarInfo(filename)
+        tar_info.size = len(xml_bytes)
+        tar_info.mtime = int(time.time())
+        self.tar_file.addfile(tar_info, io.BytesIO(xml_bytes))
+        return filename
+
+    def close(self):
+        self.tar_file.close()
+
+
+def shard_dirs(filename, layout, depth=1, width=2):
+    """
+    list of the nested subdirectory names for the file in the shard layout,
+    prefix uses the leading digits of the zero padded manuscript number,
+    hash uses the leading characters of the sha1 hex digest of the filename
+    """
+    if layout == SHARD_LAYOUT_PREFIX:
+        matches = MANUSCRIPT_PATTERN.search(filename)
+        key = (matches.group(1) if matches else filename).zfill(depth * width)
+    elif layout == SHARD_LAYOUT_HASH:
+        key = hashlib.sha1(filename.encode("utf8")).hexdigest()
+    else:
+        raise ValueError("Unknown shard_layout %s" % layout)
+    return [key[index * width : (index + 1) * width] for index in range(depth)]
+
+
+class ShardedSink(OutputSink):
+    """
+    write each XML file into a subdirectory of output_dir chosen by the shard layout,
+    the filename and relative path of each file are merged into the index file when
+    the sink is closed, so it keeps one line per filename across runs
+    """
+
+    thread_safe = True
+
+    def __init__(
+        self,
+        output_dir=None,
+        layout=SHARD_LAYOUT_HASH,
+        depth=1,
+        width=2,
+        index_filename=SHARD_INDEX_FILENAME,
+    ):
+        self.output_dir = output_dir
+        self.layout = layout
+        self.depth = depth
+        self.width = width
+        self.index_filename = index_filename
+        # relative path of each file written keyed on its filename
+        self.index_entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, jats_config, output_dir=None):
+        """
+        sink with the shard options from the config, and target_output_dir by default,
+        raise ValueError if a group_commit_size is also configured, since sharded
+        files are not group committed
+        """
+        if jats_config.get("group_commit_size"):
+            raise ValueError(
+                "shard_layout and group_commit_size cannot be configured together"
+            )
+        return cls(
+            output_dir or jats_config.get("target_output_dir"),
+            jats_config.get("shard_layout"),
+            jats_config.get("shard_depth", 1),
+            jats_config.get("shard_width", 2),
+            jats_config.get("shard_index_filename", SHARD_INDEX_FILENAME),
+        )
+
+    def path(self, filename):
+        "path of the file relative to the output_dir"
+        return os.path.join(
+            *(shard_dirs(filename, self.layout, self.depth, self.width) + [filename])
+        )
+
+    def write(self, filename, xml_bytes):
+        path = self.path(filename)
+        directory = os.path.dirname(path)
+        if self.output_dir:
+            directory = os.path.join(self.output_dir, directory)
+        os.makedirs(directory, exist_ok=True)
+        filename_path = write_bytes_to_disk(xml_bytes, path, self.output_dir)
+        if self.index_filename:
+            with self._lock:
+                self.index_entries[filename] = path
+        return filename_path
+
+    def close(self):
+        "merge the files written into the index file and atomically replace it"
+        with self._lock:
+            if not self.index_entries:
+                return
+            index_path = os.path.join(self.output_dir or "", self.index_filename)
+            index = (
+                read_shard_index(self.output_dir, self.index_filename)
+                if os.path.exists(index_path)
+                else {}
+            )
+            index.update(self.index_entries)
+            with tempfile.NamedTemporaryFile(
+                "w",
+                dir=os.path.dirname(index_path) or ".",
+                prefix=".index-",
+                delete=False,
+            ) as index_file:
+                for filename, path in index.items():
+                    index_file.write("%s\t%s\n" % (filename, path))
+                index_file.flush()
+                os.fsync(index_file.fileno())
+            os.replace(index_file.name, index_path)
+            self.index_entries = OrderedDict()
+
+
+class GroupCommitSink(OutputSink):
+    """
+    durable writes into output_dir without the cost of an fsync for each file,
+    files are written to a staging directory, fsynced as a group and then renamed
+    into output_dir, so a file is only in output_dir once its content is on disk,
+    a group is committed when group_size files are staged or, with max_latency,
+    when the oldest staged file has waited max_latency seconds
+    """
+
+    thread_safe = True
+
+    def __init__(self, output_dir=None, group_size=32, max_latency=None):
+        self.output_dir = output_dir or "."
+        self.group_size = group_size
+        self.max_latency = max_latency
+        # on the same file system as output_dir, so the rename is atomic
+        self.staging_dir = tempfile.mkdtemp(prefix=".staging-", dir=self.output_dir)
+        # paths of the staged files, with their final path
+        self.pending = []
+        self.first_pending_time = None
+        self.groups = 0
+        self.files = 0
+        self.fsync_time = 0.0
+        # called after the staged files are committed
+        self.commit_callbacks = []
+        self.closed = False
+        self._condition = threading.Condition()
+        self._thread = None
+        if max_latency:
+            self._thread = threading.Thread(target=self.commit_when_due, daemon=True)
+            self._thread.start()
+
+    def write(self, filename, xml_bytes):
+        final_path = os.path.join(self.output_dir, filename)
+        with self._condition:
+            # closed once written, so a large group does not hold a file open each
+            with tempfile.NamedTemporaryFile(
+                dir=self.staging_dir, prefix=filename + ".", delete=False
+            ) as staged_file:
+                staged_file.write(xml_bytes)
+            self.pending.append((staged_file.name, final_path))
+            if self.first_pending_time is None:
+                self.first_pending_time = time.time()
+                self._condition.notify()
+            if len(self.pending) >= self.group_size:
+                self.commit()
+        return final_path
+
+    def commit(self):
+        "fsync the staged files, rename them into output_dir, then fsync output_dir"
+        with self._condition:
+            if not self.pending:
+                return
+            start_time = time.time()
+            for staged_path, final_path in self.pending:
+                fsync_file(staged_path)
+            for staged_path, final_path in self.pending:
+                os.replace(staged_path, final_path)
+            fsync_directory(self.output_dir)
+            self.fsync_time += time.time() - start_time
+            self.groups += 1
+            self.files += len(self.pending)
+            self.pending = []
+            self.first_pending_time = None
+            callbacks, self.commit_callbacks = self.commit_callbacks, []
+            for callback in callbacks:
+                callback()
+
+    def after_commit(self, callback):
+        """
+        call the callback once the files staged so far are committed,
+        now if none are staged, a callback is added once per group
+        """
+        with self._condition:
+            if not self.pending:
+                callback()
+            elif callback not in self.commit_callbacks:
+                self.commit_callbacks.append(callback)
+
+    def commit_when_due(self):
+        "commit the staged files once the oldest has waited max_latency seconds"
+        with self._condition:
+            while not self.closed:
+                if self.first_pending_time is None:
+                    self._condition.wait()
+                    continue
+                wait_time = self.first_pending_time + self.max_latency - time.time()
+                if wait_time > 0:
+                    self._condition.wait(wait_time)
+                    continue
+                self.commit()
+
+    def stats(self):
+        return OrderedDict(
+            [
+                ("groups", self.groups),
+                ("files", self.files),
+                ("fsync_time", self.fsync_time),
+            ]
+        )
+
+    def close(self):
+        with self._condition:
+            if self.closed:
+                return
+            self.commit()
+            self.closed = True
+            self._condition.notify()
+        if self._thread:
+            self._thread.join()
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+
+
+def fsync_file(path):
+    "reopen a closed file to fsync its content"
+    file_descriptor = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(file_descriptor)
+    finally:
+        os.close(file_descriptor)
+
+
+def fsync_directory(path):
+    "fsync a directory so the renames into it are on disk, where it is supported"
+    try:
+        directory_fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(directory_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(directory_fd)
+
+
+def read_shard_index(output_dir=None, index_filename=SHARD_INDEX_FILENAME):
+    "dict of the path relative to the output_dir keyed on the XML filename"
+    index = {}
+    with open(os.path.join(output_dir or "", index_filename), "r") as open_file:
+        for line in open_file:
+            filename, path = line.rstrip("\n").split("\t")
+            index[filename] = path
+    return index
+
+
+def group_commit_sink(jats_config, output_dir=None):
+    "GroupCommitSink with the group_commit options from the config"
+    latency_ms = jats_config.get("group_commit_latency_ms")
+    return GroupCommitSink(
+        output_dir or jats_config.get("target_output_dir"),
+        jats_config.get("group_commit_size"),
+        float(latency_ms) / 1000 if latency_ms else None,
+    )
+
+
+def uses_config_sink(jats_config):
+    "whether the config has options for writing the target_output_dir with a sink"
+    return bool(jats_config.get("shard_layout") or jats_config.get("group_commit_size"))
+
+
+def config_sink(jats_config, output_dir=None):
+    """
+    sink for the target_output_dir, sharded if a shard_layout is configured,
+    otherwise group committed if a group_commit_size is configured,
+    a ValueError is raised if both are configured
+    """
+    if jats_config.get("shard_layout"):
+        return ShardedSink.from_config(jats_config, output_dir)
+    if jats_config.get("group_commit_size"):
+        return group_commit_sink(jats_config, output_dir)
+    return DirectorySink(output_dir or jats_config.get("target_output_dir"))
+
+
+@contextmanager
+def run_sink(jats_config, sink=None):
+    """
+    sink for a run of many articles, the supplied sink, otherwise one config_sink()
+    for the whole run if the config has options for it, otherwise None
+    """
+    if sink or not jats_config or not uses_config_sink(jats_config):
+        yield sink
+        return
+    with config_sink(jats_config) as opened_sink:
+        yield opened_sink
+
+
+def is_archive(target):
+    "whether the target path is a .zip, .tar, .tar.gz or .tgz archive file"
+    return bool(target) and target.endswith((".zip", ".tar", ".tar.gz", ".tgz"))
+
+
+def open_sink(target=None, gzip_files=False, jats_config=None):
+    """
+    choose a sink based on the target path,
+    .zip, .tar, .tar.gz and .tgz files are archives, otherwise it is a directory,
+    which is sharded or group committed depending on the jats_config
+    """
+    if target and target.endswith(".zip"):
+        return ZipSink(target)
+    if is_archive(target):
+        return TarSink(target)
+    if gzip_files:
+        return GzipSink(target)
+    if jats_config and uses_config_sink(jats_config):
+        return config_sink(jats_config, target)
+    return DirectorySink(target)
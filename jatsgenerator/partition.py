@@ -0,0 +1,280 @@
+"""Share batch generation between nodes through lease files in a shared directory"""
+
+import json
+import os
+import socket
+import tempfile
+import time
+from collections import OrderedDict
+from jatsgenerator import generate, output
+
+LEASE_SUFFIX = ".lease"
+DONE_SUFFIX = ".done"
+LOG_DIR = "nodes"
+
+
+def default_node_id():
+    return "%s-%s" % (socket.gethostname(), os.getpid())
+
+
+def partition_ranges(article_ids, range_size=100):
+    """
+    list of (range name, article ids) of consecutive ranges of the article ids,
+    every node must be given the same article ids in the same order
+    """
+    return [
+        ("range-%05d" % index, article_ids[start : start + range_size])
+        for index, start in enumerate(range(0, len(article_ids), range_size))
+    ]
+
+
+def write_json_file(path, data):
+    "replace the file atomically with the JSON data"
+    temp_fd, temp_path = tempfile.mkstemp(
+        prefix=os.path.basename(path) + ".", suffix=".tmp", dir=os.path.dirname(path)
+    )
+    with os.fdopen(temp_fd, "w") as open_file:
+        json.dump(data, open_file)
+        open_file.flush()
+        os.fsync(open_file.fileno())
+    os.replace(temp_path, path)
+
+
+def read_json_file(path):
+    "JSON data of the file, None if it does not exist or is being replaced"
+    try:
+        with open(path, "r") as open_file:
+            return json.load(open_file)
+    except (IOError, ValueError):
+        return None
+
+
+class LeaseCoordinator:
+    """
+    claim ranges of article ids with lease files in the shared directory,
+    a lease expires lease_seconds after it was last renewed, so the range of a node
+    which crashed is claimed by another node, node clocks are assumed to agree
+    """
+
+    def __init__(self, shared_dir, node_id=None, lease_seconds=300):
+        self.shared_dir = shared_dir
+        self.node_id = node_id or default_node_id()
+        self.lease_seconds = lease_seconds
+        os.makedirs(os.path.join(shared_dir, LOG_DIR), exist_ok=True)
+
+    def lease_path(self, range_name):
+        return os.path.join(self.shared_dir, range_name + LEASE_SUFFIX)
+
+    def done_path(self, range_name):
+        return os.path.join(self.shared_dir, range_name + DONE_SUFFIX)
+
+    def log_path(self):
+        return os.path.join(self.shared_dir, LOG_DIR, self.node_id + ".log")
+
+    def log(self, message):
+        "append a line to the completion log of this node"
+        with open(self.log_path(), "a") as open_file:
+            open_file.write(
+                "%s %s %s\n"
+                % (time.strftime("%Y-%m-%dT%H:%M:%S"), self.node_id, message)
+            )
+
+    def lease_data(self):
+        return {"node_id": self.node_id, "expires": time.time() + self.lease_seconds}
+
+    def is_done(self, range_name):
+        return os.path.exists(self.done_path(range_name))
+
+    def create_lease(self, range_name):
+        "create the lease file only if it does not exist"
+        try:
+            lease_fd = os.open(
+                self.lease_path(range_name), os.O_CREAT | os.O_EXCL | os.O_WRONLY
+            )
+        except FileExistsError:
+            return False
+        with os.fdopen(lease_fd, "w") as open_file:
+            json.dump(self.lease_data(), open_file)
+        return True
+
+    def lease_expires(self, path):
+        """
+        expiry time of the lease file, None if it does not exist,
+        a lease which is still being written expires lease_seconds after it was created
+        """
+        lease = read_json_file(path)
+        if lease:
+            return lease.get("expires", 0)
+        try:
+            return os.path.getmtime(path) + self.lease_seconds
+        except OSError:
+            return None
+
+    def expire_lease(self, range_name):
+        "move an expired lease out of the way, only one node succeeds in doing so"
+        lease_path = self.lease_path(range_name)
+        expires = self.lease_expires(lease_path)
+        if expires is None or expires > time.time():
+            return False
+        expired_path = "%s.expired.%s" % (lease_path, self.node_id)
+        try:
+            os.rename(lease_path, expired_path)
+        except FileNotFoundError:
+            return False
+        lease = read_json_file(expired_path)
+        if self.lease_expires(expired_path) > time.time():
+            # renewed in the meantime, put it back unless it was already replaced
+            try:
+                os.link(expired_path, lease_path)
+            except FileExistsError:
+                pass
+            os.remove(expired_path)
+            return False
+        os.remove(expired_path)
+        self.log(
+            "expired lease of %s on %s" % (lease and lease.get("node_id"), range_name)
+        )
+        return True
+
+    def claim(self, range_name):
+        "True if this node now holds the lease of a range which is not done"
+        if self.is_done(range_name):
+            return False
+        if self.create_lease(range_name):
+            claimed = True
+        else:
+            claimed = self.expire_lease(range_name) and self.create_lease(range_name)
+        if claimed and self.is_done(range_name):
+            # completed by the previous holder after its lease expired
+            self.release(range_name)
+            return False
+        if claimed:
+            self.log("claimed %s" % range_name)
+        return claimed
+
+    def holds(self, range_name):
+        lease = read_json_file(self.lease_path(range_name))
+        return bool(lease) and lease.get("node_id") == self.node_id
+
+    def renew(self, range_name):
+        "extend the lease, False if it is no longer held by this node"
+        if not self.holds(range_name):
+            return False
+        write_json_file(self.lease_path(range_name), self.lease_data())
+        return True
+
+    def release(self, range_name):
+        if self.holds(range_name):
+            try:
+                os.remove(self.lease_path(range_name))
+            except FileNotFoundError:
+                pass
+
+    def complete(self, range_name, results):
+        "record the results of the range as done and release its lease"
+        write_json_file(
+            self.done_path(range_name),
+            {
+                "node_id": self.node_id,
+                "completed": time.time(),
+                "results": list(results.items()),
+            },
+        )
+        self.release(range_name)
+        self.log(
+            "completed %s %s generated %s failed"
+            % (
+                range_name,
+                len([result for result in results.values() if result]),
+                len([result for result in results.values() if not result]),
+            )
+        )
+
+
+def generate_range(
+    coordinator, range_name, article_ids, jats_config, add_comment, generation_context
+):
+    "generate the articles of the range, renewing the lease as it goes"
+    generation_context.prime_csv_caches(article_ids)
+    results = OrderedDict()
+    renewed = time.time()
+    # one sink for the range, so its files are committed before it is done
+    with output.run_sink(jats_config) as range_sink:
+        for article_id in article_ids:
+            if time.time() - renewed > coordinator.lease_seconds / 3.0:
+                if not coordinator.renew(range_name):
+                    coordinator.log("lost lease of %s" % range_name)
+                    return None
+                renewed = time.time()
+            results[article_id] = generate.build_xml_to_disk(
+                article_id,
+                None,
+                jats_config,
+                add_comment,
+                sink=range_sink,
+                generation_context=generation_context,
+            )
+    return results
+
+
+def run_node(
+    article_ids,
+    shared_dir,
+    range_size=100,
+    jats_config=None,
+    add_comment=True,
+    generation_context=None,
+    node_id=None,
+    lease_seconds=300,
+    poll_interval=5.0,
+):
+    """
+    generate ranges of the article ids claimed by this node until every range is done,
+    return an OrderedDict of the results of the articles this node generated
+    """
+    if not generation_context:
+        generation_context = generate.GenerationContext(jats_config=jats_config)
+    if not jats_config:
+        jats_config = generation_context.jats_config
+    coordinator = LeaseCoordinator(shared_dir, node_id, lease_seconds)
+    ranges = partition_ranges(article_ids, range_size)
+    results = OrderedDict()
+    while True:
+        remaining = [
+            (range_name, range_ids)
+            for range_name, range_ids in ranges
+            if not coordinator.is_done(range_name)
+        ]
+        if not remaining:
+            break
+        claimed = False
+        for range_name, range_ids in remaining:
+            if not coordinator.claim(range_name):
+                continue
+            claimed = True
+            range_results = generate_range(
+                coordinator,
+                range_name,
+                range_ids,
+                jats_config,
+                add_comment,
+                generation_context,
+            )
+            if range_results is not None:
+                coordinator.complete(range_name, range_results)
+                results.update(range_results)
+        if not claimed:
+            # the remaining ranges are leased by other nodes
+            time.sleep(poll_interval)
+    return results
+
+
+def read_results(shared_dir):
+    "OrderedDict of the results of every completed range keyed on article id"
+    results = OrderedDict()
+    for file_name in sorted(os.listdir(shared_dir)):
+        if file_name.endswith(DONE_SUFFIX):
+            done = read_json_file(os.path.join(shared_dir, file_name))
+            for article_id, result in done.get("results"):
+                results[article_id] = result
+    return results
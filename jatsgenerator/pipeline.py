@@ -0,0 +1,359 @@
+"""Generate articles in stages connected by bounded queues, each on its own threads"""
+
+import queue
+import threading
+import time
+from collections import OrderedDict
+from jatsgenerator import collectors as output_collectors
+from jatsgenerator import generate, metrics, output, schedule
+
+# stage names
+PARSE = "parse"
+BUILD = "build"
+WRITE = "write"
+
+# put on a queue after the last item
+_DONE = object()
+
+
+class StageStats:
+    "count, errors and busy time of the items processed by a stage"
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.count = 0
+        self.errors = 0
+        self.busy_time = 0.0
+        # time the stage waited to put items on a full queue
+        self.blocked_time = 0.0
+        self.start_time = None
+        self.end_time = None
+        self._lock = threading.Lock()
+
+    def add(self, busy_time, error=False):
+        with self._lock:
+            self.count += 1
+            self.busy_time += busy_time
+            if error:
+                self.errors += 1
+
+    def add_blocked(self, blocked_time):
+        with self._lock:
+            self.blocked_time += blocked_time
+
+    def elapsed(self):
+        if self.start_time is None:
+            return 0.0
+        return (self.end_time or time.time()) - self.start_time
+
+    def throughput(self):
+        "items per second while the stage was running"
+        elapsed = self.elapsed()
+        return self.count / elapsed if elapsed else 0.0
+
+    def to_dict(self):
+        return OrderedDict(
+            [
+                ("stage", self.name),
+                ("workers", self.workers),
+                ("count", self.count),
+                ("errors", self.errors),
+                ("busy_time", self.busy_time),
+                ("blocked_time", self.blocked_time),
+                ("elapsed", self.elapsed()),
+                ("throughput", self.throughput()),
+            ]
+        )
+
+
+class PipelineItem:
+    "an article passed between the stages"
+
+    def __init__(self, article_id, article=None, article_metrics=None):
+        self.article_id = article_id
+        self.article = article
+        self.article_metrics = article_metrics
+        # estimated build cost, see schedule.article_cost()
+        self.cost = None
+        self.xml_bytes = None
+        self.filename = None
+        # output bytes of the collectors keyed on extension
+        self.outputs = None
+
+
+class Pipeline:
+    """
+    parse, build and serialize, and write articles concurrently,
+    the bounded queues between stages block the earlier stage when a later one
+    falls behind, so at most about queue_size articles are held in each queue,
+    with schedule all the articles are parsed and held in memory before the most
+    expensive is built first, a schedule.MemoryBudget limits the total cost of the
+    articles built at once and keeps the back-pressure of the queues,
+    the outputs of the collectors classes are written alongside each XML file
+    """
+
+    def __init__(
+        self,
+        jats_config=None,
+        add_comment=True,
+        sink=None,
+        generation_context=None,
+        build_workers=2,
+        write_workers=1,
+        queue_size=8,
+        report=None,
+        schedule=False,
+        memory_budget=None,
+        collectors=None,
+    ):
+        if not generation_context:
+            generation_context = generate.GenerationContext(jats_config=jats_config)
+        self.generation_context = generation_context
+        self.jats_config = jats_config or generation_context.jats_config
+        self.build_plan = generation_context.build_plan(self.jats_config)
+        self.add_comment = add_comment
+        self.sink = sink
+        self.build_workers = build_workers
+        self.write_workers = write_workers
+        self.queue_size = queue_size
+        self.report = report
+        self.schedule = schedule
+        self.memory_budget = memory_budget
+        self.collectors = collectors
+        self.logger = generation_context.logger
+        self.stats = OrderedDict()
+        self.results = OrderedDict()
+        self._write_lock = threading.Lock()
+        self._results_lock = threading.Lock()
+
+    def put(self, stage_queue, item, stage_stats):
+        "put the item on the queue, counting the time blocked by back-pressure"
+        start_time = time.time()
+        stage_queue.put(item)
+        stage_stats.add_blocked(time.time() - start_time)
+
+    def set_result(self, article_id, result):
+        with self._results_lock:
+            self.results[article_id] = result
+
+    def new_item(self, article_id, article=None):
+        article_metrics = None
+        if self.report is not None:
+            article_metrics = metrics.ArticleMetrics(article_id)
+            self.report.add(article_metrics)
+        self.set_result(article_id, False)
+        return PipelineItem(article_id, article, article_metrics)
+
+    def parse_item(self, article_id, stage_stats):
+        "PipelineItem of the article parsed from the CSV data, None if it fails"
+        item = self.new_item(article_id)
+        start_time = time.time()
+        errors = item.article_metrics.error_messages if item.article_metrics else None
+        item.article = generate.build_article_from_csv(
+            article_id,
+            self.jats_config,
+            errors,
+            self.generation_context,
+        )
+        busy_time = time.time() - start_time
+        if item.article_metrics:
+            item.article_metrics.parse_time = busy_time
+        if not item.article:
+            stage_stats.add(busy_time, error=True)
+            if item.article_metrics:
+                item.article_metrics.set_error(metrics.CATEGORY_NO_ARTICLE)
+            return None
+        stage_stats.add(busy_time)
+        return item
+
+    def parsed_items(self, article_ids, articles, stage_stats):
+        "PipelineItem of each article supplied and of each article parsed"
+        for article in articles or []:
+            stage_stats.add(0.0)
+            yield self.new_item(article.manuscript, article)
+        for article_id in article_ids or []:
+            item = self.parse_item(article_id, stage_stats)
+            if item:
+                yield item
+
+    def costed_items(self, items):
+        "set the estimated build cost of each item as it is parsed"
+        for item in items:
+            item.cost = schedule.article_cost(item.article)
+            yield item
+
+    def parse_stage(self, article_ids, articles, build_queue):
+        "feed the build queue with articles parsed from the CSV data, or supplied"
+        stage_stats = self.stats.get(PARSE)
+        try:
+            items = self.parsed_items(article_ids, articles, stage_stats)
+            if self.schedule or self.memory_budget:
+                items = self.costed_items(items)
+            if self.schedule:
+                # most expensive first, so the longest builds do not finish last
+                items = sorted(items, key=lambda item: item.cost, reverse=True)
+            for item in items:
+                self.put(build_queue, item, stage_stats)
+        finally:
+            stage_stats.end_time = time.time()
+            for _ in range(self.build_workers):
+                build_queue.put(_DONE)
+
+    def build_xml_bytes(self, item):
+        item.outputs = OrderedDict()
+        return generate.build_xml_bytes(
+            item.article_id,
+            item.article,
+            self.jats_config,
+            self.add_comment,
+            metrics=item.article_metrics,
+            generation_context=self.generation_context,
+            collectors=self.collectors,
+            outputs=item.outputs,
+        )
+
+    def build_stage(self, build_queue, write_queue, finished_workers):
+        "build and serialize the XML of each article"
+        stage_stats = self.stats.get(BUILD)
+        while True:
+            item = build_queue.get()
+            if item is _DONE:
+                break
+            start_time = time.time()
+            try:
+                if self.memory_budget:
+                    with self.memory_budget.reserve(item.cost):
+                        item.xml_bytes = self.build_xml_bytes(item)
+                else:
+                    item.xml_bytes = self.build_xml_bytes(item)
+            except Exception:
+                self.logger.exception("could not build xml for %s", item.article_id)
+                item.xml_bytes = None
+            # release the article once it is serialized
+            article = item.article
+            item.article = None
+            if not item.xml_bytes:
+                stage_stats.add(time.time() - start_time, error=True)
+                if item.article_metrics:
+                    item.article_metrics.set_error(metrics.CATEGORY_BUILD_ERROR)
+                continue
+            item.filename = self.build_plan.xml_filename(article.manuscript)
+            stage_stats.add(time.time() - start_time)
+            self.put(write_queue, item, stage_stats)
+        with self._results_lock:
+            finished_workers.append(threading.current_thread().name)
+            last_worker = len(finished_workers) == self.build_workers
+        if last_worker:
+            stage_stats.end_time = time.time()
+            for _ in range(self.write_workers):
+                write_queue.put(_DONE)
+
+    def write_file(self, filename, file_bytes):
+        if not self.sink:
+            output.write_bytes_to_disk(
+                file_bytes,
+                filename,
+                self.jats_config.get("target_output_dir"),
+            )
+        elif self.sink.thread_safe:
+            self.sink.write(filename, file_bytes)
+        else:
+            with self._write_lock:
+                self.sink.write(filename, file_bytes)
+
+    def write(self, item):
+        self.write_file(item.filename, item.xml_bytes)
+        for extension, output_bytes in (item.outputs or {}).items():
+            self.write_file(
+                output_collectors.output_filename(item.filename, extension),
+                output_bytes,
+            )
+
+    def write_stage(self, write_queue):
+        "write the XML bytes of each article to the sink or target_output_dir"
+        stage_stats = self.stats.get(WRITE)
+        while True:
+            item = write_queue.get()
+            if item is _DONE:
+                break
+            start_time = time.time()
+            try:
+                self.write(item)
+            except Exception:
+                # keep consuming the queue so the build stage is not blocked
+                stage_stats.add(time.time() - start_time, error=True)
+                if item.article_metrics:
+                    item.article_metrics.set_error(metrics.CATEGORY_WRITE_ERROR)
+                self.logger.error("could not write xml for %s", item.article_id)
+                continue
+            busy_time = time.time() - start_time
+            stage_stats.add(busy_time)
+            if item.article_metrics:
+                item.article_metrics.write_time = busy_time
+                item.article_metrics.bytes_written = len(item.xml_bytes)
+                item.article_metrics.success = True
+            self.set_result(item.article_id, True)
+            self.logger.info("xml written for %s", item.article_id)
+
+    def run(self, article_ids=None, articles=None):
+        """
+        generate xml for each article id from the CSV data, and for each article
+        object supplied, return an OrderedDict of True or False keyed on article id
+        """
+        self.results = OrderedDict()
+        self.stats = OrderedDict(
+            [
+                (PARSE, StageStats(PARSE, 1)),
+                (BUILD, StageStats(BUILD, self.build_workers)),
+                (WRITE, StageStats(WRITE, self.write_workers)),
+            ]
+        )
+        build_queue = queue.Queue(self.queue_size)
+        write_queue = queue.Queue(self.queue_size)
+        finished_workers = []
+        start_time = time.time()
+        for stage_stats in self.stats.values():
+            stage_stats.start_time = start_time
+        threads = [
+            threading.Thread(
+                target=self.parse_stage,
+                args=(article_ids, articles, build_queue),
+                name="%s-0" % PARSE,
+            )
+        ]
+        for index in range(self.build_workers):
+            threads.append(
+                threading.Thread(
+                    target=self.build_stage,
+                    args=(build_queue, write_queue, finished_workers),
+                    name="%s-%s" % (BUILD, index),
+                )
+            )
+        for index in range(self.write_workers):
+            threads.append(
+                threading.Thread(
+                    target=self.write_stage,
+                    args=(write_queue,),
+                    name="%s-%s" % (WRITE, index),
+                )
+            )
+        # a sharded or group committed target_output_dir uses one sink for the run
+        run_sink = None
+        if not self.sink and output.uses_config_sink(self.jats_config):
+            run_sink = self.sink = output.config_sink(self.jats_config)
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            if run_sink:
+                run_sink.close()
+                self.sink = None
+        self.stats.get(WRITE).end_time = time.time()
+        return self.results
+
+    def stats_dicts(self):
+        "list of the stats of each stage of the last run"
+        return [stage_stats.to_dict() for stage_stats in self.stats.values()]
@@ -0,0 +1,182 @@
+"""Find the articles of a batch missing CSV data they need, before any are built"""
+
+import time
+from collections import OrderedDict
+from ejpcsvparser import csv_data, settings
+from ejpcsvparser import utils as parser_utils
+from jatsgenerator import csvfiles, csvindex
+
+# CSV tables holding the required components
+REQUIRED_TABLES = (
+    "manuscript",
+    "title",
+    "abstract",
+    "license",
+    "received",
+    "authors",
+    "group_authors",
+)
+
+# ejpcsvparser function which fails when the component is missing
+COMPONENT_FUNCTIONS = OrderedDict(
+    [
+        ("manuscript", "instantiate_article"),
+        ("title", "set_title"),
+        ("abstract", "set_abstract"),
+        ("article_type", "set_article_type"),
+        ("license", "set_license"),
+        ("accepted_date", "set_dates"),
+        ("received_date", "set_dates"),
+        ("authors", "set_author_info"),
+        ("editor", "set_editor_info"),
+    ]
+)
+
+
+def is_date(date_string):
+    "whether the date is one ejpcsvparser can add to the article"
+    date_parts = date_string.split() if date_string else []
+    if not date_parts:
+        return False
+    try:
+        time.strptime(date_parts[0], "%Y-%m-%d")
+    except ValueError:
+        return False
+    return True
+
+
+class CsvScan:
+    """
+    the first data row of each requested manuscript in the required CSV tables,
+    each CSV file is scanned once and only the rows of those manuscripts decoded
+    """
+
+    def __init__(self, csv_path, article_ids):
+        self.col_names = {}
+        # first row of each article id keyed on table type
+        self.rows = {}
+        paths = csvfiles.csv_file_paths(csv_path)
+        article_ids = set(str(article_id) for article_id in article_ids)
+        for table_type in REQUIRED_TABLES:
+            self.scan(table_type, paths.get(table_type), article_ids)
+
+    def scan(self, table_type, path, article_ids):
+        self.rows[table_type] = {}
+        if not path or csvfiles.file_signature(path) is None:
+            return
+        csv_index = csvindex.CsvIndex(table_type, path)
+        self.col_names[table_type] = csv_index.col_names
+        first_ranges = []
+        article_starts = {}
+        for article_id in article_ids:
+            ranges = csv_index.article_ranges(article_id)
+            if ranges:
+                first_ranges.append(ranges[0])
+                article_starts[ranges[0][0]] = article_id
+        for start, row in csv_index.decode_ranges(first_ranges):
+            self.rows[table_type][article_starts.get(start)] = row
+
+    def has_row(self, article_id, table_type):
+        return str(article_id) in self.rows.get(table_type, {})
+
+    def value(self, article_id, table_type, column):
+        "value of the column in the first row, as read by ejpcsvparser"
+        row = self.rows.get(table_type, {}).get(str(article_id))
+        if row is None:
+            return None
+        return csv_data.get_cell_value(
+            settings.CSV_COLUMN_HEADINGS.get(column),
+            self.col_names.get(table_type),
+            row,
+        )
+
+    def missing_components(self, article_id):
+        "list of the required components missing from the article CSV data"
+        missing = []
+        if not self.has_row(article_id, "manuscript"):
+            missing.append("manuscript")
+        if not self.value(article_id, "title", "title"):
+            missing.append("title")
+        if not self.value(article_id, "abstract", "abstract"):
+            missing.append("abstract")
+        article_type = self.value(article_id, "manuscript", "article_type")
+        if article_type not in parser_utils.article_type_indexes():
+            missing.append("article_type")
+        if not parser_utils.license_data(
+            self.value(article_id, "license", "license_id")
+        ):
+            missing.append("license")
+        if not is_date(self.value(article_id, "manuscript", "accepted_date")):
+            missing.append("accepted_date")
+        received_date = self.value(article_id, "received", "received_date")
+        if received_date is not None and received_date.strip() == "":
+            received_date = self.value(article_id, "received", "receipt_date")
+        if not is_date(received_date):
+            missing.append("received_date")
+        if not self.has_row(article_id, "authors") and not self.value(
+            article_id, "group_authors", "group_author"
+        ):
+            missing.append("authors")
+        if not (
+            self.value(article_id, "manuscript", "editor_first_name")
+            and self.value(article_id, "manuscript", "editor_last_name")
+        ):
+            missing.append("editor")
+        return missing
+
+
+class PreflightReport:
+    "which article ids of a batch have the CSV data to be built"
+
+    def __init__(self):
+        # article ids with every required component, in their original order
+        self.viable = []
+        # list of the missing components keyed on article id
+        self.missing = OrderedDict()
+
+    def add(self, article_id, missing_components):
+        if missing_components:
+            self.missing[article_id] = missing_components
+        else:
+            self.viable.append(article_id)
+
+    def error_messages(self, article_id):
+        "messages in the format of the build_article_from_csv errors"
+        function_names = []
+        for component in self.missing.get(article_id, []):
+            function_name = COMPONENT_FUNCTIONS.get(component)
+            if function_name not in function_names:
+                function_names.append(function_name)
+        return [
+            "article_id %s error in %s" % (article_id, function_name)
+            for function_name in function_names
+        ]
+
+    def messages(self):
+        "a message for each article which cannot be built"
+        return [
+            "article_id %s is missing %s" % (article_id, ", ".join(components))
+            for article_id, components in self.missing.items()
+        ]
+
+    def summary(self):
+        return "preflight: %s articles can be built, %s are missing components" % (
+            len(self.viable),
+            len(self.missing),
+        )
+
+
+def preflight(article_ids, csv_path=None):
+    """
+    check the CSV data of every article id in one scan of the CSV files,
+    the ethics and datasets XML is not parsed so its errors are found when building,
+    with no csv_path the ejpcsvparser CSV_PATH setting is used,
+    return a PreflightReport
+    """
+    if csv_path is None:
+        csv_path = csv_data.CSV_PATH
+    scan = CsvScan(csv_path, article_ids)
+    report = PreflightReport()
+    for article_id in article_ids:
+        report.add(article_id, scan.missing_components(article_id))
+    return report
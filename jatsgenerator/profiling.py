@@ -0,0 +1,119 @@
+"""Profile generating articles and report where the time is spent"""
+
+import cProfile
+import io
+import os
+import pstats
+from collections import OrderedDict
+from jatsgenerator import generate
+
+# functions highlighted in the report, matched on file name and function name
+HOTSPOTS = OrderedDict(
+    [
+        ("build.py builders", ("jatsgenerator%sbuild.py" % os.sep, None)),
+        ("utils.append_to_tag", ("jatsgenerator%sutils.py" % os.sep, "append_to_tag")),
+        (
+            "ArticleXML.output_xml",
+            ("jatsgenerator%sgenerate.py" % os.sep, "output_xml"),
+        ),
+    ]
+)
+
+SORT_KEY = "cumulative"
+
+
+def profile_article(
+    article_id, jats_config=None, add_comment=False, generation_context=None
+):
+    "generate the article XML bytes under cProfile, return the profiler and result"
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        xml_bytes = generate.build_xml_bytes(
+            article_id,
+            jats_config=jats_config,
+            add_comment=add_comment,
+            generation_context=generation_context,
+        )
+    finally:
+        profiler.disable()
+    return profiler, bool(xml_bytes)
+
+
+def profile_articles(
+    article_ids, jats_config=None, add_comment=False, generation_context=None
+):
+    """
+    profile generating each article,
+    return the pstats.Stats aggregated for all of them and a dict of the results
+    """
+    stats = None
+    results = OrderedDict()
+    for article_id in article_ids:
+        profiler, results[article_id] = profile_article(
+            article_id, jats_config, add_comment, generation_context
+        )
+        if stats is None:
+            stats = pstats.Stats(profiler)
+        else:
+            stats.add(profiler)
+    return stats, results
+
+
+def hotspots(stats):
+    """
+    OrderedDict of the matching functions for each of the HOTSPOTS,
+    as a list of (function, call count, total time, cumulative time) tuples
+    sorted with the largest cumulative time first
+    """
+    spots = OrderedDict((name, []) for name in HOTSPOTS)
+    for (file_name, line_number, function_name), value in stats.stats.items():
+        call_count, total_time, cumulative_time = value[1], value[2], value[3]
+        for name, (file_ending, match_function_name) in HOTSPOTS.items():
+            if not file_name.endswith(file_ending):
+                continue
+            if match_function_name and function_name != match_function_name:
+                continue
+            spots[name].append(
+                (
+                    "%s:%s(%s)"
+                    % (os.path.basename(file_name), line_number, function_name),
+                    call_count,
+                    total_time,
+                    cumulative_time,
+                )
+            )
+    for functions in spots.values():
+        functions.sort(key=lambda function: function[3], reverse=True)
+    return spots
+
+
+def report_text(stats, results, limit=30):
+    "text report of the results, hot spots and the functions sorted by time"
+    lines = [
+        "profiled %s articles, %s generated"
+        % (len(results), len([result for result in results.values() if result])),
+        "total time %.3fs" % stats.total_tt,
+        "",
+    ]
+    for name, functions in hotspots(stats).items():
+        lines.append(
+            "%s: %.3fs own time in %s functions"
+            % (name, sum(function[2] for function in functions), len(functions))
+        )
+        for function in functions[:limit]:
+            lines.append("    %-60s %8s calls %8.3fs own %8.3fs cumulative" % function)
+    lines.append("")
+    stream = io.StringIO()
+    stats.stream = stream
+    stats.sort_stats(SORT_KEY, "tottime").print_stats(limit)
+    stats.stream = None
+    return "\n".join(lines) + "\n" + stream.getvalue()
+
+
+def write_report(stats, results, report_path, pstats_path=None, limit=30):
+    "write the text report, and the stats to a .pstats file if pstats_path is given"
+    with open(report_path, "w") as open_file:
+        open_file.write(report_text(stats, results, limit))
+    if pstats_path:
+        stats.dump_stats(pstats_path)
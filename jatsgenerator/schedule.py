@@ -0,0 +1,119 @@
+"""Estimate the cost of building each article and schedule the expensive ones first"""
+
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# cost units of each part of an article, a typical POA article costs a few hundred
+COST_WEIGHTS = OrderedDict(
+    [
+        ("base", 50),
+        ("contributor", 10),
+        ("affiliation", 5),
+        ("funding_award", 5),
+        ("award_recipient", 2),
+        ("dataset", 5),
+        ("review_article", 20),
+        ("content_block", 10),
+        # per 1000 characters of title and abstract
+        ("text", 5),
+    ]
+)
+
+
+def article_text_length(article):
+    return len(article.title or "") + len(article.abstract or "")
+
+
+def article_cost_counts(article):
+    "OrderedDict of the counts of each part of the article which adds to its cost"
+    review_articles = getattr(article, "review_articles", None) or []
+    return OrderedDict(
+        [
+            ("base", 1),
+            ("contributor", len(article.contributors)),
+            (
+                "affiliation",
+                sum(
+                    len(getattr(contributor, "affiliations", None) or [])
+                    for contributor in article.contributors
+                ),
+            ),
+            ("funding_award", len(article.funding_awards)),
+            (
+                "award_recipient",
+                sum(
+                    len(getattr(award, "principal_award_recipients", None) or [])
+                    for award in article.funding_awards
+                ),
+            ),
+            ("dataset", len(article.datasets)),
+            ("review_article", len(review_articles)),
+            (
+                "content_block",
+                sum(
+                    len(getattr(review_article, "content_blocks", None) or [])
+                    for review_article in review_articles
+                ),
+            ),
+            ("text", article_text_length(article) / 1000.0),
+        ]
+    )
+
+
+def article_cost(article, weights=None):
+    "estimated cost of building the article XML, in COST_WEIGHTS units"
+    weights = weights or COST_WEIGHTS
+    return sum(
+        weights.get(name, 0) * count
+        for name, count in article_cost_counts(article).items()
+    )
+
+
+def schedule_articles(articles, weights=None):
+    """
+    list of (cost, article) with the most expensive article first,
+    articles of equal cost stay in their original order
+    """
+    costed = [(article_cost(article, weights), article) for article in articles]
+    return sorted(costed, key=lambda costed_article: costed_article[0], reverse=True)
+
+
+class MemoryBudget:
+    """
+    limit the total cost of the articles being built at the same time,
+    an article costing more than the whole budget is built on its own
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.in_use = 0
+        self.peak = 0
+        self._condition = threading.Condition()
+
+    def reserved_cost(self, cost):
+        return min(cost, self.budget)
+
+    def acquire(self, cost):
+        "block until the cost fits in the budget, return the cost reserved"
+        cost = self.reserved_cost(cost)
+        with self._condition:
+            while self.in_use and self.in_use + cost > self.budget:
+                self._condition.wait()
+            self.in_use += cost
+            self.peak = max(self.peak, self.in_use)
+        return cost
+
+    def release(self, cost):
+        with self._condition:
+            self.in_use -= cost
+            self._condition.notify_all()
+
+    @contextmanager
+    def reserve(self, cost):
+        "hold the cost of an article while it is built"
+        reserved = self.acquire(cost)
+        try:
+            yield reserved
+        finally:
+            self.release(reserved)
@@ -0,0 +1,382 @@
+"""
+Long-running generation service which keeps configs and CSV data warm
+
+Requests:
+  GET  /health
+  GET  /metrics
+  GET  /articles/<article_id>/xml?section=elife&write=1
+  POST /articles/xml?section=elife&write=1 with Article JSON as the body
+
+XML bytes are returned, or when write is set the XML is written to the
+target_output_dir and a JSON response with the filename is returned
+"""
+
+import json
+import os
+import re
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from ejpcsvparser import csv_data
+from elifearticle.article import Affiliation, Article, ArticleDate, Contributor, License
+from jatsgenerator.conf import raw_config, parse_raw_config
+from jatsgenerator import csvfiles, generate, metrics, output
+
+LOGGER = generate.LOGGER
+
+ARTICLE_XML_PATH = re.compile(r"^/articles/(?P<article_id>[^/]+)/xml$")
+
+ARTICLE_STRING_ATTRIBUTES = [
+    "doi",
+    "title",
+    "manuscript",
+    "article_type",
+    "abstract",
+    "version_doi",
+    "volume",
+    "conflict_default",
+    "display_channel",
+    "data_availability",
+    "funding_note",
+]
+
+ARTICLE_LIST_ATTRIBUTES = ["article_categories", "research_organisms", "ethics"]
+
+CONTRIBUTOR_ATTRIBUTES = [
+    "suffix",
+    "corresp",
+    "equal_contrib",
+    "auth_id",
+    "orcid",
+    "orcid_authenticated",
+    "anonymous",
+]
+
+AFFILIATION_ATTRIBUTES = [
+    "text",
+    "department",
+    "institution",
+    "city",
+    "country",
+    "ror",
+    "email",
+    "phone",
+    "fax",
+]
+
+LICENSE_ATTRIBUTES = [
+    "license_type",
+    "copyright",
+    "href",
+    "name",
+    "paragraph1",
+    "paragraph2",
+]
+
+
+def set_attributes(obj, data, attribute_names):
+    "set object attributes from dict values which are present"
+    for name in attribute_names:
+        if data.get(name) is not None:
+            setattr(obj, name, data.get(name))
+
+
+def affiliation_from_json(data):
+    affiliation = Affiliation()
+    set_attributes(affiliation, data, AFFILIATION_ATTRIBUTES)
+    return affiliation
+
+
+def contributor_from_json(data):
+    contributor = Contributor(
+        data.get("contrib_type", "author"),
+        data.get("surname"),
+        data.get("given_name"),
+        data.get("collab"),
+    )
+    set_attributes(contributor, data, CONTRIBUTOR_ATTRIBUTES)
+    for conflict in data.get("conflict") or []:
+        contributor.set_conflict(conflict)
+    for affiliation_data in data.get("affiliations") or []:
+        contributor.set_affiliation(affiliation_from_json(affiliation_data))
+    return contributor
+
+
+def check_manuscript(manuscript):
+    "raise ValueError unless the manuscript is a number"
+    try:
+        int(manuscript)
+    except (TypeError, ValueError):
+        raise ValueError("manuscript must be a number, got %s" % json.dumps(manuscript))
+
+
+def article_from_json(data):
+    """
+    populate an Article object from a dict parsed from JSON,
+    dates are a dict of date_type to YYYY-MM-DD strings,
+    the manuscript number is required
+    """
+    check_manuscript(data.get("manuscript"))
+    article = Article(data.get("doi"), data.get("title"))
+    set_attributes(article, data, ARTICLE_STRING_ATTRIBUTES)
+    for name in ARTICLE_LIST_ATTRIBUTES:
+        if data.get(name):
+            setattr(article, name, list(data.get(name)))
+    for date_type, date_string in (data.get("dates") or {}).items():
+        article.add_date(ArticleDate(date_type, time.strptime(date_string, "%Y-%m-%d")))
+    if data.get("license"):
+        license_object = License(data.get("license").get("license_id"))
+        set_attributes(license_object, data.get("license"), LICENSE_ATTRIBUTES)
+        article.license = license_object
+    for contributor_data in data.get("contributors") or []:
+        article.add_contributor(contributor_from_json(contributor_data))
+    return article
+
+
+class GenerationService:
+    "keep configs and parsed CSV data in memory between generation requests"
+
+    def __init__(
+        self,
+        csv_path=None,
+        target_output_dir=None,
+        add_comment=True,
+        max_metrics=10000,
+        tmp_dir=None,
+    ):
+        self.csv_path = csv_path
+        self.target_output_dir = target_output_dir
+        self.add_comment = add_comment
+        self.configs = {}
+        # sharded or group committed target_output_dir sinks keyed on config section
+        self.sinks = {}
+        self._sinks_lock = threading.Lock()
+        # metrics of the most recent requests
+        self.report = metrics.RunReport(max_metrics)
+        # CSV data is parsed under the generate.GenerationContext lock
+        self.generation_context = generate.GenerationContext(
+            csv_path, logger=LOGGER, tmp_dir=tmp_dir
+        )
+        # signatures of the CSV files when their data was parsed
+        self.csv_signatures = None
+
+    def get_config(self, config_section=None):
+        "parse the config section once and reuse it"
+        if config_section not in self.configs:
+            jats_config = parse_raw_config(raw_config(config_section))
+            if self.target_output_dir:
+                jats_config["target_output_dir"] = self.target_output_dir
+            self.configs[config_section] = jats_config
+        return self.configs.get(config_section)
+
+    def get_sink(self, config_section, jats_config):
+        """
+        open the sink of the config section once and reuse it for every request,
+        None if the target_output_dir is written without a sink
+        """
+        if not output.uses_config_sink(jats_config):
+            return None
+        with self._sinks_lock:
+            if config_section not in self.sinks:
+                self.sinks[config_section] = output.config_sink(jats_config)
+            return self.sinks.get(config_section)
+
+    def close(self):
+        "close the sinks, committing any staged files"
+        with self._sinks_lock:
+            for sink in self.sinks.values():
+                sink.close()
+            self.sinks = {}
+
+    def refresh_csv_data(self):
+        "drop the parsed CSV data if a CSV file has changed since it was parsed"
+        csv_path = self.generation_context.csv_path or csv_data.CSV_PATH
+        with csvfiles.CSV_LOCK:
+            signatures = [
+                csvfiles.file_signature(path)
+                for path in csvfiles.csv_file_paths(csv_path).values()
+            ]
+            if self.csv_signatures is not None and signatures != self.csv_signatures:
+                LOGGER.info("CSV files in %s changed, parsing them again", csv_path)
+                self.generation_context.csv_caches.clear()
+                self.generation_context.csv_indexes.clear()
+                if self.generation_context.csv_path is None:
+                    csvfiles.reset_csv_caches()
+            self.csv_signatures = signatures
+
+    def article_from_csv(self, article_id, jats_config, article_metrics=None):
+        start_time = time.time()
+        self.refresh_csv_data()
+        errors = article_metrics.error_messages if article_metrics else None
+        article = generate.build_article_from_csv(
+            article_id, jats_config, errors, self.generation_context
+        )
+        if article_metrics:
+            article_metrics.parse_time = time.time() - start_time
+        return article
+
+    def generate(self, article_id=None, article=None, config_section=None, write=False):
+        """
+        generate XML for the article, or for the article_id from the CSV data,
+        return the XML bytes, or the filename when writing to disk
+        """
+        jats_config = self.get_config(config_section)
+        article_metrics = metrics.ArticleMetrics(
+            article_id
+            if article_id is not None
+            else getattr(article, "manuscript", None)
+        )
+        self.report.add(article_metrics)
+        if not article:
+            article = self.article_from_csv(article_id, jats_config, article_metrics)
+            if not article:
+                article_metrics.set_error(metrics.CATEGORY_NO_ARTICLE)
+                return None
+        if article_id is None:
+            article_id = article.manuscript
+        if write:
+            if generate.build_xml_to_disk(
+                article_id,
+                article,
+                jats_config,
+                self.add_comment,
+                sink=self.get_sink(config_section, jats_config),
+                metrics=article_metrics,
+                generation_context=self.generation_context,
+            ):
+                return jats_config.get("xml_filename_pattern").format(
+                    manuscript=article.manuscript
+                )
+            return None
+        xml_bytes = generate.build_xml_bytes(
+            article_id,
+            article,
+            jats_config,
+            self.add_comment,
+            metrics=article_metrics,
+            generation_context=self.generation_context,
+        )
+        if xml_bytes:
+            article_metrics.success = True
+        else:
+            article_metrics.set_error(metrics.CATEGORY_BUILD_ERROR)
+        return xml_bytes
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    "HTTP request handler, the GenerationService is attached to the server"
+
+    def address_string(self):
+        # client_address is an empty string when serving on a Unix socket
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return "unix"
+
+    def log_message(self, format, *args):
+        LOGGER.info("%s %s", self.address_string(), format % args)
+
+    def send_body(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status, data):
+        self.send_body(status, json.dumps(data).encode("utf8"), "application/json")
+
+    def send_result(self, result, write):
+        if result is None:
+            self.send_json(404, {"error": "could not generate xml"})
+        elif write:
+            self.send_json(200, {"written": result})
+        else:
+            self.send_body(200, result, "application/xml")
+
+    def send_generated(self, write, **kwargs):
+        "generate the XML and send the result, or a JSON error if generating failed"
+        try:
+            result = self.server.service.generate(write=write, **kwargs)
+        except Exception as exception:
+            LOGGER.exception("error generating xml for %s", self.path)
+            self.send_json(500, {"error": "error generating xml: %s" % exception})
+            return
+        self.send_result(result, write)
+
+    def query_options(self, parsed_url):
+        query = parse_qs(parsed_url.query)
+        config_section = query.get("section", [None])[0]
+        write = query.get("write", ["0"])[0] in ["1", "true", "True"]
+        return config_section, write
+
+    def do_GET(self):
+        parsed_url = urlparse(self.path)
+        if parsed_url.path == "/health":
+            self.send_json(200, {"status": "ok"})
+            return
+        if parsed_url.path == "/metrics":
+            self.send_body(
+                200,
+                self.server.service.report.prometheus_text().encode("utf8"),
+                "text/plain; version=0.0.4",
+            )
+            return
+        match = ARTICLE_XML_PATH.match(parsed_url.path)
+        if not match:
+            self.send_json(404, {"error": "not found"})
+            return
+        config_section, write = self.query_options(parsed_url)
+        self.send_generated(
+            write,
+            article_id=match.group("article_id"),
+            config_section=config_section,
+        )
+
+    def do_POST(self):
+        parsed_url = urlparse(self.path)
+        if parsed_url.path != "/articles/xml":
+            self.send_json(404, {"error": "not found"})
+            return
+        config_section, write = self.query_options(parsed_url)
+        content_length = int(self.headers.get("Content-Length", 0))
+        try:
+            article = article_from_json(json.loads(self.rfile.read(content_length)))
+        except (ValueError, AttributeError, TypeError) as exception:
+            self.send_json(400, {"error": "bad article json: %s" % exception})
+            return
+        self.send_generated(write, article=article, config_section=config_section)
+
+
+class ThreadingUnixHTTPServer(
+    socketserver.ThreadingMixIn, socketserver.UnixStreamServer
+):
+    "HTTP over a Unix socket"
+
+    daemon_threads = True
+
+
+def create_server(service, host="127.0.0.1", port=8080, unix_socket=None):
+    "create the HTTP server for the service, on a TCP port or a Unix socket"
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = ThreadingUnixHTTPServer(unix_socket, ServiceRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), ServiceRequestHandler)
+    server.service = service
+    return server
+
+
+def serve(service, host="127.0.0.1", port=8080, unix_socket=None):
+    "run the service until interrupted"
+    server = create_server(service, host, port, unix_socket)
+    LOGGER.info("generation service listening on %s", unix_socket or (host, port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
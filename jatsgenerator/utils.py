@@ -1,8 +1,13 @@
 """Utility functions for generating JATS"""
 
+import copy
 import re
+import threading
+from collections import OrderedDict
+from xml.etree.ElementTree import Element
 from elifetools import utils as etoolsutils
 from elifetools import xmlio
+from jatsgenerator import compacttree
 
 
 # namespaces for when reparsing XML strings
@@ -13,6 +18,70 @@ XML_NAMESPACE_MAP = {
 }
 
 
+class LRUCache:
+    "bounded least recently used cache, safe to share between threads, with counters"
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._values:
+                self._values.move_to_end(key)
+                self.hits += 1
+                return self._values[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        if not self.maxsize:
+            return
+        with self._lock:
+            self._values[key] = value
+            self._values.move_to_end(key)
+            while len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._values)
+
+    def stats(self):
+        "dict of the cache size and hit rate"
+        lookups = self.hits + self.misses
+        return OrderedDict(
+            [
+                ("size", len(self._values)),
+                ("maxsize", self.maxsize),
+                ("hits", self.hits),
+                ("misses", self.misses),
+                ("hit_rate", float(self.hits) / lookups if lookups else 0.0),
+            ]
+        )
+
+
+# parsed append_to_tag fragments, copied into the parent tag when found again
+FRAGMENT_CACHE = LRUCache(maxsize=2048)
+
+# longer strings, e.g. body content, are not worth keeping in the cache
+FRAGMENT_CACHE_MAX_LENGTH = 2000
+
+# namespace strings keyed on the namespace map items
+NAMESPACES_CACHE = LRUCache(maxsize=64)
+
+# match the DOI portion of a sciety.org uri
+OBJECT_ID_PATTERN = re.compile(r".*?/(10\..*)")
+
+
 def reparsing_namespaces(namespace_map):
     """compile a string representation of the namespaces"""
     namespace_string = ""
@@ -21,6 +90,16 @@ def reparsing_namespaces(namespace_map):
     return namespace_string.rstrip()
 
 
+def cached_reparsing_namespaces(namespace_map):
+    "memoized reparsing_namespaces(), e.g. for the same XML_NAMESPACE_MAP every time"
+    key = tuple(namespace_map.items())
+    namespace_string = NAMESPACES_CACHE.get(key)
+    if namespace_string is None:
+        namespace_string = reparsing_namespaces(namespace_map)
+        NAMESPACES_CACHE.put(key, namespace_string)
+    return namespace_string
+
+
 def allowed_tags():
     "tuple of whitelisted tags"
     return (
@@ -96,20 +175,58 @@ def append_to_tag(
     """
     method to retain inline tagging when adding to a parent tag
     escape and reparse the string then add it to the parent tag
+    a copy of the parsed tag is kept in the FRAGMENT_CACHE for when it recurs
+    the parent can be an ElementTree element or a compacttree.Node
     """
+    namespaces_string = ""
+    if namespace_map:
+        namespaces_string = cached_reparsing_namespaces(namespace_map)
+
+    cache_key = None
+    if (
+        isinstance(original_string, str)
+        and len(original_string) <= FRAGMENT_CACHE_MAX_LENGTH
+    ):
+        cache_key = (
+            tag_name,
+            original_string,
+            namespaces_string,
+            tuple(attributes) if attributes else None,
+            attributes_text,
+        )
+        cached_tag = FRAGMENT_CACHE.get(cache_key)
+        if cached_tag is not None:
+            if isinstance(parent, compacttree.Node):
+                # the node is a copy already
+                parent.append(cached_tag)
+            else:
+                parent.append(copy.deepcopy(cached_tag))
+            return parent
+
     tag_converted_string = etoolsutils.escape_ampersand(original_string)
     tag_converted_string = etoolsutils.escape_unmatched_angle_brackets(
         tag_converted_string, allowed_tags()
     )
-    namespaces_string = ""
-    if namespace_map:
-        namespaces_string = reparsing_namespaces(namespace_map)
     minidom_tag = xmlio.reparsed_tag(
         tag_name, tag_converted_string, namespaces_string, attributes_text
     )
+    if isinstance(parent, compacttree.Node):
+        # parse the tag into an ElementTree element then copy it into the node
+        fragment_parent = xmlio.append_minidom_xml_to_elementtree_xml(
+            Element(parent.tag),
+            minidom_tag,
+            attributes=attributes,
+            child_attributes=True,
+        )
+        parent.append(fragment_parent[-1])
+        if cache_key:
+            FRAGMENT_CACHE.put(cache_key, fragment_parent[-1])
+        return parent
     root_xml_element = xmlio.append_minidom_xml_to_elementtree_xml(
         parent, minidom_tag, attributes=attributes, child_attributes=True
     )
+    if cache_key:
+        FRAGMENT_CACHE.put(cache_key, copy.deepcopy(root_xml_element[-1]))
     return root_xml_element
 
 
@@ -120,8 +237,7 @@ def object_id_from_uri(uri):
     return 10.1101/865006
     """
     if uri:
-        id_match_pattern = re.compile(r".*?/(10\..*)")
-        matches = id_match_pattern.match(uri)
+        matches = OBJECT_ID_PATTERN.match(uri)
         if matches:
             return matches.group(1)
         return uri
@@ -0,0 +1,109 @@
+"""Watch the POA CSV files and regenerate only the manuscripts whose rows changed"""
+
+import time
+from jatsgenerator import csvfiles, generate, output
+
+LOGGER = generate.LOGGER
+
+
+def sort_article_ids(article_ids):
+    "sort numeric manuscript numbers numerically, anything else after them"
+    return sorted(
+        article_ids,
+        key=lambda article_id: (
+            not str(article_id).isdigit(),
+            int(article_id) if str(article_id).isdigit() else 0,
+            str(article_id),
+        ),
+    )
+
+
+class CsvWatcher:
+    "keep a signature of each CSV file and a digest of the rows for each manuscript"
+
+    def __init__(self, csv_path):
+        self.csv_path = csv_path
+        self.signatures = {}
+        self.digests = {}
+        for table_type, path in csvfiles.csv_file_paths(csv_path).items():
+            self.signatures[table_type] = csvfiles.file_signature(path)
+            self.digests[table_type] = self.read_digests(path)
+
+    @staticmethod
+    def read_digests(path):
+        if csvfiles.file_signature(path) is None:
+            return {}
+        return csvfiles.manuscript_digests(path)
+
+    def changed_article_ids(self):
+        """
+        compare the CSV files to the previous snapshot,
+        return manuscript numbers with rows which were added, changed or removed
+        """
+        article_ids = set()
+        for table_type, path in csvfiles.csv_file_paths(self.csv_path).items():
+            signature = csvfiles.file_signature(path)
+            if signature == self.signatures.get(table_type):
+                continue
+            digests = self.read_digests(path)
+            old_digests = self.digests.get(table_type, {})
+            for article_id in set(digests.keys()) | set(old_digests.keys()):
+                if digests.get(article_id) != old_digests.get(article_id):
+                    article_ids.add(article_id)
+            self.signatures[table_type] = signature
+            self.digests[table_type] = digests
+        return sort_article_ids(article_ids)
+
+    def current_article_ids(self):
+        "manuscript numbers which are in the manuscript CSV file"
+        return set(self.digests.get("manuscript", {}).keys())
+
+
+def regenerate(watcher, jats_config=None, add_comment=True, tmp_dir=None):
+    """
+    regenerate XML for manuscripts with changed rows in the CSV files,
+    ejpcsvparser writes its cleaned CSV files to tmp_dir if specified,
+    return a dict of the results keyed on manuscript number
+    """
+    results = {}
+    article_ids = watcher.changed_article_ids()
+    if not article_ids:
+        return results
+    LOGGER.info("CSV rows changed for manuscripts %s", article_ids)
+    # a new context so the changed CSV files are parsed again
+    generation_context = generate.GenerationContext(
+        watcher.csv_path, jats_config, LOGGER, tmp_dir
+    )
+    current_article_ids = watcher.current_article_ids()
+    with output.run_sink(generation_context.jats_config) as poll_sink:
+        for article_id in article_ids:
+            if article_id not in current_article_ids:
+                LOGGER.info("manuscript %s is no longer in the CSV data", article_id)
+                continue
+            results[article_id] = generate.build_xml_to_disk(
+                article_id,
+                None,
+                jats_config,
+                add_comment,
+                sink=poll_sink,
+                generation_context=generation_context,
+            )
+    return results
+
+
+def watch(
+    csv_path,
+    jats_config=None,
+    add_comment=True,
+    interval=5.0,
+    max_polls=None,
+    tmp_dir=None,
+):
+    "poll the CSV files every interval seconds and regenerate changed manuscripts"
+    watcher = CsvWatcher(csv_path)
+    polls = 0
+    while max_polls is None or polls < max_polls:
+        time.sleep(interval)
+        regenerate(watcher, jats_config, add_comment, tmp_dir)
+        polls += 1
+    return watcher
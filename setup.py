@@ -1,4 +1,5 @@
 "module setup script"
+
 from setuptools import setup
 
 import jatsgenerator
@@ -21,6 +22,9 @@ setup(
         "GitPython",
         "configparser",
     ],
+    entry_points={
+        "console_scripts": ["jatsgenerator=jatsgenerator.cli:main"],
+    },
     url="https://github.com/elifesciences/jats-generator",
     maintainer="eLife Sciences Publications Ltd.",
     maintainer_email="tech-team@elifesciences.org",
@@ -0,0 +1,144 @@
+import unittest
+import os
+import shutil
+import zipfile
+from unittest.mock import patch
+from ejpcsvparser import csv_data
+from jatsgenerator import batch, generate, output
+from tests import helpers
+
+
+class TestBuildXmlBatch(unittest.TestCase):
+    def setUp(self):
+        # override settings
+        csv_data.CSV_PATH = helpers.TEST_DATA_PATH
+        self.zip_file_path = helpers.TARGET_OUTPUT_DIR + "batch.zip"
+
+    def tearDown(self):
+        if os.path.exists(self.zip_file_path):
+            os.remove(self.zip_file_path)
+
+    def test_build_xml_batch_to_zip(self):
+        "build articles streamed into a zip file and compare the output"
+        jats_config = helpers.build_config("elife")
+        article_ids = [7, 12, 99999]
+        results = batch.build_xml_batch_to_target(
+            article_ids, self.zip_file_path, jats_config, add_comment=False
+        )
+        self.assertEqual(list(results.items()), [(7, True), (12, True), (99999, False)])
+        with zipfile.ZipFile(self.zip_file_path) as zip_file:
+            self.assertEqual(
+                zip_file.namelist(), ["elife_poa_e00007.xml", "elife_poa_e00012.xml"]
+            )
+            for filename in zip_file.namelist():
+                model_xml = helpers.read_file_content(helpers.TEST_DATA_PATH + filename)
+                self.assertEqual(zip_file.read(filename), model_xml)
+
+    def test_build_xml_batch_index_csv(self):
+        "only the CSV rows of the batch are read into the generation context"
+        jats_config = helpers.build_config("elife")
+        generation_context = generate.GenerationContext(
+            helpers.TEST_DATA_PATH, jats_config, index_csv=True
+        )
+        results = batch.build_xml_batch_to_target(
+            [7, 12],
+            self.zip_file_path,
+            jats_config,
+            add_comment=False,
+            generation_context=generation_context,
+        )
+        self.assertEqual(list(results.values()), [True, True])
+        self.assertEqual(
+            len(generation_context.csv_caches.get("get_csv_data_rows")[("title",)]), 2
+        )
+        with zipfile.ZipFile(self.zip_file_path) as zip_file:
+            for filename in zip_file.namelist():
+                model_xml = helpers.read_file_content(helpers.TEST_DATA_PATH + filename)
+                self.assertEqual(zip_file.read(filename), model_xml)
+
+    def test_build_xml_batch_index_csv_path_setting(self):
+        "with no csv_path the index_csv context uses the ejpcsvparser CSV_PATH"
+        jats_config = helpers.build_config("elife")
+        generation_context = generate.GenerationContext(
+            jats_config=jats_config, index_csv=True
+        )
+        self.assertEqual(generation_context.csv_path, helpers.TEST_DATA_PATH)
+        results = batch.build_xml_batch_to_target(
+            [7, 12],
+            self.zip_file_path,
+            jats_config,
+            add_comment=False,
+            generation_context=generation_context,
+        )
+        self.assertEqual(list(results.values()), [True, True])
+        self.assertEqual(
+            len(generation_context.csv_caches.get("get_csv_data_rows")[("title",)]), 2
+        )
+
+
+class TestBuildXmlBatchSharded(unittest.TestCase):
+    def setUp(self):
+        csv_data.CSV_PATH = helpers.TEST_DATA_PATH
+        self.output_dir = helpers.TARGET_OUTPUT_DIR + "sharded_batch"
+        os.mkdir(self.output_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_build_xml_batch_sharded(self):
+        "build articles into a directory sharded by the config"
+        jats_config = helpers.build_config("elife")
+        jats_config["shard_layout"] = "prefix"
+        results = batch.build_xml_batch_to_target(
+            [7, 12717], self.output_dir, jats_config, add_comment=False
+        )
+        self.assertEqual(list(results.values()), [True, True])
+        index = output.read_shard_index(self.output_dir)
+        self.assertEqual(
+            index.get("elife_poa_e12717.xml"),
+            os.path.join("12", "elife_poa_e12717.xml"),
+        )
+        for filename, path in index.items():
+            self.assertEqual(
+                helpers.read_file_content(os.path.join(self.output_dir, path)),
+                helpers.read_file_content(helpers.TEST_DATA_PATH + filename),
+            )
+
+    def test_build_xml_batch_sharded_config_sink(self):
+        "a batch with no sink opens one sharded sink for the run"
+        jats_config = helpers.build_config("elife")
+        jats_config["target_output_dir"] = self.output_dir
+        jats_config["shard_layout"] = "prefix"
+        with patch.object(output, "config_sink", wraps=output.config_sink) as sink:
+            results = batch.build_xml_batch([7, 12717], jats_config, add_comment=False)
+        self.assertEqual(list(results.values()), [True, True])
+        self.assertEqual(sink.call_count, 1)
+        self.assertEqual(len(output.read_shard_index(self.output_dir)), 2)
+
+
+class TestBuildXmlBatchGroupCommit(unittest.TestCase):
+    def setUp(self):
+        csv_data.CSV_PATH = helpers.TEST_DATA_PATH
+        self.output_dir = helpers.TARGET_OUTPUT_DIR + "group_commit_batch"
+        os.mkdir(self.output_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_build_xml_batch_group_commit(self):
+        "a batch with no sink opens one group committed sink for the run"
+        jats_config = helpers.build_config("elife")
+        jats_config["target_output_dir"] = self.output_dir
+        jats_config["group_commit_size"] = 10
+        with patch.object(
+            output, "GroupCommitSink", wraps=output.GroupCommitSink
+        ) as group_commit_sink:
+            with patch("os.fsync", wraps=os.fsync) as fsync:
+                results = batch.build_xml_batch(
+                    [7, 12, 2725, 2935], jats_config, add_comment=False
+                )
+        self.assertEqual(list(results.values()), [True, True, True, True])
+        self.assertEqual(group_commit_sink.call_count, 1)
+        # one fsync of each file and one of the directory
+        self.assertEqual(fsync.call_count, 5)
+        self.assertEqual(len(os.listdir(self.output_dir)), 4)
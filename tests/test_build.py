@@ -40,6 +40,136 @@ class TestBuild(unittest.TestCase):
         )
 
 
+class TestContributorPartition(unittest.TestCase):
+    def test_contributor_partition(self):
+        "test partitioning contributors by type, corresp and copyright holder"
+        author_1 = Contributor("author", "One", "Author")
+        author_1.corresp = True
+        author_2 = Contributor("author", None, None, "Group")
+        editor = Contributor("editor", "Orr", "Edit")
+        editor.corresp = True
+        contributors = [author_1, editor, author_2]
+        # invoke
+        partition = build.ContributorPartition(contributors)
+        # assert
+        self.assertEqual(list(partition.by_type.keys()), ["author", "editor"])
+        self.assertEqual(partition.get_contributors("author"), [author_1, author_2])
+        self.assertEqual(partition.get_contributors("editor"), [editor])
+        self.assertEqual(partition.get_contributors("reviewer"), [])
+        self.assertEqual(partition.get_contributors(), contributors)
+        self.assertEqual(partition.corresp, [author_1, editor])
+        self.assertEqual(partition.copyright_holders, [author_1])
+
+
+class TestArticleView(unittest.TestCase):
+    def test_article_view(self):
+        "test the view answers from the article and is read-only"
+        article = Article("10.7554/eLife.00666", "Title")
+        article.display_channel = "Research Article"
+        article.add_date(
+            ArticleDate("received", time.strptime("2012-06-22", "%Y-%m-%d"))
+        )
+        author = Contributor("author", "One", "Author")
+        article.add_contributor(author)
+        # invoke
+        article_view = build.ArticleView(article)
+        # assert
+        self.assertEqual(article_view.doi, "10.7554/eLife.00666")
+        self.assertEqual(article_view.contributors, [author])
+        self.assertFalse(article_view.has_contributor_conflict())
+        self.assertEqual(article_view.get_display_channel(), "Research Article")
+        self.assertEqual(
+            article_view.get_date("received"), article.get_date("received")
+        )
+        self.assertIsNone(article_view.get_date("accepted"))
+        self.assertEqual(article_view.get_datasets("datasets"), [])
+        with self.assertRaises(AttributeError):
+            article_view.doi = "10.7554/eLife.00667"
+
+    def test_article_view_datasets(self):
+        "test datasets partitioned by type in their original order"
+        article = generate.build_article_from_csv(
+            14997, generation_context=generate.GenerationContext(helpers.TEST_DATA_PATH)
+        )
+        article_view = build.ArticleView(article)
+        self.assertEqual(len(article_view.get_datasets("datasets")), 1)
+        self.assertEqual(len(article_view.get_datasets("prev_published_datasets")), 1)
+        for dataset_type in ["datasets", "prev_published_datasets", "other"]:
+            self.assertEqual(
+                article_view.get_datasets(dataset_type),
+                article.get_datasets(dataset_type),
+            )
+        self.assertEqual(article_view.get_datasets(), article.datasets)
+
+
+class TestConflictPlan(unittest.TestCase):
+    def setUp(self):
+        self.article = Article("10.7554/eLife.00666", "Title")
+        self.author_1 = Contributor("author", "One", "Author")
+        self.author_1.set_conflict("Is a <italic>founder</italic>")
+        self.author_1.set_conflict("Is an editor")
+        self.author_2 = Contributor("author", "Two", "Author")
+        self.author_3 = Contributor("author", "Three", "Author")
+        self.author_3.set_conflict("Is a consultant")
+        for contributor in [self.author_1, self.author_2, self.author_3]:
+            self.article.add_contributor(contributor)
+
+    def test_conflict_plan(self):
+        "test conflict ids and text when there is a conflict default"
+        self.article.conflict_default = "No competing interests."
+        # invoke
+        conflict_plan = build.ConflictPlan(self.article)
+        # assert
+        self.assertEqual(
+            conflict_plan.footnotes,
+            [
+                ("conf2", "Author One, Is a <italic>founder</italic>."),
+                ("conf3", "Author One, Is an editor."),
+                ("conf4", "Author Three, Is a consultant."),
+            ],
+        )
+        self.assertEqual(conflict_plan.get_rid(self.author_1), "conf2")
+        self.assertEqual(conflict_plan.get_rid(self.author_2), "conf1")
+        self.assertEqual(conflict_plan.get_rid(self.author_3), "conf4")
+        self.assertEqual(
+            conflict_plan.default_text,
+            "The other authors declare that no competing interests exist.",
+        )
+
+    def test_conflict_plan_no_default(self):
+        "test conflict ids when there is no conflict default"
+        conflict_plan = build.ConflictPlan(self.article)
+        self.assertEqual(conflict_plan.get_rid(self.author_1), "conf1")
+        self.assertEqual(conflict_plan.get_rid(self.author_2), None)
+        self.assertEqual(conflict_plan.get_rid(self.author_3), "conf3")
+        self.assertEqual(conflict_plan.default_rid, None)
+
+    def test_set_fn_group_competing_interest(self):
+        "test the fn-group ids match the plan"
+        root = Element("root")
+        self.article.conflict_default = "No competing interests."
+        build.set_fn_group_competing_interest(root, self.article)
+        xml_string = ElementTree.tostring(root, encoding="utf-8")
+        expected = (
+            b"<root>"
+            b'<fn-group content-type="competing-interest">'
+            b"<title>Competing interest</title>"
+            b'<fn fn-type="conflict" id="conf2">'
+            b"<p>Author One, Is a <italic>founder</italic>.</p>"
+            b"</fn>"
+            b'<fn fn-type="conflict" id="conf3"><p>Author One, Is an editor.</p></fn>'
+            b'<fn fn-type="conflict" id="conf4">'
+            b"<p>Author Three, Is a consultant.</p>"
+            b"</fn>"
+            b'<fn fn-type="conflict" id="conf1">'
+            b"<p>The other authors declare that no competing interests exist.</p>"
+            b"</fn>"
+            b"</fn-group>"
+            b"</root>"
+        )
+        self.assertEqual(xml_string, expected)
+
+
 class TestSetName(unittest.TestCase):
     "tests for set_name()"
 
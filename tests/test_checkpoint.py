@@ -0,0 +1,112 @@
+import os
+import shutil
+import unittest
+from ejpcsvparser import csv_data
+from jatsgenerator import batch, checkpoint
+from tests import helpers
+
+
+class TestCheckpointJournal(unittest.TestCase):
+    def setUp(self):
+        self.journal_path = helpers.TARGET_OUTPUT_DIR + "checkpoint.jsonl"
+
+    def tearDown(self):
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+    def test_plan(self):
+        with checkpoint.CheckpointJournal(self.journal_path, max_attempts=2) as journal:
+            journal.record(7, True)
+            journal.record(12, False)
+            journal.record(99999, False)
+            journal.record(99999, False)
+        # a line partly written when the run was interrupted
+        with open(self.journal_path, "a") as open_file:
+            open_file.write('{"article_id": "12", "sta')
+        with checkpoint.CheckpointJournal(self.journal_path, max_attempts=2) as journal:
+            resume_plan = journal.plan([3, 7, 12, 99999])
+        self.assertEqual(resume_plan.pending, [3])
+        self.assertEqual(resume_plan.retry, [12])
+        self.assertEqual(resume_plan.done, [7])
+        self.assertEqual(resume_plan.exhausted, [99999])
+        self.assertEqual(resume_plan.article_ids, [3, 12])
+        self.assertEqual(
+            resume_plan.summary(),
+            "resuming: 1 already done, 1 failures to retry, "
+            + "1 failed too many times, 1 not yet attempted",
+        )
+
+    def test_done_after_failure(self):
+        with checkpoint.CheckpointJournal(self.journal_path) as journal:
+            journal.record(12, False)
+            journal.record(12, True)
+            self.assertEqual(journal.plan([12]).done, [12])
+
+
+class TestBuildXmlBatchCheckpoint(unittest.TestCase):
+    def setUp(self):
+        # override settings
+        csv_data.CSV_PATH = helpers.TEST_DATA_PATH
+        self.output_dir = helpers.TARGET_OUTPUT_DIR + "checkpoint/"
+        self.journal_path = helpers.TARGET_OUTPUT_DIR + "checkpoint.jsonl"
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+    def test_resume(self):
+        "articles done in the first run are skipped, the failure is retried once"
+        jats_config = helpers.build_config("elife")
+        article_ids = [7, 12, 99999]
+        with checkpoint.CheckpointJournal(self.journal_path, max_attempts=2) as journal:
+            results = batch.build_xml_batch_to_target(
+                article_ids[0:2], self.output_dir, jats_config, checkpoint=journal
+            )
+        self.assertEqual(list(results.items()), [(7, True), (12, True)])
+        os.remove(self.output_dir + "elife_poa_e00007.xml")
+        for expected in [(99999, False), (99999, False)]:
+            with checkpoint.CheckpointJournal(
+                self.journal_path, max_attempts=2
+            ) as journal:
+                results = batch.build_xml_batch_to_target(
+                    article_ids, self.output_dir, jats_config, checkpoint=journal
+                )
+            self.assertEqual(list(results.items()), [(7, True), (12, True), expected])
+        self.assertEqual(os.listdir(self.output_dir), ["elife_poa_e00012.xml"])
+        with open(self.journal_path, "r") as open_file:
+            self.assertEqual(len(open_file.readlines()), 4)
+
+    def test_archive_target(self):
+        "a checkpoint with an archive target is refused before the archive is opened"
+        zip_file_path = helpers.TARGET_OUTPUT_DIR + "checkpoint.zip"
+        with checkpoint.CheckpointJournal(self.journal_path) as journal:
+            with self.assertRaises(ValueError):
+                batch.build_xml_batch_to_target([7], zip_file_path, checkpoint=journal)
+        self.assertFalse(os.path.exists(zip_file_path))
+
+    def test_group_commit(self):
+        "an article is only journaled once its group committed file is in place"
+        jats_config = helpers.build_config("elife")
+        jats_config["group_commit_size"] = 10
+        recorded = []
+        with checkpoint.CheckpointJournal(self.journal_path) as journal:
+            record = journal.record
+
+            def checked_record(article_id, result):
+                recorded.append(
+                    os.path.exists(
+                        os.path.join(
+                            self.output_dir, "elife_poa_e%05d.xml" % article_id
+                        )
+                    )
+                )
+                record(article_id, result)
+
+            journal.record = checked_record
+            results = batch.build_xml_batch_to_target(
+                [7, 12, 3], self.output_dir, jats_config, checkpoint=journal
+            )
+        self.assertEqual(list(results.values()), [True, True, True])
+        self.assertEqual(recorded, [True, True, True])
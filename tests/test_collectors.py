@@ -0,0 +1,118 @@
+import json
+import os
+import unittest
+import zipfile
+from jatsgenerator import batch, collectors, generate, output, pipeline
+from tests import helpers
+
+COLLECTORS = [collectors.MetadataCollector, collectors.ContributorTsvCollector]
+
+
+class TestOutputFilename(unittest.TestCase):
+    def test_output_filename(self):
+        self.assertEqual(
+            collectors.output_filename("elife_poa_e00007.xml", ".json"),
+            "elife_poa_e00007.json",
+        )
+
+
+class TestCollectors(unittest.TestCase):
+    def setUp(self):
+        self.jats_config = helpers.build_config("elife")
+        self.generation_context = generate.GenerationContext(
+            helpers.TEST_DATA_PATH, self.jats_config
+        )
+        self.zip_file_path = helpers.TARGET_OUTPUT_DIR + "collectors.zip"
+
+    def tearDown(self):
+        if os.path.exists(self.zip_file_path):
+            os.remove(self.zip_file_path)
+
+    def build_outputs(self, article_id):
+        outputs = {}
+        xml_bytes = generate.build_xml_bytes(
+            article_id,
+            None,
+            self.jats_config,
+            False,
+            generation_context=self.generation_context,
+            collectors=COLLECTORS,
+            outputs=outputs,
+        )
+        return xml_bytes, outputs
+
+    def test_build_xml_bytes_outputs(self):
+        "the XML is unchanged and each collector adds its output"
+        xml_bytes, outputs = self.build_outputs(2935)
+        self.assertEqual(
+            xml_bytes,
+            helpers.read_file_content(helpers.TEST_DATA_PATH + "elife_poa_e02935.xml"),
+        )
+        self.assertEqual(list(outputs.keys()), [".json", ".tsv"])
+
+    def test_metadata(self):
+        "JSON metadata of the article"
+        metadata = json.loads(self.build_outputs(2935)[1].get(".json").decode("utf-8"))
+        self.assertEqual(metadata.get("doi"), "10.7554/eLife.02935")
+        self.assertEqual(metadata.get("contributors")[0].get("surname"), "Ju")
+        self.assertEqual(metadata.get("contributors")[0].get("affiliations"), [1])
+        self.assertEqual(
+            metadata.get("affiliations").get("aff1").get("institution"),
+            "Wellcome Trust Sanger Institute",
+        )
+        self.assertTrue(metadata.get("dates"))
+
+    def test_contributor_tsv(self):
+        "one TSV row for each contributor affiliation"
+        tsv_lines = self.build_outputs(2935)[1].get(".tsv").decode("utf-8").splitlines()
+        self.assertEqual(tsv_lines[0].split("\t"), list(collectors.TSV_COLUMNS))
+        first_row = tsv_lines[1].split("\t")
+        self.assertEqual(first_row[:4], ["2935", "10.7554/eLife.02935", "author", "Ju"])
+        self.assertEqual(first_row[8], "aff1")
+
+    def test_batch_outputs(self):
+        "a batch writes the outputs alongside the XML files"
+        results = batch.build_xml_batch_to_target(
+            [7],
+            self.zip_file_path,
+            self.jats_config,
+            add_comment=False,
+            generation_context=self.generation_context,
+            collectors=COLLECTORS,
+        )
+        self.assertEqual(list(results.items()), [(7, True)])
+        with zipfile.ZipFile(self.zip_file_path) as zip_file:
+            self.assertEqual(
+                zip_file.namelist(),
+                [
+                    "elife_poa_e00007.xml",
+                    "elife_poa_e00007.json",
+                    "elife_poa_e00007.tsv",
+                ],
+            )
+            self.assertEqual(
+                zip_file.read("elife_poa_e00007.xml"),
+                helpers.read_file_content(
+                    helpers.TEST_DATA_PATH + "elife_poa_e00007.xml"
+                ),
+            )
+
+    def test_pipeline_outputs(self):
+        "the pipeline writes the outputs alongside the XML files"
+        with output.ZipSink(self.zip_file_path) as sink:
+            results = pipeline.Pipeline(
+                self.jats_config,
+                add_comment=False,
+                sink=sink,
+                generation_context=self.generation_context,
+                collectors=COLLECTORS,
+            ).run([7, 12])
+        self.assertEqual(list(results.items()), [(7, True), (12, True)])
+        with zipfile.ZipFile(self.zip_file_path) as zip_file:
+            self.assertEqual(len(zip_file.namelist()), 6)
+            metadata = json.loads(zip_file.read("elife_poa_e00012.json"))
+            self.assertEqual(metadata.get("doi"), "10.7554/eLife.00012")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+from xml.dom import minidom
+from xml.etree import ElementTree
+from xml.etree.ElementTree import Element
+from jatsgenerator import compacttree, utils
+
+
+def minidom_bytes(element):
+    "bytes of the element as output_xml() writes them, without the XML declaration"
+    xml_bytes = minidom.parseString(ElementTree.tostring(element, "utf-8")).toxml(
+        encoding="utf-8"
+    )
+    return xml_bytes[xml_bytes.index(b"?>") + 2 :]
+
+
+class TestNode(unittest.TestCase):
+    def test_sub_element(self):
+        "test SubElement adds a Node to a Node and an Element to an Element"
+        root = compacttree.Node("root")
+        child = compacttree.SubElement(root, "child", {"id": "c1"})
+        self.assertIsInstance(child, compacttree.Node)
+        self.assertEqual(len(root), 1)
+        self.assertIs(root[-1], child)
+        self.assertEqual(child.get("id"), "c1")
+        element = compacttree.SubElement(Element("root"), "child")
+        self.assertIsInstance(element, type(Element("root")))
+
+    def test_append_element(self):
+        "test an ElementTree element is appended as a copy"
+        element = Element("title")
+        element.text = "A "
+        italic = ElementTree.SubElement(element, "italic")
+        italic.text = "title"
+        italic.tail = "."
+        root = compacttree.Node("root")
+        root.append(element)
+        element.text = "changed"
+        self.assertEqual(root[0].text, "A ")
+        self.assertEqual([child.tag for child in root[0]], ["italic"])
+        self.assertEqual(root[0][0].tail, ".")
+
+    def test_to_element(self):
+        root = compacttree.Node("root")
+        root.append(compacttree.Comment("generated"))
+        child = compacttree.SubElement(root, "child")
+        child.text = "text"
+        child.tail = "tail"
+        self.assertEqual(
+            ElementTree.tostring(compacttree.to_element(root)),
+            b"<root><!--generated--><child>text</child>tail</root>",
+        )
+
+
+class TestToString(unittest.TestCase):
+    def test_tostring(self):
+        "test the bytes are the same as minidom writes after reparsing"
+        root = compacttree.Node("article")
+        root.set("article-type", "research-article")
+        root.set("xmlns:mml", "http://www.w3.org/1998/Math/MathML")
+        root.text = "a & b < c > d \"e\" 'f'\r\ng"
+        empty = compacttree.SubElement(root, "empty")
+        empty.set("value", 'a & b < c > d "e"\n\tf\r')
+        empty.tail = "tail é \U0001f600"
+        compacttree.SubElement(root, "blank").text = ""
+        utils.append_to_tag(
+            root, "p", "An <italic>italic</italic> & <bold>bold</bold> text"
+        )
+        self.assertEqual(
+            compacttree.tostring(root),
+            minidom_bytes(compacttree.to_element(root)),
+        )
+        self.assertTrue(
+            compacttree.tostring(root).startswith(
+                b'<article xmlns:mml="http://www.w3.org/1998/Math/MathML" '
+                + b'article-type="research-article">'
+            )
+        )
+
+    def test_tostring_prefix(self):
+        self.assertEqual(
+            compacttree.tostring(compacttree.Node("root"), "<?xml?>"), b"<?xml?><root/>"
+        )
@@ -0,0 +1,72 @@
+import os
+import shutil
+import unittest
+import zipfile
+from jatsgenerator import batch, csvcache, csvfiles, csvindex, generate
+from tests import helpers
+
+
+class TestCsvCache(unittest.TestCase):
+    def setUp(self):
+        # a copy of the CSV files which can be changed
+        self.csv_path = os.path.join(helpers.TARGET_OUTPUT_DIR, "csv_cache")
+        if not os.path.exists(self.csv_path):
+            os.mkdir(self.csv_path)
+        for path in csvfiles.csv_file_paths(helpers.TEST_DATA_PATH).values():
+            shutil.copy(path, self.csv_path)
+        self.cache_path = os.path.join(self.csv_path, "csv_cache.sqlite")
+        self.zip_file_path = os.path.join(self.csv_path, "batch.zip")
+
+    def tearDown(self):
+        shutil.rmtree(self.csv_path)
+
+    def test_refresh(self):
+        table_types = list(csvfiles.csv_file_paths(self.csv_path).keys())
+        with csvcache.CsvCache(self.cache_path, self.csv_path) as csv_cache:
+            self.assertEqual(csv_cache.refresh(), table_types)
+        # a new run starts warm
+        with csvcache.CsvCache(self.cache_path, self.csv_path) as csv_cache:
+            self.assertEqual(csv_cache.refresh(), [])
+            # touched files are not parsed again
+            title_path = os.path.join(self.csv_path, "poa_title.csv")
+            os.utime(title_path, (1, 1))
+            self.assertEqual(csv_cache.refresh(), [])
+            # changed files are parsed again
+            with open(title_path, "a") as open_file:
+                open_file.write('"99","99999","Added title"\n')
+            self.assertEqual(csv_cache.refresh(), ["title"])
+            self.assertEqual(
+                csv_cache.rows("title", [99999]), [["99", "99999", "Added title"]]
+            )
+
+    def test_rows(self):
+        with csvcache.CsvCache(self.cache_path, self.csv_path) as csv_cache:
+            csv_cache.refresh()
+            for table_type, path in csvfiles.csv_file_paths(self.csv_path).items():
+                csv_index = csvindex.CsvIndex(table_type, path)
+                self.assertEqual(csv_cache.col_names(table_type), csv_index.col_names)
+                self.assertEqual(
+                    csv_cache.rows(table_type, [7, 12]), csv_index.rows([7, 12])
+                )
+
+    def test_build_xml_batch(self):
+        "build articles from the cached rows and compare the output"
+        jats_config = helpers.build_config("elife")
+        for _ in range(2):
+            generation_context = generate.GenerationContext(
+                self.csv_path, jats_config, csv_cache_path=self.cache_path
+            )
+            results = batch.build_xml_batch_to_target(
+                [7, 12],
+                self.zip_file_path,
+                jats_config,
+                add_comment=False,
+                generation_context=generation_context,
+            )
+            self.assertEqual(list(results.values()), [True, True])
+            with zipfile.ZipFile(self.zip_file_path) as zip_file:
+                for filename in zip_file.namelist():
+                    model_xml = helpers.read_file_content(
+                        helpers.TEST_DATA_PATH + filename
+                    )
+                    self.assertEqual(zip_file.read(filename), model_xml)
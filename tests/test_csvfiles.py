@@ -0,0 +1,89 @@
+import unittest
+from ejpcsvparser import csv_data
+from jatsgenerator import csvfiles
+from tests import helpers
+
+
+class TestCsvFilePaths(unittest.TestCase):
+    def test_csv_file_paths(self):
+        paths = csvfiles.csv_file_paths(helpers.TEST_DATA_PATH)
+        self.assertEqual(
+            paths.get("authors"), helpers.TEST_DATA_PATH + "poa_author.csv"
+        )
+        self.assertEqual(len(paths), 13)
+
+
+class TestFileSignature(unittest.TestCase):
+    def test_file_signature(self):
+        signature = csvfiles.file_signature(helpers.TEST_DATA_PATH + "poa_title.csv")
+        self.assertEqual(len(signature), 2)
+        self.assertIsNone(csvfiles.file_signature(helpers.TEST_DATA_PATH + "none.csv"))
+
+
+class TestManuscriptLines(unittest.TestCase):
+    def test_manuscript_lines(self):
+        "compare the lines per manuscript to the rows the ejpcsvparser reads"
+        csv_data.CSV_PATH = helpers.TEST_DATA_PATH
+        article_index = csvfiles.manuscript_lines(
+            helpers.TEST_DATA_PATH + "poa_author.csv"
+        )
+        # ignore empty lists the index defaultdict gains when it is queried
+        expected = {
+            key: value
+            for key, value in csv_data.index_table_on_article_id("authors").items()
+            if value
+        }
+        self.assertEqual(sorted(article_index.keys()), sorted(expected.keys()))
+        for article_id, lines in article_index.items():
+            self.assertEqual(len(lines), len(expected.get(article_id)))
+
+    def test_manuscript_digests(self):
+        digests = csvfiles.manuscript_digests(helpers.TEST_DATA_PATH + "poa_title.csv")
+        self.assertTrue("7" in digests)
+        self.assertEqual(len(digests.get("7")), 40)
+
+
+class TestResetCsvCaches(unittest.TestCase):
+    def test_reset_csv_caches(self):
+        csv_data.CSV_PATH = helpers.TEST_DATA_PATH
+        csv_data.get_csv_col_names("title")
+        self.assertTrue(len(csv_data.get_csv_col_names) > 0)
+        csvfiles.reset_csv_caches()
+        self.assertEqual(len(csv_data.get_csv_col_names), 0)
+
+
+class TestCsvSource(unittest.TestCase):
+    def tearDown(self):
+        csv_data.CSV_PATH = helpers.TEST_DATA_PATH
+        csvfiles.reset_csv_caches()
+
+    def test_csv_source(self):
+        "the settings and memoized data are restored and the caches kept"
+        csv_data.CSV_PATH = "previous/"
+        csvfiles.reset_csv_caches()
+        caches = {}
+        with csvfiles.csv_source(helpers.TEST_DATA_PATH, caches=caches):
+            self.assertEqual(csv_data.CSV_PATH, helpers.TEST_DATA_PATH)
+            csv_data.get_csv_col_names("title")
+        self.assertEqual(csv_data.CSV_PATH, "previous/")
+        self.assertEqual(len(csv_data.get_csv_col_names), 0)
+        self.assertEqual(list(caches.get("get_csv_col_names").keys()), [("title",)])
+        with csvfiles.csv_source(helpers.TEST_DATA_PATH, caches=caches):
+            self.assertEqual(len(csv_data.get_csv_col_names), 1)
+
+    def test_csv_source_not_copied(self):
+        "the memoized functions of the caches are swapped in, not copied"
+        csvfiles.reset_csv_caches()
+        function = csv_data.get_csv_col_names
+        caches = {"get_csv_col_names": {("title",): ["primed"]}}
+        with csvfiles.csv_source(helpers.TEST_DATA_PATH, caches=caches):
+            memo = csv_data.get_csv_col_names
+            self.assertEqual(memo("title"), ["primed"])
+        self.assertTrue(caches.get("get_csv_col_names") is memo)
+        self.assertTrue(csv_data.get_csv_col_names is function)
+        with csvfiles.csv_source(helpers.TEST_DATA_PATH, caches=caches):
+            self.assertTrue(csv_data.get_csv_col_names is memo)
+
+    def test_csv_source_no_path(self):
+        with csvfiles.csv_source():
+            self.assertEqual(csv_data.CSV_PATH, helpers.TEST_DATA_PATH)
@@ -0,0 +1,84 @@
+import unittest
+from unittest.mock import patch
+from ejpcsvparser import csv_data
+from jatsgenerator import csvfiles, csvindex
+from tests import helpers
+
+
+class TestRecordRanges(unittest.TestCase):
+    def test_record_ranges(self):
+        "lines not ending in a quotation mark are joined to the next line"
+        buffer = b'"Query"\n"Generated"\n\n"a","b"\n"1","one\ntwo"\n"2","x"\n"3","end'
+        ranges = list(csvindex.record_ranges(buffer))
+        self.assertEqual(
+            [buffer[start:end] for start, end, first_line_end in ranges],
+            [b'"1","one\ntwo"\n', b'"2","x"\n', b'"3","end'],
+        )
+        self.assertEqual(buffer[ranges[0][0] : ranges[0][2]], b'"1","one\n')
+
+    def test_flatten_record(self):
+        self.assertEqual(
+            csvindex.flatten_record(b'"1","one\r\n  two"\r\n'), '"1","onetwo"\n'
+        )
+
+
+class TestCsvIndex(unittest.TestCase):
+    def setUp(self):
+        csv_data.CSV_PATH = helpers.TEST_DATA_PATH
+        csvfiles.reset_csv_caches()
+
+    def tearDown(self):
+        csvfiles.reset_csv_caches()
+
+    def test_rows_match_ejpcsvparser(self):
+        "compare the indexed rows of each file to the rows the ejpcsvparser reads"
+        for table_type, path in csvfiles.csv_file_paths(helpers.TEST_DATA_PATH).items():
+            csv_index = csvindex.CsvIndex(table_type, path)
+            self.assertEqual(
+                csv_index.col_names, csv_data.get_csv_col_names(table_type)
+            )
+            expected = csv_data.index_table_on_article_id(table_type)
+            article_ids = [key for key, value in expected.items() if value]
+            self.assertEqual(sorted(csv_index.article_ids()), sorted(article_ids))
+            for article_id in article_ids:
+                self.assertEqual(
+                    csv_index.rows([article_id]),
+                    expected.get(article_id),
+                    "%s %s" % (table_type, article_id),
+                )
+            self.assertEqual(
+                csv_index.rows(article_ids), csv_data.get_csv_data_rows(table_type)
+            )
+
+    def test_rows_not_found(self):
+        csv_index = csvindex.CsvIndex("title", helpers.TEST_DATA_PATH + "poa_title.csv")
+        self.assertEqual(csv_index.rows([99999]), [])
+
+    def test_prime_csv_caches(self):
+        caches = csvindex.prime_csv_caches(helpers.TEST_DATA_PATH, [7], {})
+        self.assertEqual(len(caches.get("get_csv_data_rows").get(("title",))), 1)
+        self.assertEqual(len(caches.get("get_csv_data_rows").get(("authors",))), 3)
+
+    def test_prime_csv_caches_indexes(self):
+        "the CSV files are indexed once and each call decodes only its own rows"
+        indexes = {}
+        with patch.object(csvindex, "CsvIndex", wraps=csvindex.CsvIndex) as csv_index:
+            csvindex.prime_csv_caches(helpers.TEST_DATA_PATH, [7], {}, indexes)
+            index_count = csv_index.call_count
+            caches = csvindex.prime_csv_caches(
+                helpers.TEST_DATA_PATH, [12], {}, indexes
+            )
+            self.assertEqual(csv_index.call_count, index_count)
+        self.assertEqual(len(indexes), index_count)
+        title_rows = caches.get("get_csv_data_rows").get(("title",))
+        self.assertEqual([row[1] for row in title_rows], ["12"])
+
+    def test_cached_index_changed_file(self):
+        "a file is indexed again when its signature changes"
+        path = helpers.TEST_DATA_PATH + "poa_title.csv"
+        indexes = {}
+        csv_index = csvindex.cached_index("title", path, indexes)
+        self.assertTrue(csvindex.cached_index("title", path, indexes) is csv_index)
+        indexes[path] = (None, csv_index)
+        self.assertFalse(csvindex.cached_index("title", path, indexes) is csv_index)
+        self.assertIsNone(csvindex.cached_index("title", path + ".missing", indexes))
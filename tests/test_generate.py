@@ -1,6 +1,10 @@
+import os
+import shutil
 import unittest
 import time
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from xml.etree import ElementTree
 from mock import Mock, patch
 from elifearticle.article import (
     Affiliation,
@@ -118,6 +122,74 @@ class TestGenerate(unittest.TestCase):
         article_xml = ArticleXML(None, None)
         self.assertFalse(hasattr(article_xml, "root"))
 
+    def test_build_xml_bytes(self):
+        "test building only the XML bytes"
+        article_id = 7
+        jats_config = helpers.build_config("elife")
+        xml_bytes = generate.build_xml_bytes(
+            article_id, jats_config=jats_config, add_comment=False
+        )
+        model_xml = helpers.read_file_content(
+            helpers.TEST_DATA_PATH + "elife_poa_e00007.xml"
+        )
+        self.assertEqual(xml_bytes, model_xml)
+
+    def test_build_xml_bytes_compact(self):
+        "test building into the compact tree gives the same bytes"
+        for (
+            article_id,
+            config_section,
+            pub_date,
+            volume,
+            expected_xml_file,
+        ) in self.passes:
+            jats_config = helpers.build_config(config_section)
+            article = generate.build_article_from_csv(article_id, jats_config)
+            if pub_date:
+                article.add_date(ArticleDate("pub", pub_date))
+            if volume:
+                article.volume = volume
+            xml_bytes = generate.build_xml_bytes(
+                article_id, article, jats_config, add_comment=False, compact=True
+            )
+            model_xml = helpers.read_file_content(
+                helpers.TEST_DATA_PATH + expected_xml_file
+            )
+            self.assertEqual(xml_bytes, model_xml, expected_xml_file)
+
+    def test_compact_root(self):
+        "test the ElementTree root is converted from the compact document when used"
+        article_id = 7
+        article = generate.build_article_from_csv(article_id)
+        article_xml = generate.build_xml(article_id, article, compact=True)
+        self.assertIsNotNone(article_xml.document)
+        self.assertFalse("root" in vars(article_xml))
+        self.assertEqual(
+            ElementTree.tostring(article_xml.root),
+            ElementTree.tostring(generate.build_xml(article_id, article).root),
+        )
+        self.assertEqual(
+            article_xml.output_xml(pretty=True),
+            generate.build_xml(article_id, article).output_xml(pretty=True),
+        )
+        article_xml.release()
+        self.assertFalse(hasattr(article_xml, "root"))
+        self.assertIsNone(article_xml.document)
+
+    def test_build_xml_bytes_failure(self):
+        "test when the article xml is not built"
+        self.assertIsNone(generate.build_xml_bytes(99999))
+
+    def test_release(self):
+        "test the tree and context are dropped after releasing"
+        article_id = 7
+        article_xml = generate.build_xml(article_id)
+        article_xml.output_xml()
+        article_xml.release()
+        self.assertFalse(hasattr(article_xml, "root"))
+        self.assertIsNone(article_xml.context)
+        self.assertIsNone(article_xml.jats_config)
+
     @patch("jatsgenerator.generate.write_xml_to_disk")
     def test_build_xml_to_disk_failure(self, fake_writer):
         fake_writer.side_effect = IOError(Mock())
@@ -270,6 +342,125 @@ class TestGenerate(unittest.TestCase):
         )
 
 
+class TestPartialBuild(unittest.TestCase):
+    def setUp(self):
+        csv_data.CSV_PATH = helpers.TEST_DATA_PATH
+        self.article_id = 7
+        self.jats_config = helpers.build_config("elife")
+        self.article = generate.build_article_from_csv(
+            self.article_id, self.jats_config
+        )
+        full_xml = generate.build_xml(
+            self.article_id, self.article, self.jats_config, add_comment=False
+        )
+        self.full_root = full_xml.root
+
+    def build_partial(self, sections):
+        return generate.build_xml(
+            self.article_id,
+            self.article,
+            self.jats_config,
+            add_comment=False,
+            sections=sections,
+        ).root
+
+    def assert_same_tag(self, root, path):
+        self.assertEqual(
+            ElementTree.tostring(root.find(path)),
+            ElementTree.tostring(self.full_root.find(path)),
+        )
+
+    def test_article_meta_only(self):
+        root = self.build_partial([generate.ARTICLE_META])
+        self.assertEqual([tag.tag for tag in root], ["front"])
+        self.assertEqual([tag.tag for tag in root.find("front")], ["article-meta"])
+        self.assert_same_tag(root, "front/article-meta")
+
+    def test_front_only(self):
+        root = self.build_partial(generate.FRONT_SECTIONS)
+        self.assertEqual([tag.tag for tag in root], ["front"])
+        self.assert_same_tag(root, "front")
+
+    def test_contrib_group_only(self):
+        root = self.build_partial([generate.CONTRIB_GROUP])
+        article_meta = root.find("front/article-meta")
+        self.assertEqual(
+            [tag.tag for tag in article_meta], ["contrib-group", "contrib-group"]
+        )
+        self.assertEqual(
+            [ElementTree.tostring(tag) for tag in article_meta],
+            [
+                ElementTree.tostring(tag)
+                for tag in self.full_root.findall("front/article-meta/contrib-group")
+            ],
+        )
+
+    def test_back_only(self):
+        "conflict and dataset ids in the back match the full build"
+        root = self.build_partial([generate.BACK])
+        self.assertEqual([tag.tag for tag in root], ["back"])
+        self.assert_same_tag(root, "back")
+
+    def test_unknown_section(self):
+        with self.assertRaises(ValueError):
+            self.build_partial(["body"])
+
+
+class TestBuildPlan(unittest.TestCase):
+    def test_build_plan(self):
+        "test the config values are compiled into the plan"
+        build_plan = generate.BuildPlan(helpers.build_config("elife"))
+        self.assertEqual(
+            build_plan.journal_ids, [("nlm-ta", "elife"), ("publisher-id", "eLife")]
+        )
+        self.assertEqual(build_plan.journal_issn, "2050-084X")
+        self.assertEqual(build_plan.elocation_id("7"), "e00007")
+        self.assertEqual(build_plan.xml_filename("7"), "elife_poa_e00007.xml")
+
+    def test_build_plan_preprint(self):
+        build_plan = generate.BuildPlan(helpers.build_config("elife_preprint"))
+        self.assertEqual(build_plan.contrib_types, ["author"])
+        self.assertEqual(build_plan.elocation_id("7"), "RP00007")
+        self.assertEqual(build_plan.xml_filename("7"), "elife-preprint-00007.xml")
+
+    def test_steps(self):
+        "test the build steps in order for the sections"
+        build_plan = generate.BuildPlan(helpers.build_config("elife"))
+        sections, steps = build_plan.steps()
+        self.assertEqual(sections, frozenset(generate.ALL_SECTIONS))
+        self.assertEqual(
+            steps, ["set_frontmatter", "set_backmatter", "set_sub_articles"]
+        )
+        self.assertEqual(
+            build_plan.steps([generate.BACK, generate.CONTRIB_GROUP])[1],
+            ["set_frontmatter", "set_backmatter"],
+        )
+        self.assertIs(build_plan.steps()[1], steps)
+        with self.assertRaises(ValueError):
+            build_plan.steps(["not-a-section"])
+
+    def test_generation_context_build_plan(self):
+        "test the plan is compiled once per config in a generation context"
+        jats_config = helpers.build_config("elife")
+        generation_context = generate.GenerationContext(jats_config=jats_config)
+        build_plan = generation_context.build_plan()
+        self.assertIs(generation_context.build_plan(jats_config), build_plan)
+        other_config = helpers.build_config("elife_preprint")
+        self.assertIsNot(generation_context.build_plan(other_config), build_plan)
+
+    def test_generation_context_csv_path(self):
+        "test a CSV folder without a trailing separator"
+        jats_config = helpers.build_config("elife")
+        generation_context = generate.GenerationContext(
+            helpers.TEST_DATA_PATH.rstrip(os.sep), jats_config
+        )
+        self.assertEqual(generation_context.csv_path, helpers.TEST_DATA_PATH)
+        article = generate.build_article_from_csv(
+            7, generation_context=generation_context
+        )
+        self.assertEqual(article.manuscript, "7")
+
+
 class TestGeneratePreprint(unittest.TestCase):
     def test_preprint(self):
         "test from Article objects to generate an XML for a preprint article"
@@ -371,3 +562,67 @@ class TestGeneratePreprint(unittest.TestCase):
         # assertion
         model_xml = helpers.read_file_content(helpers.TEST_DATA_PATH + "preprint.xml")
         self.assertEqual(xml_string, model_xml)
+
+
+class TestConcurrentGeneration(unittest.TestCase):
+    "generate from two CSV sources in many threads at once"
+
+    def setUp(self):
+        self.article_ids = [7, 12, 2725, 2935, 12717, 14874, 14997, 21598, 65697]
+        self.jats_config = helpers.build_config("elife")
+        # a copy of the CSV files with a different title for article 7
+        self.csv_path = os.path.join(helpers.TARGET_OUTPUT_DIR, "csv_copy")
+        if not os.path.exists(self.csv_path):
+            os.mkdir(self.csv_path)
+        for file_name in os.listdir(helpers.TEST_DATA_PATH):
+            if file_name.endswith(".csv"):
+                shutil.copy(
+                    os.path.join(helpers.TEST_DATA_PATH, file_name), self.csv_path
+                )
+        title_path = os.path.join(self.csv_path, "poa_title.csv")
+        with open(title_path, "r") as open_file:
+            content = open_file.read()
+        with open(title_path, "w") as open_file:
+            open_file.write(
+                content.replace('"Herbivory-induced ', '"Copied herbivory-induced ')
+            )
+
+    def tearDown(self):
+        shutil.rmtree(self.csv_path)
+
+    def generate(self, generation_context, article_id):
+        return generate.build_xml_bytes(
+            article_id,
+            jats_config=self.jats_config,
+            add_comment=False,
+            generation_context=generation_context,
+        )
+
+    def test_threads_match_serial(self):
+        contexts = [
+            generate.GenerationContext(helpers.TEST_DATA_PATH, self.jats_config),
+            generate.GenerationContext(self.csv_path, self.jats_config),
+        ]
+        serial = {}
+        for index, generation_context in enumerate(contexts):
+            for article_id in self.article_ids:
+                serial[(index, article_id)] = self.generate(
+                    generation_context, article_id
+                )
+        self.assertNotEqual(serial[(0, 7)], serial[(1, 7)])
+        self.assertTrue(b"<article-title>Copied herbivory-induced" in serial[(1, 7)])
+        self.assertEqual(serial[(0, 12)], serial[(1, 12)])
+
+        # new contexts in the threads, so the CSV data is parsed concurrently too
+        contexts = [
+            generate.GenerationContext(helpers.TEST_DATA_PATH, self.jats_config),
+            generate.GenerationContext(self.csv_path, self.jats_config),
+        ]
+        jobs = [key for key in serial.keys()] * 8
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            futures = [
+                (key, executor.submit(self.generate, contexts[key[0]], key[1]))
+                for key in jobs
+            ]
+            for key, future in futures:
+                self.assertEqual(future.result(), serial[key], "failed %s" % str(key))
@@ -0,0 +1,138 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+import threading
+from ejpcsvparser import csv_data
+from jatsgenerator import batch, generate, metrics
+from tests import helpers
+
+
+class TestErrorCategories(unittest.TestCase):
+    def test_error_categories(self):
+        error_messages = [
+            "article_id 99999 error in set_title",
+            "article_id 99999 error in set_abstract",
+            "article_id 99999 error in set_title",
+            "something else",
+        ]
+        self.assertEqual(
+            metrics.error_categories(error_messages),
+            ["set_title", "set_abstract", metrics.CATEGORY_BUILD_ERROR],
+        )
+
+
+class TestQuantile(unittest.TestCase):
+    def test_quantile(self):
+        values = [5, 1, 4, 2, 3]
+        self.assertEqual(metrics.quantile(values, 0.5), 3)
+        self.assertEqual(metrics.quantile(values, 0.9), 5)
+        self.assertEqual(metrics.quantile([], 0.5), None)
+
+
+class TestArticleMetrics(unittest.TestCase):
+    def setUp(self):
+        csv_data.CSV_PATH = helpers.TEST_DATA_PATH
+        self.jats_config = helpers.build_config("elife")
+
+    def test_build_xml_to_disk_metrics(self):
+        article_metrics = metrics.ArticleMetrics(7)
+        result = generate.build_xml_to_disk(
+            7, jats_config=self.jats_config, metrics=article_metrics
+        )
+        self.assertTrue(result)
+        self.assertTrue(article_metrics.success)
+        self.assertEqual(article_metrics.author_count, 3)
+        self.assertEqual(article_metrics.affiliation_count, 2)
+        self.assertTrue(article_metrics.bytes_written > 0)
+        for attribute in ["parse_time", "build_time", "serialize_time", "write_time"]:
+            self.assertIsNotNone(getattr(article_metrics, attribute))
+        self.assertIsNone(article_metrics.error_category)
+
+    def test_build_xml_to_disk_metrics_failure(self):
+        article_metrics = metrics.ArticleMetrics(99999)
+        result = generate.build_xml_to_disk(
+            99999, jats_config=self.jats_config, metrics=article_metrics
+        )
+        self.assertFalse(result)
+        self.assertFalse(article_metrics.success)
+        self.assertTrue("set_title" in article_metrics.error_category.split(","))
+
+
+class TestRunReport(unittest.TestCase):
+    def setUp(self):
+        csv_data.CSV_PATH = helpers.TEST_DATA_PATH
+        self.jats_config = helpers.build_config("elife")
+        self.report = metrics.RunReport()
+        batch.build_xml_batch(
+            [7, 12, 99999], self.jats_config, add_comment=False, report=self.report
+        )
+
+    def test_json_lines(self):
+        lines = self.report.json_lines().splitlines()
+        self.assertEqual(len(lines), 3)
+        documents = [json.loads(line) for line in lines]
+        self.assertEqual(
+            [document.get("article_id") for document in documents], [7, 12, 99999]
+        )
+        self.assertEqual(
+            [document.get("success") for document in documents], [True, True, False]
+        )
+
+    def test_prometheus_text(self):
+        prometheus_text = self.report.prometheus_text()
+        self.assertTrue(
+            'jatsgenerator_articles_total{result="success"} 2' in prometheus_text
+        )
+        self.assertTrue(
+            'jatsgenerator_articles_total{result="failure"} 1' in prometheus_text
+        )
+        self.assertTrue(
+            'jatsgenerator_article_errors_total{category="set_title"} 1'
+            in prometheus_text
+        )
+        self.assertTrue("jatsgenerator_build_seconds_count 2" in prometheus_text)
+
+    def test_write(self):
+        report_dir = tempfile.mkdtemp()
+        try:
+            json_lines_path = os.path.join(report_dir, "report.jsonl")
+            prometheus_path = os.path.join(report_dir, "report.prom")
+            self.report.write(json_lines_path, prometheus_path)
+            self.assertEqual(
+                len(helpers.read_file_content(json_lines_path).splitlines()), 3
+            )
+            self.assertTrue(
+                helpers.read_file_content(prometheus_path).startswith(b"# HELP")
+            )
+        finally:
+            shutil.rmtree(report_dir)
+
+    def test_max_articles(self):
+        report = metrics.RunReport(max_articles=2)
+        for article_id in range(3):
+            report.add(metrics.ArticleMetrics(article_id))
+        self.assertEqual([item.article_id for item in report.articles], [1, 2])
+
+    def test_export_while_adding(self):
+        "the report can be exported while another thread adds articles"
+        report = metrics.RunReport(max_articles=100)
+        stop = threading.Event()
+
+        def add_articles():
+            article_id = 0
+            while not stop.is_set():
+                report.add(metrics.ArticleMetrics(article_id))
+                article_id += 1
+
+        thread = threading.Thread(target=add_articles)
+        thread.start()
+        try:
+            for _ in range(300):
+                report.prometheus_text()
+                report.json_lines()
+        finally:
+            stop.set()
+            thread.join()
+        self.assertEqual(len(report.article_list()), 100)
@@ -0,0 +1,56 @@
+# coding=utf-8
+
+import unittest
+from jatsgenerator import normalize, utils
+
+
+class TestMemoize(unittest.TestCase):
+    def setUp(self):
+        normalize.clear_caches()
+
+    def tearDown(self):
+        normalize.clear_caches()
+
+    def test_orcid_uri_to_orcid(self):
+        uri = "http://orcid.org/0000-0002-7361-560X"
+        self.assertEqual(normalize.orcid_uri_to_orcid(uri), "0000-0002-7361-560X")
+        self.assertEqual(normalize.orcid_uri_to_orcid(uri), "0000-0002-7361-560X")
+        stats = normalize.orcid_uri_to_orcid.cache.stats()
+        self.assertEqual(stats.get("hits"), 1)
+        self.assertEqual(stats.get("misses"), 1)
+        self.assertEqual(stats.get("hit_rate"), 0.5)
+
+    def test_entity_to_unicode(self):
+        self.assertEqual(normalize.entity_to_unicode("&alpha; cell"), "\u03b1 cell")
+        self.assertEqual(normalize.entity_to_unicode("&alpha; cell"), "\u03b1 cell")
+        self.assertEqual(normalize.entity_to_unicode.cache.hits, 1)
+
+    def test_object_id_from_uri_none(self):
+        "a None result is cached too"
+        self.assertIsNone(normalize.object_id_from_uri(None))
+        self.assertIsNone(normalize.object_id_from_uri(None))
+        self.assertEqual(normalize.object_id_from_uri.cache.hits, 1)
+
+    def test_object_id_from_uri(self):
+        uri = "https://sciety.org/articles/activity/10.1101/865006"
+        self.assertEqual(
+            normalize.object_id_from_uri(uri), utils.object_id_from_uri(uri)
+        )
+
+    def test_unhashable_value(self):
+        self.assertEqual(normalize.memoize("test_list")(len)([1, 2]), 2)
+        del normalize.CACHES["test_list"]
+
+    def test_cached_reparsing_namespaces(self):
+        self.assertEqual(
+            utils.cached_reparsing_namespaces(utils.XML_NAMESPACE_MAP),
+            utils.reparsing_namespaces(utils.XML_NAMESPACE_MAP),
+        )
+        utils.cached_reparsing_namespaces(utils.XML_NAMESPACE_MAP)
+        self.assertEqual(normalize.cache_stats().get("namespaces").get("hits"), 1)
+
+    def test_cache_stats(self):
+        self.assertEqual(
+            list(normalize.cache_stats().keys()),
+            ["fragments", "namespaces", "orcid", "entity", "object_id"],
+        )
@@ -0,0 +1,261 @@
+import unittest
+import gzip
+import os
+import shutil
+import tarfile
+import time
+import zipfile
+from mock import patch
+from jatsgenerator import output
+from tests import helpers
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+XML_BYTES = b'<?xml version="1.0" encoding="utf-8"?><article/>'
+
+
+def remove_file(file_path):
+    if os.path.isfile(file_path):
+        os.remove(file_path)
+
+
+class TestWriteBytesToDisk(unittest.TestCase):
+    def tearDown(self):
+        remove_file(helpers.TARGET_OUTPUT_DIR + "test.xml")
+
+    def test_write_bytes_to_disk(self):
+        filename_path = output.write_bytes_to_disk(
+            XML_BYTES, "test.xml", helpers.TARGET_OUTPUT_DIR.rstrip(os.sep)
+        )
+        self.assertEqual(helpers.read_file_content(filename_path), XML_BYTES)
+
+
+class TestDirectorySink(unittest.TestCase):
+    def tearDown(self):
+        remove_file(helpers.TARGET_OUTPUT_DIR + "test.xml")
+        remove_file(helpers.TARGET_OUTPUT_DIR + "test.xml.gz")
+
+    def test_directory_sink(self):
+        with output.DirectorySink(helpers.TARGET_OUTPUT_DIR.rstrip(os.sep)) as sink:
+            sink.write("test.xml", XML_BYTES)
+        self.assertEqual(
+            helpers.read_file_content(helpers.TARGET_OUTPUT_DIR + "test.xml"),
+            XML_BYTES,
+        )
+
+    def test_gzip_sink(self):
+        with output.GzipSink(helpers.TARGET_OUTPUT_DIR.rstrip(os.sep)) as sink:
+            filename_path = sink.write("test.xml", XML_BYTES)
+        self.assertTrue(filename_path.endswith("test.xml.gz"))
+        with gzip.open(filename_path, "rb") as open_file:
+            self.assertEqual(open_file.read(), XML_BYTES)
+
+
+class TestArchiveSinks(unittest.TestCase):
+    def setUp(self):
+        self.zip_file_path = helpers.TARGET_OUTPUT_DIR + "test.zip"
+        self.tar_file_path = helpers.TARGET_OUTPUT_DIR + "test.tar.gz"
+
+    def tearDown(self):
+        remove_file(self.zip_file_path)
+        remove_file(self.tar_file_path)
+
+    def test_zip_sink(self):
+        with output.ZipSink(self.zip_file_path) as sink:
+            sink.write("one.xml", XML_BYTES)
+            sink.write("two.xml", XML_BYTES)
+        with zipfile.ZipFile(self.zip_file_path) as zip_file:
+            self.assertEqual(zip_file.namelist(), ["one.xml", "two.xml"])
+            self.assertEqual(zip_file.read("two.xml"), XML_BYTES)
+
+    def test_tar_sink(self):
+        with output.TarSink(self.tar_file_path) as sink:
+            sink.write("one.xml", XML_BYTES)
+        with tarfile.open(self.tar_file_path, "r:gz") as tar_file:
+            self.assertEqual(tar_file.getnames(), ["one.xml"])
+            self.assertEqual(tar_file.extractfile("one.xml").read(), XML_BYTES)
+
+
+class TestShardDirs(unittest.TestCase):
+    def test_shard_dirs(self):
+        passes = [
+            (("elife_poa_e12717.xml", "prefix"), ["12"]),
+            (("elife_poa_e00007.xml", "prefix", 2, 2), ["00", "00"]),
+            (("7.xml", "prefix", 1, 3), ["007"]),
+            (("elife_poa_e00007.xml", "hash"), ["e9"]),
+            (("elife_poa_e00007.xml", "hash", 2, 1), ["e", "9"]),
+        ]
+        for args, expected in passes:
+            self.assertEqual(output.shard_dirs(*args), expected, str(args))
+
+    def test_shard_dirs_unknown_layout(self):
+        with self.assertRaises(ValueError):
+            output.shard_dirs("elife_poa_e00007.xml", "unknown")
+
+
+class TestShardedSink(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = helpers.TARGET_OUTPUT_DIR + "sharded"
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_sharded_sink(self):
+        jats_config = {"shard_layout": "prefix", "shard_depth": 1, "shard_width": 2}
+        with output.ShardedSink.from_config(jats_config, self.output_dir) as sink:
+            sink.write("elife_poa_e12717.xml", XML_BYTES)
+            sink.write("elife_poa_e12345.xml", XML_BYTES)
+            sink.write("elife_poa_e00007.xml", XML_BYTES)
+        self.assertEqual(sorted(os.listdir(self.output_dir)), ["00", "12", "index.tsv"])
+        index = output.read_shard_index(self.output_dir)
+        self.assertEqual(
+            index,
+            {
+                "elife_poa_e12717.xml": os.path.join("12", "elife_poa_e12717.xml"),
+                "elife_poa_e12345.xml": os.path.join("12", "elife_poa_e12345.xml"),
+                "elife_poa_e00007.xml": os.path.join("00", "elife_poa_e00007.xml"),
+            },
+        )
+        for path in index.values():
+            self.assertEqual(
+                helpers.read_file_content(os.path.join(self.output_dir, path)),
+                XML_BYTES,
+            )
+
+    def test_sharded_sink_rerun(self):
+        "the index has one line per filename after writing a file again"
+        jats_config = {"shard_layout": "prefix", "shard_depth": 1, "shard_width": 2}
+        for filenames in [
+            ["elife_poa_e12717.xml", "elife_poa_e00007.xml"],
+            ["elife_poa_e00007.xml", "elife_poa_e00012.xml"],
+        ]:
+            with output.ShardedSink.from_config(jats_config, self.output_dir) as sink:
+                for filename in filenames:
+                    sink.write(filename, XML_BYTES)
+        with open(os.path.join(self.output_dir, "index.tsv"), "r") as open_file:
+            lines = open_file.read().splitlines()
+        self.assertEqual(
+            [line.split("\t")[0] for line in lines],
+            ["elife_poa_e12717.xml", "elife_poa_e00007.xml", "elife_poa_e00012.xml"],
+        )
+        self.assertEqual(sorted(os.listdir(self.output_dir)), ["00", "12", "index.tsv"])
+
+
+class TestGroupCommitSink(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = helpers.TARGET_OUTPUT_DIR + "group_commit"
+        os.mkdir(self.output_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_group_commit(self):
+        "files are renamed into the output directory once the group is fsynced"
+        with patch("os.fsync", wraps=os.fsync) as fsync:
+            with output.GroupCommitSink(self.output_dir, group_size=2) as sink:
+                sink.write("one.xml", XML_BYTES)
+                self.assertEqual(len(os.listdir(self.output_dir)), 1)
+                sink.write("two.xml", XML_BYTES)
+                self.assertEqual(fsync.call_count, 3)
+                self.assertEqual(
+                    sorted(os.listdir(self.output_dir)),
+                    sorted(["one.xml", "two.xml", os.path.basename(sink.staging_dir)]),
+                )
+                sink.write("three.xml", XML_BYTES)
+            self.assertEqual(sink.stats().get("groups"), 2)
+            self.assertEqual(sink.stats().get("files"), 3)
+        self.assertEqual(
+            sorted(os.listdir(self.output_dir)), ["one.xml", "three.xml", "two.xml"]
+        )
+        self.assertEqual(
+            helpers.read_file_content(os.path.join(self.output_dir, "three.xml")),
+            XML_BYTES,
+        )
+
+    @unittest.skipUnless(resource, "needs the resource module")
+    def test_group_larger_than_fd_limit(self):
+        "staged files are closed once written, so a group can exceed the fd limit"
+        soft_limit, hard_limit = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (64, hard_limit))
+        try:
+            with output.GroupCommitSink(self.output_dir, group_size=200) as sink:
+                for index in range(100):
+                    sink.write("%s.xml" % index, XML_BYTES)
+        finally:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (soft_limit, hard_limit))
+        self.assertEqual(sink.stats().get("files"), 100)
+        self.assertEqual(len(os.listdir(self.output_dir)), 100)
+
+    def test_after_commit(self):
+        "callbacks run once the staged files are committed, once per group"
+        calls = []
+
+        def callback():
+            # files in the output directory, including the staging directory
+            calls.append(len(os.listdir(self.output_dir)))
+
+        with output.GroupCommitSink(self.output_dir, group_size=2) as sink:
+            sink.after_commit(callback)
+            sink.write("one.xml", XML_BYTES)
+            sink.after_commit(callback)
+            sink.after_commit(callback)
+            self.assertEqual(calls, [1])
+            sink.write("two.xml", XML_BYTES)
+        self.assertEqual(calls, [1, 3])
+
+    def test_max_latency(self):
+        "staged files are committed after max_latency without filling the group"
+        with output.GroupCommitSink(
+            self.output_dir, group_size=100, max_latency=0.01
+        ) as sink:
+            filename_path = sink.write("one.xml", XML_BYTES)
+            # the group count is updated after the file is renamed into place
+            for _ in range(100):
+                if sink.stats().get("groups"):
+                    break
+                time.sleep(0.01)
+            self.assertEqual(sink.stats().get("groups"), 1)
+            self.assertTrue(os.path.exists(filename_path))
+
+
+class TestConfigSink(unittest.TestCase):
+    def test_shard_layout_and_group_commit(self):
+        "a shard layout cannot be group committed"
+        jats_config = {"shard_layout": "hash", "group_commit_size": 10}
+        with self.assertRaises(ValueError):
+            output.config_sink(jats_config, helpers.TARGET_OUTPUT_DIR)
+
+
+class TestOpenSink(unittest.TestCase):
+    def test_open_sink(self):
+        passes = [
+            ({"target": None}, output.DirectorySink),
+            ({"target": "tmp"}, output.DirectorySink),
+            ({"target": "tmp", "gzip_files": True}, output.GzipSink),
+            ({"target": helpers.TARGET_OUTPUT_DIR + "a.zip"}, output.ZipSink),
+            ({"target": helpers.TARGET_OUTPUT_DIR + "a.tar"}, output.TarSink),
+            ({"target": helpers.TARGET_OUTPUT_DIR + "a.tgz"}, output.TarSink),
+            (
+                {"target": "tmp", "jats_config": {"shard_layout": ""}},
+                output.DirectorySink,
+            ),
+            (
+                {"target": "tmp", "jats_config": {"shard_layout": "hash"}},
+                output.ShardedSink,
+            ),
+            (
+                {
+                    "target": helpers.TARGET_OUTPUT_DIR,
+                    "jats_config": {"group_commit_size": 10},
+                },
+                output.GroupCommitSink,
+            ),
+        ]
+        for kwargs, expected in passes:
+            sink = output.open_sink(**kwargs)
+            sink.close()
+            self.assertEqual(type(sink), expected)
+            remove_file(str(kwargs.get("target")))
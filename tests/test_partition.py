@@ -0,0 +1,122 @@
+import json
+import os
+import shutil
+import threading
+import time
+import unittest
+from jatsgenerator import generate, partition
+from tests import helpers
+
+
+class TestPartitionRanges(unittest.TestCase):
+    def test_partition_ranges(self):
+        self.assertEqual(
+            partition.partition_ranges([1, 2, 3, 4, 5], 2),
+            [("range-00000", [1, 2]), ("range-00001", [3, 4]), ("range-00002", [5])],
+        )
+
+
+class TestLeaseCoordinator(unittest.TestCase):
+    def setUp(self):
+        self.shared_dir = helpers.TARGET_OUTPUT_DIR + "shared"
+
+    def tearDown(self):
+        shutil.rmtree(self.shared_dir)
+
+    def test_claim(self):
+        node_one = partition.LeaseCoordinator(self.shared_dir, "one")
+        node_two = partition.LeaseCoordinator(self.shared_dir, "two")
+        self.assertTrue(node_one.claim("range-00000"))
+        self.assertFalse(node_two.claim("range-00000"))
+        self.assertTrue(node_one.renew("range-00000"))
+        self.assertFalse(node_two.renew("range-00000"))
+        node_one.complete("range-00000", {7: True})
+        self.assertFalse(os.path.exists(node_one.lease_path("range-00000")))
+        self.assertFalse(node_two.claim("range-00000"))
+        self.assertEqual(partition.read_results(self.shared_dir), {7: True})
+        with open(node_one.log_path(), "r") as open_file:
+            self.assertTrue(
+                open_file.read().endswith(
+                    " one completed range-00000 1 generated 0 failed\n"
+                )
+            )
+
+    def test_expired_lease(self):
+        "the range of a node which stopped renewing its lease is claimed"
+        crashed_node = partition.LeaseCoordinator(self.shared_dir, "crashed", 0)
+        node = partition.LeaseCoordinator(self.shared_dir, "node")
+        self.assertTrue(crashed_node.claim("range-00000"))
+        time.sleep(0.01)
+        self.assertTrue(node.claim("range-00000"))
+        self.assertFalse(crashed_node.renew("range-00000"))
+        self.assertTrue(node.holds("range-00000"))
+
+    def test_lease_being_written(self):
+        "an empty lease file is not expired until lease_seconds after it was created"
+        node = partition.LeaseCoordinator(self.shared_dir, "node")
+        open(node.lease_path("range-00000"), "w").close()
+        self.assertFalse(node.claim("range-00000"))
+
+
+class TestRunNode(unittest.TestCase):
+    def setUp(self):
+        self.shared_dir = helpers.TARGET_OUTPUT_DIR + "shared"
+        self.jats_config = helpers.build_config("elife")
+        self.article_ids = [7, 12, 2725, 2935, 12717, 14874, 14997, 21598, 65697, 99999]
+
+    def tearDown(self):
+        shutil.rmtree(self.shared_dir)
+
+    def run_node(self, node_id, results):
+        generation_context = generate.GenerationContext(
+            helpers.TEST_DATA_PATH, self.jats_config, index_csv=True
+        )
+        results[node_id] = partition.run_node(
+            self.article_ids,
+            self.shared_dir,
+            range_size=2,
+            jats_config=self.jats_config,
+            add_comment=False,
+            generation_context=generation_context,
+            node_id=node_id,
+            poll_interval=0.01,
+        )
+
+    def assert_all_generated(self):
+        results = partition.read_results(self.shared_dir)
+        self.assertEqual(sorted(results.keys()), sorted(self.article_ids))
+        self.assertEqual(
+            [article_id for article_id, result in results.items() if not result],
+            [99999],
+        )
+
+    def test_two_nodes(self):
+        "each range is generated by one of the nodes"
+        results = {}
+        threads = [
+            threading.Thread(target=self.run_node, args=(node_id, results))
+            for node_id in ["one", "two"]
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(
+            sorted(list(results.get("one").keys()) + list(results.get("two").keys())),
+            sorted(self.article_ids),
+        )
+        self.assert_all_generated()
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.shared_dir, partition.LOG_DIR))),
+            ["one.log", "two.log"],
+        )
+
+    def test_crashed_node(self):
+        "a range leased by a crashed node is generated once its lease expires"
+        os.makedirs(self.shared_dir)
+        with open(os.path.join(self.shared_dir, "range-00000.lease"), "w") as open_file:
+            json.dump({"node_id": "crashed", "expires": time.time() - 1}, open_file)
+        results = {}
+        self.run_node("node", results)
+        self.assertEqual(list(results.get("node").keys()), self.article_ids)
+        self.assert_all_generated()
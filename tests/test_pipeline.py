@@ -0,0 +1,68 @@
+import os
+import unittest
+import zipfile
+from jatsgenerator import generate, metrics, output, pipeline
+from tests import helpers
+
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        self.jats_config = helpers.build_config("elife")
+        self.generation_context = generate.GenerationContext(
+            helpers.TEST_DATA_PATH, self.jats_config
+        )
+        self.zip_file_path = helpers.TARGET_OUTPUT_DIR + "pipeline.zip"
+
+    def tearDown(self):
+        if os.path.exists(self.zip_file_path):
+            os.remove(self.zip_file_path)
+
+    def test_run_to_zip(self):
+        "build articles through the stages into a zip file and compare the output"
+        article_ids = [7, 12, 2725, 2935, 12717, 14874, 14997, 21598, 65697, 99999]
+        report = metrics.RunReport()
+        with output.ZipSink(self.zip_file_path) as sink:
+            article_pipeline = pipeline.Pipeline(
+                self.jats_config,
+                add_comment=False,
+                sink=sink,
+                generation_context=self.generation_context,
+                build_workers=3,
+                write_workers=2,
+                queue_size=2,
+                report=report,
+            )
+            results = article_pipeline.run(article_ids)
+        self.assertEqual(list(results.keys()), article_ids)
+        self.assertEqual(
+            [article_id for article_id, result in results.items() if not result],
+            [99999],
+        )
+        with zipfile.ZipFile(self.zip_file_path) as zip_file:
+            self.assertEqual(len(zip_file.namelist()), 9)
+            for filename in zip_file.namelist():
+                model_xml = helpers.read_file_content(helpers.TEST_DATA_PATH + filename)
+                self.assertEqual(zip_file.read(filename), model_xml)
+        stats = article_pipeline.stats_dicts()
+        self.assertEqual(
+            [stage.get("stage") for stage in stats], ["parse", "build", "write"]
+        )
+        self.assertEqual([stage.get("count") for stage in stats], [10, 9, 9])
+        self.assertEqual([stage.get("errors") for stage in stats], [1, 0, 0])
+        self.assertEqual(len(report.values("write_time")), 9)
+
+    def test_run_articles(self):
+        "article objects can be fed in instead of parsing them from the CSV data"
+        article = generate.build_article_from_csv(
+            7, self.jats_config, generation_context=self.generation_context
+        )
+        with output.ZipSink(self.zip_file_path) as sink:
+            results = pipeline.Pipeline(
+                self.jats_config,
+                add_comment=False,
+                sink=sink,
+                generation_context=self.generation_context,
+            ).run(articles=[article])
+        self.assertEqual(list(results.items()), [("7", True)])
+        with zipfile.ZipFile(self.zip_file_path) as zip_file:
+            self.assertEqual(zip_file.namelist(), ["elife_poa_e00007.xml"])
@@ -0,0 +1,101 @@
+import os
+import shutil
+import unittest
+import zipfile
+from jatsgenerator import batch, generate, metrics, preflight
+from tests import helpers
+
+ARTICLE_IDS = [3, 7, 12, 2725, 2935, 12717, 14874, 14997, 21598, 65697, 99999]
+
+
+class TestIsDate(unittest.TestCase):
+    def test_is_date(self):
+        self.assertTrue(preflight.is_date("2014-02-21 00:00:00.000"))
+        self.assertFalse(preflight.is_date("21/02/2014"))
+        self.assertFalse(preflight.is_date(" "))
+        self.assertFalse(preflight.is_date(None))
+
+
+class TestPreflight(unittest.TestCase):
+    def setUp(self):
+        self.csv_path = helpers.TARGET_OUTPUT_DIR + "preflight_csv/"
+        self.zip_file_path = helpers.TARGET_OUTPUT_DIR + "preflight.zip"
+
+    def tearDown(self):
+        if os.path.exists(self.csv_path):
+            shutil.rmtree(self.csv_path)
+        if os.path.exists(self.zip_file_path):
+            os.remove(self.zip_file_path)
+
+    def copy_csv_without_title(self, article_id):
+        "copy the test CSV files leaving out the title row of the article"
+        os.makedirs(self.csv_path)
+        for file_name in os.listdir(helpers.TEST_DATA_PATH):
+            if file_name.endswith(".csv"):
+                shutil.copy(helpers.TEST_DATA_PATH + file_name, self.csv_path)
+        title_path = self.csv_path + "poa_title.csv"
+        with open(title_path, "r") as open_file:
+            lines = open_file.readlines()
+        with open(title_path, "w") as open_file:
+            open_file.writelines(
+                line for line in lines if ',"%s",' % article_id not in line
+            )
+
+    def test_preflight(self):
+        "only the article with no CSV data is missing components"
+        report = preflight.preflight(ARTICLE_IDS, helpers.TEST_DATA_PATH)
+        self.assertEqual(report.viable, ARTICLE_IDS[:-1])
+        self.assertEqual(list(report.missing.keys()), [99999])
+        self.assertEqual(
+            report.missing.get(99999), list(preflight.COMPONENT_FUNCTIONS.keys())
+        )
+        self.assertEqual(
+            report.summary(),
+            "preflight: 10 articles can be built, 1 are missing components",
+        )
+
+    def test_preflight_missing_title(self):
+        "a missing title is found, and the article cannot be built"
+        self.copy_csv_without_title(7)
+        report = preflight.preflight([7, 12], self.csv_path)
+        self.assertEqual(report.viable, [12])
+        self.assertEqual(report.messages(), ["article_id 7 is missing title"])
+        self.assertEqual(report.error_messages(7), ["article_id 7 error in set_title"])
+        generation_context = generate.GenerationContext(
+            self.csv_path, helpers.build_config("elife")
+        )
+        self.assertFalse(
+            generate.build_article_from_csv(7, generation_context=generation_context)
+        )
+
+    def test_batch_preflight(self):
+        "the batch builds only the articles passing the preflight check"
+        self.copy_csv_without_title(7)
+        jats_config = helpers.build_config("elife")
+        generation_context = generate.GenerationContext(self.csv_path, jats_config)
+        report = metrics.RunReport()
+        results = batch.build_xml_batch_to_target(
+            [7, 12, 99999],
+            self.zip_file_path,
+            jats_config,
+            add_comment=False,
+            report=report,
+            generation_context=generation_context,
+            preflight_check=True,
+        )
+        self.assertEqual(
+            list(results.items()), [(7, False), (12, True), (99999, False)]
+        )
+        self.assertEqual(
+            [
+                (article_metrics.article_id, article_metrics.error_category)
+                for article_metrics in report.articles
+            ][0],
+            (7, "set_title"),
+        )
+        with zipfile.ZipFile(self.zip_file_path) as zip_file:
+            self.assertEqual(zip_file.namelist(), ["elife_poa_e00012.xml"])
+
+
+if __name__ == "__main__":
+    unittest.main()
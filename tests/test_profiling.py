@@ -0,0 +1,60 @@
+import os
+import pstats
+import unittest
+from jatsgenerator import cli, generate, profiling
+from tests import helpers
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.report_path = os.path.join(helpers.TARGET_OUTPUT_DIR, "profile.txt")
+        self.pstats_path = os.path.join(helpers.TARGET_OUTPUT_DIR, "profile.pstats")
+
+    def tearDown(self):
+        for path in [self.report_path, self.pstats_path]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_profile_articles(self):
+        jats_config = helpers.build_config("elife")
+        generation_context = generate.GenerationContext(
+            helpers.TEST_DATA_PATH, jats_config
+        )
+        stats, results = profiling.profile_articles(
+            [7, 12, 99999], jats_config, generation_context=generation_context
+        )
+        self.assertEqual(list(results.items()), [(7, True), (12, True), (99999, False)])
+        spots = profiling.hotspots(stats)
+        self.assertEqual(list(spots.keys()), list(profiling.HOTSPOTS.keys()))
+        for functions in spots.values():
+            self.assertTrue(functions)
+        self.assertEqual(
+            spots.get("ArticleXML.output_xml")[0][0].split("(")[1], "output_xml)"
+        )
+        report = profiling.report_text(stats, results, limit=5)
+        self.assertTrue(report.startswith("profiled 3 articles, 2 generated\n"))
+        self.assertTrue("utils.append_to_tag" in report)
+
+    def test_profile_command(self):
+        return_value = cli.main(
+            [
+                "profile",
+                "--ids",
+                "7",
+                "12",
+                "--section",
+                "elife",
+                "--csv-path",
+                helpers.TEST_DATA_PATH,
+                "--report",
+                self.report_path,
+                "--pstats",
+                self.pstats_path,
+            ]
+        )
+        self.assertEqual(return_value, 0)
+        with open(self.report_path, "r") as open_file:
+            self.assertTrue(
+                open_file.read().startswith("profiled 2 articles, 2 generated")
+            )
+        self.assertTrue(pstats.Stats(self.pstats_path).total_calls > 0)
@@ -0,0 +1,151 @@
+import threading
+import time
+import unittest
+from elifearticle.article import Article, Contributor, FundingAward
+from jatsgenerator import generate, output, pipeline, schedule
+from tests import helpers
+
+
+def build_article(manuscript, contributor_count=0, award_count=0):
+    article = Article("10.7554/eLife.%05d" % manuscript, "Title")
+    article.manuscript = manuscript
+    for index in range(contributor_count):
+        article.contributors.append(Contributor("author", "Surname%s" % index, "G"))
+    for _ in range(award_count):
+        article.funding_awards.append(FundingAward())
+    return article
+
+
+class ListSink(output.OutputSink):
+    "keep the filenames in the order they are written"
+
+    def __init__(self):
+        self.filenames = []
+
+    def write(self, filename, xml_bytes):
+        self.filenames.append(filename)
+
+
+class TestArticleCost(unittest.TestCase):
+    def test_article_cost(self):
+        article = build_article(1, contributor_count=3, award_count=2)
+        counts = schedule.article_cost_counts(article)
+        self.assertEqual(counts.get("contributor"), 3)
+        self.assertEqual(counts.get("funding_award"), 2)
+        self.assertEqual(counts.get("text"), 0.005)
+        self.assertEqual(schedule.article_cost(article), 50 + 30 + 10 + 0.025)
+
+    def test_schedule_articles(self):
+        "the most expensive first, equal costs in their original order"
+        articles = [
+            build_article(1),
+            build_article(2, contributor_count=100),
+            build_article(3),
+            build_article(4, contributor_count=5),
+        ]
+        self.assertEqual(
+            [
+                article.manuscript
+                for cost, article in schedule.schedule_articles(articles)
+            ],
+            [2, 4, 1, 3],
+        )
+
+
+class TestMemoryBudget(unittest.TestCase):
+    def test_reserve(self):
+        "an article waits until the cost of the articles being built fits the budget"
+        memory_budget = schedule.MemoryBudget(100)
+        events = []
+
+        def build(name, cost):
+            with memory_budget.reserve(cost):
+                events.append(("start", name))
+                time.sleep(0.05)
+                events.append(("end", name))
+
+        heavy = threading.Thread(target=build, args=("heavy", 80))
+        heavy.start()
+        time.sleep(0.01)
+        light = threading.Thread(target=build, args=("light", 30))
+        light.start()
+        heavy.join()
+        light.join()
+        self.assertEqual(
+            events,
+            [
+                ("start", "heavy"),
+                ("end", "heavy"),
+                ("start", "light"),
+                ("end", "light"),
+            ],
+        )
+        self.assertEqual(memory_budget.in_use, 0)
+        self.assertEqual(memory_budget.peak, 80)
+
+    def test_over_budget(self):
+        "an article costing more than the budget is built on its own"
+        memory_budget = schedule.MemoryBudget(100)
+        with memory_budget.reserve(500) as reserved:
+            self.assertEqual(reserved, 100)
+        self.assertEqual(memory_budget.in_use, 0)
+
+
+class TestScheduledPipeline(unittest.TestCase):
+    def test_run(self):
+        jats_config = helpers.build_config("elife")
+        articles = [
+            build_article(1),
+            build_article(2, contributor_count=50),
+            build_article(3, contributor_count=5),
+        ]
+        sink = ListSink()
+        memory_budget = schedule.MemoryBudget(600)
+        article_pipeline = pipeline.Pipeline(
+            jats_config,
+            sink=sink,
+            generation_context=generate.GenerationContext(
+                helpers.TEST_DATA_PATH, jats_config
+            ),
+            build_workers=1,
+            schedule=True,
+            memory_budget=memory_budget,
+        )
+        results = article_pipeline.run(articles=articles)
+        self.assertEqual(list(results.items()), [(1, True), (2, True), (3, True)])
+        self.assertEqual(
+            sink.filenames,
+            ["elife_poa_e00002.xml", "elife_poa_e00003.xml", "elife_poa_e00001.xml"],
+        )
+        self.assertAlmostEqual(memory_budget.peak, 550.025)
+
+    def test_memory_budget_without_schedule(self):
+        "articles are costed as they are parsed, keeping the queue back-pressure"
+        jats_config = helpers.build_config("elife")
+        articles = [build_article(manuscript) for manuscript in range(1, 21)]
+        sink = ListSink()
+        article_pipeline = pipeline.Pipeline(
+            jats_config,
+            sink=sink,
+            generation_context=generate.GenerationContext(
+                helpers.TEST_DATA_PATH, jats_config
+            ),
+            build_workers=1,
+            queue_size=1,
+            memory_budget=schedule.MemoryBudget(600),
+        )
+        parsed_counts = []
+        build_xml_bytes = article_pipeline.build_xml_bytes
+
+        def counting_build_xml_bytes(item):
+            parsed_counts.append(article_pipeline.stats.get(pipeline.PARSE).count)
+            return build_xml_bytes(item)
+
+        article_pipeline.build_xml_bytes = counting_build_xml_bytes
+        results = article_pipeline.run(articles=articles)
+        self.assertEqual(list(results.values()), [True] * 20)
+        self.assertTrue(parsed_counts[0] < 20)
+        self.assertEqual(
+            sink.filenames,
+            ["elife_poa_e%05d.xml" % manuscript for manuscript in range(1, 21)],
+        )
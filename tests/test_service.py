@@ -0,0 +1,198 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+import threading
+from http.client import HTTPConnection
+from unittest.mock import patch
+from ejpcsvparser import csv_data
+from jatsgenerator import csvfiles, service
+from tests import helpers
+
+ARTICLE_JSON = {
+    "doi": "10.7554/eLife.00666",
+    "title": "Article title",
+    "manuscript": "666",
+    "abstract": "An abstract.",
+    "dates": {"accepted": "2012-11-13"},
+    "contributors": [
+        {
+            "contrib_type": "author",
+            "surname": "Surname",
+            "given_name": "Given",
+            "corresp": True,
+            "conflict": ["Is a founder"],
+            "affiliations": [{"institution": "University", "email": "a@example.org"}],
+        },
+        {"contrib_type": "editor", "surname": "Orr", "given_name": "Edit"},
+    ],
+}
+
+
+class TestArticleFromJson(unittest.TestCase):
+    def test_article_from_json(self):
+        article = service.article_from_json(ARTICLE_JSON)
+        self.assertEqual(article.doi, "10.7554/eLife.00666")
+        self.assertEqual(article.manuscript, "666")
+        self.assertEqual(article.get_date("accepted").date.tm_year, 2012)
+        self.assertEqual(len(article.contributors), 2)
+        self.assertEqual(article.contributors[0].corresp, True)
+        self.assertEqual(article.contributors[0].conflict, ["Is a founder"])
+        self.assertEqual(article.contributors[0].affiliations[0].email, "a@example.org")
+        self.assertEqual(article.contributors[1].contrib_type, "editor")
+
+    def test_article_from_json_manuscript(self):
+        "the manuscript is required and must be a number"
+        for manuscript in [None, "abc", ""]:
+            data = dict(ARTICLE_JSON, manuscript=manuscript)
+            with self.assertRaises(ValueError):
+                service.article_from_json(data)
+
+
+class TestGenerationService(unittest.TestCase):
+    def setUp(self):
+        self.service = service.GenerationService(
+            csv_path=helpers.TEST_DATA_PATH,
+            target_output_dir=helpers.TARGET_OUTPUT_DIR,
+            add_comment=False,
+        )
+
+    def test_get_config(self):
+        "test the config section is parsed once"
+        jats_config = self.service.get_config("elife")
+        self.assertEqual(jats_config.get("journal_title"), "eLife")
+        self.assertEqual(
+            jats_config.get("target_output_dir"), helpers.TARGET_OUTPUT_DIR
+        )
+        self.assertTrue(self.service.get_config("elife") is jats_config)
+
+    def test_generate_from_csv(self):
+        xml_bytes = self.service.generate(article_id=7, config_section="elife")
+        model_xml = helpers.read_file_content(
+            helpers.TEST_DATA_PATH + "elife_poa_e00007.xml"
+        )
+        self.assertEqual(xml_bytes, model_xml)
+
+    def test_generate_write(self):
+        filename = self.service.generate(
+            article_id=12, config_section="elife", write=True
+        )
+        self.assertEqual(filename, "elife_poa_e00012.xml")
+
+    def test_generate_failure(self):
+        self.assertIsNone(self.service.generate(article_id=99999))
+
+    def test_generate_from_article(self):
+        article = service.article_from_json(ARTICLE_JSON)
+        xml_string = self.service.generate(
+            article=article, config_section="elife"
+        ).decode("utf8")
+        self.assertTrue("<elocation-id>e00666</elocation-id>" in xml_string)
+        self.assertTrue('<xref ref-type="fn" rid="conf1"/>' in xml_string)
+
+    def test_generate_changed_csv(self):
+        "a CSV file changed between requests is parsed again"
+        csv_path = tempfile.mkdtemp()
+        try:
+            for path in csvfiles.csv_file_paths(helpers.TEST_DATA_PATH).values():
+                shutil.copy(path, csv_path)
+            generation_service = service.GenerationService(
+                csv_path=csv_path, add_comment=False
+            )
+            xml_bytes = generation_service.generate(
+                article_id=7, config_section="elife"
+            )
+            self.assertTrue(b"<article-title>Herbivory-induced" in xml_bytes)
+            title_path = os.path.join(csv_path, "poa_title.csv")
+            with open(title_path, "r") as open_file:
+                content = open_file.read()
+            with open(title_path, "w") as open_file:
+                open_file.write(content.replace('"7","Herbivory', '"7","Changed'))
+            # make sure the modified time changes on coarse filesystems
+            stat = os.stat(title_path)
+            os.utime(title_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+            xml_bytes = generation_service.generate(
+                article_id=7, config_section="elife"
+            )
+            self.assertTrue(b"<article-title>Changed" in xml_bytes)
+        finally:
+            shutil.rmtree(csv_path)
+
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        csv_data.CSV_PATH = helpers.TEST_DATA_PATH
+        generation_service = service.GenerationService(add_comment=False)
+        self.server = service.create_server(generation_service, port=0)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, kwargs={"poll_interval": 0.05}
+        )
+        self.thread.start()
+        self.connection = HTTPConnection("127.0.0.1", self.server.server_address[1])
+
+    def tearDown(self):
+        self.connection.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def request(self, method, path, body=None):
+        self.connection.request(method, path, body)
+        response = self.connection.getresponse()
+        return response.status, response.read()
+
+    def test_health(self):
+        status, body = self.request("GET", "/health")
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body), {"status": "ok"})
+
+    def test_metrics(self):
+        self.request("GET", "/articles/7/xml?section=elife")
+        status, body = self.request("GET", "/metrics")
+        self.assertEqual(status, 200)
+        self.assertTrue(b'jatsgenerator_articles_total{result="success"} 1' in body)
+
+    def test_get_article_xml(self):
+        status, body = self.request("GET", "/articles/7/xml?section=elife")
+        self.assertEqual(status, 200)
+        model_xml = helpers.read_file_content(
+            helpers.TEST_DATA_PATH + "elife_poa_e00007.xml"
+        )
+        self.assertEqual(body, model_xml)
+
+    def test_get_not_found(self):
+        status, _ = self.request("GET", "/articles/99999/xml")
+        self.assertEqual(status, 404)
+        status, _ = self.request("GET", "/unknown")
+        self.assertEqual(status, 404)
+
+    def test_post_article_json(self):
+        status, body = self.request(
+            "POST", "/articles/xml?section=elife", json.dumps(ARTICLE_JSON)
+        )
+        self.assertEqual(status, 200)
+        self.assertTrue(b"<surname>Surname</surname>" in body)
+
+    def test_post_bad_json(self):
+        status, _ = self.request("POST", "/articles/xml", "not json")
+        self.assertEqual(status, 400)
+
+    def test_post_bad_manuscript(self):
+        for manuscript in [None, "abc"]:
+            status, body = self.request(
+                "POST",
+                "/articles/xml?section=elife&write=1",
+                json.dumps(dict(ARTICLE_JSON, manuscript=manuscript)),
+            )
+            self.assertEqual(status, 400)
+            self.assertTrue("manuscript" in json.loads(body).get("error"))
+
+    def test_generate_error(self):
+        "an error while generating is returned as JSON"
+        with patch.object(
+            service.GenerationService, "generate", side_effect=TypeError("failed")
+        ):
+            status, body = self.request("GET", "/articles/7/xml?section=elife")
+        self.assertEqual(status, 500)
+        self.assertEqual(json.loads(body), {"error": "error generating xml: failed"})
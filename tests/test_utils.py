@@ -59,3 +59,54 @@ class TestAppendToTag(unittest.TestCase):
             attributes_text=attributes_text,
         )
         self.assertEqual(ElementTree.tostring(result), expected)
+
+    def test_append_to_tag_cached(self):
+        "test a recurring string is copied from the fragment cache"
+        utils.FRAGMENT_CACHE.clear()
+        original_string = "<italic>Mus musculus</italic>"
+        first_parent = Element("kwd-group")
+        second_parent = Element("kwd-group")
+        utils.append_to_tag(first_parent, "kwd", original_string)
+        utils.append_to_tag(second_parent, "kwd", original_string)
+        expected = b"<kwd-group><kwd><italic>Mus musculus</italic></kwd></kwd-group>"
+        self.assertEqual(ElementTree.tostring(first_parent), expected)
+        self.assertEqual(ElementTree.tostring(second_parent), expected)
+        self.assertEqual(utils.FRAGMENT_CACHE.hits, 1)
+        self.assertEqual(utils.FRAGMENT_CACHE.misses, 1)
+        # changing one tag does not change the other
+        second_parent[0].set("id", "kwd1")
+        self.assertEqual(ElementTree.tostring(first_parent), expected)
+
+    def test_append_to_tag_cache_key(self):
+        "test the same string with different attributes is not a cache hit"
+        utils.FRAGMENT_CACHE.clear()
+        parent = Element("body")
+        utils.append_to_tag(parent, "p", "Text", attributes_text='id="p1"')
+        utils.append_to_tag(parent, "p", "Text", attributes_text='id="p2"')
+        self.assertEqual(utils.FRAGMENT_CACHE.hits, 0)
+        self.assertEqual(len(utils.FRAGMENT_CACHE), 2)
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_lru_cache(self):
+        cache = utils.LRUCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        # b is now the least recently used
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+        stats = cache.stats()
+        self.assertEqual(stats.get("size"), 2)
+        self.assertEqual(stats.get("hits"), 2)
+        self.assertEqual(stats.get("misses"), 1)
+        self.assertEqual(stats.get("hit_rate"), 2.0 / 3)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.stats().get("hit_rate"), 0.0)
+
+    def test_lru_cache_disabled(self):
+        cache = utils.LRUCache(maxsize=0)
+        cache.put("a", 1)
+        self.assertIsNone(cache.get("a"))
@@ -0,0 +1,74 @@
+import unittest
+import os
+import shutil
+import tempfile
+from ejpcsvparser import csv_data
+from jatsgenerator import csvfiles, watch
+from tests import helpers
+
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        # copy the CSV files to a folder where they can be changed
+        self.csv_path = tempfile.mkdtemp()
+        for path in csvfiles.csv_file_paths(helpers.TEST_DATA_PATH).values():
+            shutil.copy(path, self.csv_path)
+        self.jats_config = helpers.build_config("elife")
+
+    def tearDown(self):
+        shutil.rmtree(self.csv_path)
+        # restore the CSV data for other tests
+        csv_data.CSV_PATH = helpers.TEST_DATA_PATH
+        csvfiles.reset_csv_caches()
+
+    def change_file(self, file_name, old, new):
+        path = os.path.join(self.csv_path, file_name)
+        with open(path, "r") as open_file:
+            content = open_file.read()
+        with open(path, "w") as open_file:
+            open_file.write(content.replace(old, new))
+        # make sure the modified time changes on coarse filesystems
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+
+    def test_sort_article_ids(self):
+        self.assertEqual(
+            watch.sort_article_ids(["12", "a", "7", "2725"]), ["7", "12", "2725", "a"]
+        )
+
+    def test_no_changes(self):
+        watcher = watch.CsvWatcher(self.csv_path)
+        self.assertEqual(watcher.changed_article_ids(), [])
+        self.assertEqual(watch.regenerate(watcher, self.jats_config), {})
+
+    def test_regenerate_changed(self):
+        "change rows for two manuscripts in different files"
+        watcher = watch.CsvWatcher(self.csv_path)
+        self.change_file("poa_author.csv", '"Schuman"', '"Schumann"')
+        self.change_file("poa_research_organism.csv", '"12","1"', '"12","2"')
+        results = watch.regenerate(watcher, self.jats_config, add_comment=False)
+        self.assertEqual(results, {"7": True, "12": True})
+        xml_content = helpers.read_file_content(
+            helpers.TARGET_OUTPUT_DIR + "elife_poa_e00007.xml"
+        )
+        self.assertTrue(b"<surname>Schumann</surname>" in xml_content)
+        # the changes are now in the snapshot
+        self.assertEqual(watcher.changed_article_ids(), [])
+
+    def test_regenerate_tmp_dir(self):
+        "the cleaned CSV files are written to the tmp_dir"
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            watcher = watch.CsvWatcher(self.csv_path)
+            self.change_file("poa_author.csv", '"Schuman"', '"Schumann"')
+            results = watch.regenerate(
+                watcher, self.jats_config, add_comment=False, tmp_dir=tmp_dir
+            )
+            self.assertEqual(results, {"7": True})
+            self.assertTrue(os.path.exists(os.path.join(tmp_dir, "poa_author.csv")))
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_watch(self):
+        watcher = watch.watch(self.csv_path, self.jats_config, interval=0, max_polls=1)
+        self.assertEqual(watcher.csv_path, self.csv_path)